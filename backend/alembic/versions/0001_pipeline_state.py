@@ -0,0 +1,90 @@
+"""Clés d'images du blob store, fiches de référence et registre des exécutions
+
+Revision ID: 0001_pipeline_state
+Revises:
+Create Date: 2026-10-19
+
+Les bases existantes ont été créées par `create_all` au démarrage, qui
+crée les tables manquantes mais n'ajoute pas de colonnes : les tables
+sont donc créées seulement si elles n'existent pas encore, puis les
+colonnes manquantes ajoutées aux tables déjà en place.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0001_pipeline_state"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+NEW_COLUMNS = [
+    ("pages", "image_key", 500),
+    ("pages", "lettered_image_key", 500),
+    ("panels", "image_key", 500),
+    ("reference_sheets", "lora_task_id", 100),
+]
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if "reference_sheets" not in tables:
+        op.create_table(
+            "reference_sheets",
+            sa.Column("id", UUID(as_uuid=True), primary_key=True),
+            sa.Column("description_hash", sa.String(64), nullable=False),
+            sa.Column("style", sa.String(50), nullable=False),
+            sa.Column("description", sa.Text),
+            sa.Column("reference_images", sa.JSON),
+            sa.Column("image_hashes", sa.JSON),
+            sa.Column("dataset_prefix", sa.String(500)),
+            sa.Column("lora_path", sa.String(500)),
+            sa.Column("lora_task_id", sa.String(100)),
+            sa.Column("generation_params", sa.JSON),
+            sa.Column("visual_features", sa.JSON),
+            sa.Column("created_at", sa.DateTime),
+        )
+        op.create_index(
+            "ix_reference_sheets_description_hash", "reference_sheets", ["description_hash"]
+        )
+
+    if "generation_runs" not in tables:
+        op.create_table(
+            "generation_runs",
+            sa.Column("id", UUID(as_uuid=True), primary_key=True),
+            sa.Column("project_id", UUID(as_uuid=True), sa.ForeignKey("projects.id")),
+            sa.Column("chapter_number", sa.Integer, nullable=False),
+            sa.Column("status", sa.String(50)),
+            sa.Column("attempts", sa.Integer),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+            sa.Column("finished_at", sa.DateTime),
+        )
+        op.create_index("ix_generation_runs_project_id", "generation_runs", ["project_id"])
+
+    if "run_stages" not in tables:
+        op.create_table(
+            "run_stages",
+            sa.Column("id", UUID(as_uuid=True), primary_key=True),
+            sa.Column("run_id", UUID(as_uuid=True), sa.ForeignKey("generation_runs.id")),
+            sa.Column("stage", sa.String(100), nullable=False),
+            sa.Column("output", sa.JSON),
+            sa.Column("completed_at", sa.DateTime),
+            sa.UniqueConstraint("run_id", "stage"),
+        )
+        op.create_index("ix_run_stages_run_id", "run_stages", ["run_id"])
+
+    # Tables créées par create_all avant ces colonnes
+    for table, column, length in NEW_COLUMNS:
+        if column not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}:
+            op.add_column(table, sa.Column(column, sa.String(length)))
+
+def downgrade() -> None:
+    op.drop_table("run_stages")
+    op.drop_table("generation_runs")
+    op.drop_table("reference_sheets")
+    for table, column, _ in reversed(NEW_COLUMNS):
+        if table != "reference_sheets":
+            op.drop_column(table, column)
@@ -8,6 +8,7 @@ from models.project import Project, Chapter, Page, Panel
 from modules.scenario.generator import ScenarioGenerator
 from modules.character_design.designer import CharacterDesigner
 from modules.page_generation.generator import PageGenerator
+from services.run_ledger import live_run
 from services.task_queue import enqueue_generation_task
 
 router = APIRouter()
@@ -25,6 +26,10 @@ async def start_generation(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    # Une exécution encore en cours ne doit pas être doublée
+    if await live_run(str(project_id), 1):
+        raise HTTPException(status_code=409, detail="Generation already running")
+    
     # Mise à jour du statut
     project.status = "generating"
     await db.commit()
@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from PIL import UnidentifiedImageError
+from typing import Optional
+import asyncio
+import uuid
+
+from core.database import get_db
+from core.security import get_current_user
+from models.project import Project
+from services.cpu_pool import run_cpu_bound
+from services.previews import (
+    MEDIA_TYPES,
+    build_preview_pyramid,
+    load_preview_index,
+    pick_format,
+    pick_level,
+    preview_etag,
+    preview_key
+)
+from services.storage import get_blob_store
+
+router = APIRouter()
+
+# Seules les images de projet (cases, pages) sont exposées en aperçu
+ALLOWED_PREFIXES = ("projects/",)
+ALLOWED_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+def key_project_id(source_key: str) -> Optional[uuid.UUID]:
+    """Projet propriétaire d'une clé projects/<id>/... (None si la clé n'est pas servie)"""
+
+    if not source_key.startswith(ALLOWED_PREFIXES) or ".." in source_key:
+        return None
+    if not source_key.lower().endswith(ALLOWED_EXTENSIONS):
+        return None
+    try:
+        return uuid.UUID(source_key.split("/")[1])
+    except (IndexError, ValueError):
+        return None
+
+@router.get("/{source_key:path}")
+async def get_preview(
+    source_key: str,
+    request: Request,
+    w: int = Query(512, ge=1, le=4096),
+    format: Optional[str] = Query(None, pattern="^(webp|avif)$"),
+    v: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Vignette d'une image de case ou de page au niveau de pyramide le plus proche
+
+    Réponses conditionnelles par ETag (304 sans relire l'image). Avec
+    `v` égal à l'empreinte courante, l'URL est immuable et mise en cache
+    un an par le navigateur (cache privé : les images restent celles de
+    l'utilisateur).
+    """
+
+    project_id = key_project_id(source_key)
+    if project_id is None:
+        raise HTTPException(status_code=404, detail="Preview not found")
+
+    project = await db.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Preview not found")
+
+    if str(project.user_id) != current_user["id"]:
+        raise HTTPException(status_code=403, detail="Access forbidden")
+
+    store = get_blob_store()
+    index = await asyncio.to_thread(load_preview_index, source_key, store)
+    if index is None:
+        # Image antérieure aux pyramides : génération à la demande
+        if not await asyncio.to_thread(store.exists, source_key):
+            raise HTTPException(status_code=404, detail="Preview not found")
+        try:
+            index = await run_cpu_bound(build_preview_pyramid, source_key)
+        except UnidentifiedImageError:
+            raise HTTPException(status_code=404, detail="Preview not found")
+
+    width = pick_level(index, w)
+    image_format = pick_format(index, request.headers.get("accept", ""), format)
+    etag = preview_etag(index, width, image_format)
+
+    headers = {
+        "ETag": etag,
+        "Vary": "Accept",
+        "Cache-Control": (
+            "private, max-age=31536000, immutable" if v == index["etag"]
+            else "private, no-cache"
+        )
+    }
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    data = await asyncio.to_thread(store.get, preview_key(source_key, width, image_format))
+    return Response(content=data, media_type=MEDIA_TYPES[image_format], headers=headers)
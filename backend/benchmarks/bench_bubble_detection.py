@@ -0,0 +1,129 @@
+"""Temps de détection des bulles par page 2480x3508, avant / après
+
+    cd backend && python -m benchmarks.bench_bubble_detection --pages 10
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List, Tuple
+import cv2
+import numpy as np
+
+from benchmarks import _env  # noqa: F401
+from modules.lettering.letterer import BubbleDetector
+
+PAGE_SIZE = (2480, 3508)
+
+def synthetic_page(seed: int) -> np.ndarray:
+    """Page blanche avec cases encrées, hachures et bulles contenant du texte"""
+
+    rng = np.random.default_rng(seed)
+    width, height = PAGE_SIZE
+    page = np.full((height, width, 3), 255, dtype=np.uint8)
+
+    for row in range(3):
+        for col in range(2):
+            x0, y0 = 80 + col * 1170, 100 + row * 1100
+            x1, y1 = x0 + 1130, y0 + 1060
+            cv2.rectangle(page, (x0, y0), (x1, y1), (0, 0, 0), 6)
+
+            # Encrage / trames : beaucoup de petites composantes
+            for _ in range(400):
+                p0 = (int(rng.integers(x0, x1)), int(rng.integers(y0, y1)))
+                p1 = (p0[0] + int(rng.integers(-60, 60)), p0[1] + int(rng.integers(-60, 60)))
+                cv2.line(page, p0, p1, (0, 0, 0), int(rng.integers(1, 4)))
+
+            for _ in range(2):
+                center = (int(rng.integers(x0 + 150, x1 - 150)), int(rng.integers(y0 + 150, y1 - 150)))
+                axes = (int(rng.integers(60, 110)), int(rng.integers(60, 110)))
+                cv2.ellipse(page, center, axes, 0, 0, 360, (255, 255, 255), -1)
+                cv2.ellipse(page, center, axes, 0, 0, 360, (0, 0, 0), 4)
+                cv2.putText(page, "!?", (center[0] - 30, center[1] + 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 3)
+
+    return page
+
+def detect_legacy(img: np.ndarray, min_area=500, max_area=50000) -> List[Dict[str, Any]]:
+    """Implémentation d'origine à pleine résolution, features par contour en Python
+
+    L'original prenait les contours RETR_EXTERNAL du masque blanc : le fond
+    de page forme un seul contour englobant et les bulles, imbriquées dans
+    l'encrage des cases, n'étaient jamais vues (0 bulle). La référence garde
+    la boucle d'origine mais parcourt les bords extérieurs de toutes les
+    composantes blanches (RETR_CCOMP, niveau 0), comme BubbleDetector.
+    """
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    _, binary = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY)
+    contours, hierarchy = cv2.findContours(binary, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return []
+
+    bubbles = []
+    for contour, (_, _, _, parent) in zip(contours, hierarchy[0]):
+        if parent != -1:  # Trou d'une composante blanche
+            continue
+        area = cv2.contourArea(contour)
+        if min_area < area < max_area:
+            perimeter = cv2.arcLength(contour, True)
+            approx = cv2.approxPolyDP(contour, 0.02 * perimeter, True)
+            x, y, w, h = cv2.boundingRect(contour)
+            circularity = 4 * np.pi * cv2.contourArea(contour) / (perimeter * perimeter)
+            if len(approx) > 6 and 0.5 < float(w) / h < 2.0 and circularity > 0.6:
+                bubbles.append({"bounds": (x, y, x + w, y + h), "area": area, "contour": contour})
+    return bubbles
+
+def iou(a, b) -> float:
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 0.0
+
+def matched(reference: List[Dict[str, Any]], candidate: List[Dict[str, Any]], threshold=0.8) -> int:
+    """Nombre de bulles de référence retrouvées (IoU des boîtes >= threshold)"""
+    remaining = [bubble["bounds"] for bubble in candidate]
+    count = 0
+    for bubble in reference:
+        best = max(remaining, key=lambda bounds: iou(bubble["bounds"], bounds), default=None)
+        if best is not None and iou(bubble["bounds"], best) >= threshold:
+            remaining.remove(best)
+            count += 1
+    return count
+
+def bench(name: str, fn, pages: List[np.ndarray]) -> Tuple[float, List[List[Dict[str, Any]]]]:
+    fn(pages[0])  # Échauffement
+    timings, detections = [], []
+    for page in pages:
+        start = time.perf_counter()
+        detections.append(fn(page))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    median = float(np.median(timings))
+    print(
+        f"{name:<12} median={median:8.1f} ms/page  "
+        f"p95={np.percentile(timings, 95):8.1f} ms  bulles={sum(map(len, detections))}"
+    )
+    return median, detections
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--work-width", type=int, default=1240)
+    args = parser.parse_args()
+
+    pages = [synthetic_page(seed) for seed in range(args.pages)]
+    detector = BubbleDetector(work_width=args.work_width)
+
+    before, reference = bench("avant", detect_legacy, pages)
+    after, detections = bench("après", detector.detect, pages)
+
+    # Même sortie attendue : les gains ne comptent que sur les mêmes bulles
+    shared = sum(matched(ref, found) for ref, found in zip(reference, detections))
+    print(
+        f"bulles communes={shared}/{sum(map(len, reference))}  "
+        f"(en plus={sum(map(len, detections)) - shared})  speedup={before / after:.1f}x"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Latence de queue des pages avec un nœud GPU défaillant, avec et sans hedging
+
+    cd backend && python -m benchmarks.bench_gpu_hedging --pages 60
+
+Quatre serveurs factices (benchmarks/gpu_stub.py). Le premier est lent
+une fois sur quatre, le deuxième échoue une fois sur deux : le
+disjoncteur doit l'écarter. Une page enchaîne ses cases comme
+PageGenerator (chacune dépend du contexte de la précédente), donc une
+seule case lente retarde toute la page.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List
+
+from aiohttp import ClientError
+
+from benchmarks import _env  # noqa: F401
+from benchmarks.gpu_stub import start_stubs
+from services.gpu_pool import GPUPool
+from services.http import close_http_session
+
+FAULTS = [
+    {"slow_rate": 0.25, "slow_time": 1.0},
+    {"error_rate": 0.5},
+]
+
+async def run(pages: int, panels: int, concurrency: int, hedge: bool) -> None:
+    servers, urls, runners = await start_stubs(4, faults=FAULTS, service_time=0.05, slots=4)
+    pool = GPUPool(urls, hedge_min_delay=0.01, rng=random.Random(0))
+    seeds = random.Random(1)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failed = 0
+
+    async def panel(page: int, number: int) -> None:
+        payload = {"prompt": f"page {page} panel {number}", "seed": seeds.randrange(2**32)}
+        # Un échec 503 est retenté, comme le ferait la tâche Celery
+        for _ in range(3):
+            try:
+                await pool.post("/api/story_generate", payload, timeout=5, hedge=hedge)
+                return
+            except (ClientError, asyncio.TimeoutError):
+                continue
+        raise RuntimeError("panel failed")
+
+    async def page(number: int) -> None:
+        nonlocal failed
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                for i in range(panels):
+                    await panel(number, i)
+            except RuntimeError:
+                failed += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[page(i) for i in range(pages)])
+
+    await pool.close()
+    for runner in runners:
+        await runner.cleanup()
+
+    latencies.sort()
+    quantile = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+    print(
+        f"hedging {'oui' if hedge else 'non'} : page p50 {statistics.median(latencies):.2f} s, "
+        f"p95 {quantile(0.95):.2f} s, p99 {quantile(0.99):.2f} s, max {latencies[-1]:.2f} s, "
+        f"pages en échec {failed}, requêtes doublées {pool.hedged}, "
+        f"erreurs injectées {sum(server.errors for server in servers)}, "
+        f"disjoncteur nœud 2 : {pool.endpoints[1].breaker.state}"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--panels", type=int, default=6)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    for hedge in (False, True):
+        await run(args.pages, args.panels, args.concurrency, hedge)
+    await close_http_session()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""Débit du pool GPU selon le nombre de serveurs, avec et sans affinité LoRA
+
+    cd backend && python -m benchmarks.bench_gpu_pool --requests 400 --concurrency 32
+
+Serveurs factices locaux (benchmarks/gpu_stub.py), une génération à la
+fois chacun. Le débit doit croître linéairement avec le nombre de
+serveurs ; l'affinité réduit les rechargements de LoRA.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks import _env  # noqa: F401
+from benchmarks.gpu_stub import start_stubs
+from services.gpu_pool import GPUPool, lora_affinity
+from services.http import close_http_session
+
+async def run(endpoints: int, requests: int, concurrency: int, lora_sets: int, sticky: bool):
+    servers, urls, runners = await start_stubs(endpoints)
+    pool = GPUPool(urls, rng=random.Random(0))
+    rng = random.Random(1)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        loras = [{"path": f"character_{rng.randrange(lora_sets)}.safetensors", "strength": 0.8}]
+        async with semaphore:
+            await pool.post(
+                "/api/story_generate",
+                {"prompt": f"panel {i}", "loras": loras},
+                affinity=lora_affinity(loras) if sticky else None
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    elapsed = time.perf_counter() - start
+
+    await pool.close()
+    for runner in runners:
+        await runner.cleanup()
+
+    misses = sum(server.lora_misses for server in servers)
+    spread = "/".join(str(server.requests) for server in servers)
+    print(
+        f"{endpoints:2d} serveurs, affinité {'oui' if sticky else 'non'} : "
+        f"{requests / elapsed:7.1f} req/s, rechargements LoRA {misses:4d}, répartition {spread}"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--lora-sets", type=int, default=8)
+    args = parser.parse_args()
+
+    for endpoints in (1, 2, 4, 8):
+        for sticky in (False, True):
+            await run(endpoints, args.requests, args.concurrency, args.lora_sets, sticky)
+    await close_http_session()
+
+if __name__ == "__main__":
+    asyncio.run(main())
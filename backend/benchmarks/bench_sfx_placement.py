@@ -0,0 +1,41 @@
+"""Temps de placement des onomatopées sur une page 2480x3508
+
+    cd backend && python -m benchmarks.bench_sfx_placement --sfx 40
+"""
+
+import argparse
+import time
+import numpy as np
+
+from benchmarks import _env  # noqa: F401
+from benchmarks.bench_bubble_detection import synthetic_page
+from modules.lettering.letterer import BubbleDetector
+from modules.lettering.placement import SFXPlacer
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sfx", type=int, default=40)
+    args = parser.parse_args()
+
+    page = synthetic_page(0)
+    bubbles = BubbleDetector().detect(page)
+    rng = np.random.default_rng(0)
+
+    start = time.perf_counter()
+    placer = SFXPlacer(page, bubbles)
+    built = time.perf_counter()
+
+    for i in range(args.sfx):
+        row, col = (i // 2) % 3, i % 2
+        panel = (80 + col * 1170, 100 + row * 1100, 1210 + col * 1170, 1160 + row * 1100)
+        w, h = int(rng.integers(200, 500)), int(rng.integers(120, 260))
+        sizes = [(int(w * s), int(h * s)) for s in (1.0, 0.8, 0.6)]
+        position, index = placer.find_position(sizes, panel)
+        placer.mark(position, sizes[index])
+    done = time.perf_counter()
+
+    print(f"carte de coût : {(built - start) * 1000:7.1f} ms")
+    print(f"{args.sfx} SFX     : {(done - built) * 1000:7.1f} ms ({(done - built) / args.sfx * 1000:.2f} ms/SFX)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Microbenchmark du calage de texte sur des milliers de bulles
+
+    cd backend && python -m benchmarks.bench_text_fitting --bubbles 5000 \
+        --font /usr/share/fonts/truetype/dejavu/DejaVuSans.ttf
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks import _env  # noqa: F401
+from modules.lettering.layout import TextLayoutEngine
+
+WORDS = (
+    "je ne laisserai personne toucher à mes amis ! qu'est-ce que tu racontes "
+    "encore cette technique est interdite depuis cent ans attends-moi"
+).split()
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよ！？"
+
+def random_bubbles(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    bubbles = []
+    for _ in range(count):
+        vertical = rng.random() < 0.5
+        if vertical:
+            text = "".join(rng.choice(KANA) for _ in range(rng.randint(4, 40)))
+        else:
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 25)))
+        x0, y0 = rng.randint(0, 2000), rng.randint(0, 3000)
+        w, h = rng.randint(150, 450), rng.randint(150, 500)
+        bubbles.append((text, (x0, y0, x0 + w, y0 + h), vertical))
+    return bubbles
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bubbles", type=int, default=5000)
+    parser.add_argument("--font", default="assets/fonts/manga_dialogue.ttf")
+    args = parser.parse_args()
+
+    bubbles = random_bubbles(args.bubbles)
+    engine = TextLayoutEngine()
+
+    for label in ("froid", "mémoïsé"):
+        start = time.perf_counter()
+        overflow = 0
+        for text, bounds, vertical in bubbles:
+            overflow += engine.fit(text, args.font, bounds, vertical=vertical).overflow
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:<8} {len(bubbles)} bulles en {elapsed * 1000:8.1f} ms "
+            f"({elapsed / len(bubbles) * 1e6:7.1f} µs/bulle, débordements={overflow})"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Charge WebSocket : N sockets sur un projet, latence de diffusion et messages perdus
+
+API et Redis démarrés (docker compose up backend redis), puis :
+
+    cd backend && ulimit -n 4096 && python -m benchmarks.bench_ws_fanout --sockets 1000 --messages 200
+
+Les messages sont publiés directement sur le canal Redis du projet, au
+format du bus de progression, horodatés à l'envoi ; chaque socket mesure
+le délai jusqu'à réception. Le hub ne doit tenir qu'un abonnement Redis
+pour le projet (vérifié via PUBSUB NUMSUB), quel que soit N.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from typing import List
+
+import websockets
+from redis import asyncio as aioredis
+
+from benchmarks import _env  # noqa: F401
+from services.progress import channel_name, encode_message
+
+async def client(url: str, expected: int, latencies: List[float], ready: asyncio.Event, counts: List[int]):
+    async with websockets.connect(url, max_queue=None, open_timeout=60) as socket:
+        counts[0] += 1
+        if counts[0] == counts[1]:
+            ready.set()
+        received = 0
+        try:
+            while received < expected:
+                message = json.loads(await asyncio.wait_for(socket.recv(), timeout=30))
+                for event in message["data"]["events"]:
+                    if event["stage"] == "bench":
+                        latencies.append(time.time() - event["ts"])
+                        received += 1
+        except asyncio.TimeoutError:
+            pass
+        counts[2] += received
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="ws://localhost:8000")
+    parser.add_argument("--redis", default="redis://localhost:6379")
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50, help="messages publiés par seconde")
+    args = parser.parse_args()
+
+    project_id = f"bench-{uuid.uuid4()}"
+    redis = aioredis.from_url(args.redis)
+    latencies: List[float] = []
+    counts = [0, args.sockets, 0]  # connectées, attendues, messages reçus
+    ready = asyncio.Event()
+
+    start = time.perf_counter()
+    clients = [
+        asyncio.create_task(client(f"{args.url}/ws/{project_id}", args.messages, latencies, ready, counts))
+        for _ in range(args.sockets)
+    ]
+    await asyncio.wait_for(ready.wait(), timeout=120)
+    connect_time = time.perf_counter() - start
+    await asyncio.sleep(0.5)  # Abonnement du hub établi
+
+    [(_, subscribers)] = await redis.pubsub_numsub(channel_name(project_id))
+
+    for i in range(args.messages):
+        event = {"stage": "bench", "page": i, "ts": time.time()}
+        await redis.publish(channel_name(project_id), encode_message(project_id, [event]))
+        await asyncio.sleep(1 / args.rate)
+
+    await asyncio.gather(*clients, return_exceptions=True)
+    await redis.close()
+
+    expected = args.sockets * args.messages
+    latencies.sort()
+    print(f"{args.sockets} sockets connectées en {connect_time:.2f} s")
+    print(f"abonnements Redis pour le projet : {subscribers}")
+    print(f"messages reçus : {counts[2]}/{expected} ({100 * counts[2] / expected:.1f} %)")
+    if latencies:
+        print(
+            f"latence de diffusion : p50 {1000 * statistics.median(latencies):.1f} ms, "
+            f"p99 {1000 * latencies[int(len(latencies) * 0.99) - 1]:.1f} ms, "
+            f"max {1000 * latencies[-1]:.1f} ms"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
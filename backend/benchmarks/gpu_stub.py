@@ -0,0 +1,120 @@
+"""Serveur GPU factice pour les benchmarks du pool (API de ml-pipeline/comfyui/manga_api.py)
+
+Chaque serveur traite `slots` générations à la fois en `service_time`
+secondes ; charger un jeu de LoRA absent de son cache (LRU de
+`lora_cache` jeux) coûte `lora_load_time` de plus, comme un vrai nœud.
+
+Injection de fautes : une fraction `error_rate` des requêtes échoue en
+503, une fraction `slow_rate` prend `slow_time` de plus, et `hang` fait
+pendre toutes les générations (nœud bloqué).
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence, Tuple
+import asyncio
+import random
+import socket
+
+from aiohttp import web
+
+class StubGPUServer:
+    def __init__(
+        self,
+        service_time: float = 0.05,
+        slots: int = 1,
+        lora_cache: int = 2,
+        lora_load_time: float = 0.05,
+        error_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_time: float = 1.0,
+        hang: bool = False,
+        seed: int = 0
+    ):
+        self.service_time = service_time
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_time = slow_time
+        self.hang = hang
+        self.rng = random.Random(seed)
+        self.errors = 0
+        self.lora_load_time = lora_load_time
+        self.lora_cache_size = lora_cache
+        self.slots = asyncio.Semaphore(slots)
+        self.loaded: "OrderedDict[str, None]" = OrderedDict()
+        self.requests = 0
+        self.lora_misses = 0
+        self.in_flight = 0
+
+        self.app = web.Application()
+        self.app.router.add_get("/api/health", self.health)
+        self.app.router.add_post("/api/story_generate", self.generate)
+        self.app.router.add_post("/api/generate", self.generate)
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "cuda": False, "in_flight": self.in_flight})
+
+    def _load_loras(self, loras) -> bool:
+        key = "|".join(sorted(lora["path"] for lora in loras or []))
+        if not key or key in self.loaded:
+            if key:
+                self.loaded.move_to_end(key)
+            return False
+        self.loaded[key] = None
+        while len(self.loaded) > self.lora_cache_size:
+            self.loaded.popitem(last=False)
+        return True
+
+    async def generate(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        roll = self.rng.random()
+        if roll < self.error_rate:
+            self.errors += 1
+            return web.json_response({"detail": "injected failure"}, status=503)
+
+        self.in_flight += 1
+        try:
+            if self.hang:
+                await asyncio.Event().wait()
+            async with self.slots:
+                delay = self.service_time
+                if roll < self.error_rate + self.slow_rate:
+                    delay += self.slow_time
+                if self._load_loras(payload.get("loras")):
+                    self.lora_misses += 1
+                    delay += self.lora_load_time
+                await asyncio.sleep(delay)
+                self.requests += 1
+        finally:
+            self.in_flight -= 1
+        return web.json_response({
+            "image": "",
+            "embeddings": [0.0],
+            "seed": payload.get("seed") or self.requests,
+        })
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def start_stubs(
+    count: int,
+    faults: Sequence[Dict[str, Any]] = (),
+    **options
+) -> Tuple[List[StubGPUServer], List[str], List[web.AppRunner]]:
+    """Démarre `count` serveurs locaux ; retourne les serveurs, leurs URLs et les runners à fermer
+
+    `faults[i]` complète les options du i-ème serveur (error_rate, slow_rate, hang...).
+    """
+
+    servers, urls, runners = [], [], []
+    for i in range(count):
+        server = StubGPUServer(**{**options, "seed": i, **(faults[i] if i < len(faults) else {})})
+        runner = web.AppRunner(server.app)
+        await runner.setup()
+        port = free_port()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        servers.append(server)
+        urls.append(f"http://127.0.0.1:{port}")
+        runners.append(runner)
+    return servers, urls, runners
@@ -21,15 +21,58 @@ class Settings(BaseSettings):
     S3_ACCESS_KEY: str
     S3_SECRET_KEY: str
     S3_REGION: str = "us-east-1"
+    S3_ENDPOINT_URL: Optional[str] = None  # MinIO / stockage compatible S3
+    BLOB_BACKEND: str = "local"  # "local" ou "s3"
+    BLOB_LOCAL_ROOT: str = "/models/blobs"  # Volume partagé avec le serveur GPU
     
     # GPU Services
     LAMBDA_LABS_API_KEY: Optional[str] = None
     GPU_ENDPOINT: Optional[str] = None
+    GPU_ENDPOINTS: Optional[str] = None  # Pool de serveurs, séparés par des virgules (prioritaire sur GPU_ENDPOINT)
+    GPU_HEALTH_INTERVAL_S: float = 10
+    GPU_HEALTH_TIMEOUT_S: float = 2
+    GPU_LATENCY_EWMA_ALPHA: float = 0.2
+    GPU_BREAKER_FAILURES: int = 3  # Échecs consécutifs avant de couper un serveur
+    GPU_BREAKER_COOLDOWN_S: float = 30  # Délai avant la requête d'essai
+    GPU_HEDGE_WINDOW: int = 200  # Latences récentes gardées par route pour le p95
+    GPU_HEDGE_MIN_SAMPLES: int = 20  # Pas de requête doublée avant cet échantillon
+    GPU_HEDGE_MIN_DELAY_S: float = 0.5
+    GPU_PANEL_TIMEOUT_S: float = 300  # Par tentative de génération de case
+    HTTP_POOL_SIZE: int = 64  # Connexions HTTP sortantes par process (serveur GPU)
     
     # Generation Settings
     MAX_PAGES_PER_CHAPTER: int = 30
     MAX_PANELS_PER_PAGE: int = 8
     DEFAULT_DPI: int = 600
+    SFX_FACE_CASCADE: Optional[str] = None  # Cascade OpenCV de visages (ex. lbpcascade_animeface.xml)
+    REFERENCE_PHASH_MAX_DISTANCE: int = 6  # Variations plus proches = doublons
+    LORA_POLL_INTERVAL_S: int = 60  # Vérification de l'arrivée d'un LoRA en cours d'entraînement
+    LORA_TRAINING_TIMEOUT_S: int = 4 * 3600  # Au-delà, l'entraînement est considéré perdu
+    # Sans étape terminée depuis ce délai, une exécution "running" est abandonnée (worker
+    # tué sans callback d'échec) et peut être reprise ; > task_time_limit d'une étape
+    GENERATION_RUN_STALE_S: int = 3900
+    
+    # Cohérence des personnages
+    VECTOR_INDEX_PATH: str = "/models/indexes/characters.npz"
+    CONSISTENCY_THRESHOLD: float = 0.75  # Similarité cosinus minimale case/personnage
+    CONSISTENCY_MAX_RETRIES: int = 1
+    
+    # Export
+    EXPORT_PART_SIZE_MB: int = 16  # Taille des parts multipart (S3 : 5 Mo minimum)
+    EXPORT_SPOOL_MEMORY_MB: int = 4  # Au-delà, la part en cours déborde sur disque
+    PRINT_ICC_PROFILE: Optional[str] = None  # Profil presse (ex. ISOcoated_v2_eci.icc)
+    PRINT_RENDERING_INTENT: str = "relative_colorimetric"
+    EXPORT_PAGES_IN_FLIGHT: Optional[int] = None  # Pages préparées en parallèle (défaut: pool CPU)
+    ANIMATION_CONCURRENCY: int = 4  # Animations de cases générées simultanément sur le GPU
+    
+    # Progression temps réel
+    PROGRESS_WINDOW_MS: int = 250  # Fenêtre de regroupement des événements par projet
+    PROGRESS_STREAM_MAXLEN: int = 1000  # Événements gardés pour les clients qui se connectent tard
+    WS_CLIENT_QUEUE_SIZE: int = 64  # Messages en attente par socket avant éviction du client
+    WS_BACKLOG_MESSAGES: int = 50  # Messages rejoués à la connexion
+    
+    # CPU
+    CPU_WORKERS: Optional[int] = None  # Taille du pool de process (défaut: nb de cœurs)
     
     class Config:
         env_file = ".env"
@@ -5,9 +5,12 @@ import uvicorn
 from redis import asyncio as aioredis
 from celery import Celery
 
-from api.routers import projects, generation, characters, export
+from api.routers import projects, generation, characters, export, previews
 from core.config import settings
 from core.database import engine, Base
+from services.gpu_pool import close_gpu_pool
+from services.http import close_http_session
+from services.ws_hub import WebSocketHub
 
 # Initialisation Celery
 celery_app = Celery(
@@ -20,10 +23,14 @@ celery_app = Celery(
 async def lifespan(app: FastAPI):
     # Startup
     app.state.redis = await aioredis.from_url(settings.REDIS_URL)
+    app.state.ws_hub = WebSocketHub(app.state.redis)
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield
     # Shutdown
+    await app.state.ws_hub.close()
+    await close_gpu_pool()
+    await close_http_session()
     await app.state.redis.close()
 
 app = FastAPI(
@@ -46,19 +53,10 @@ app.include_router(projects.router, prefix="/api/v1/projects", tags=["projects"]
 app.include_router(generation.router, prefix="/api/v1/generation", tags=["generation"])
 app.include_router(characters.router, prefix="/api/v1/characters", tags=["characters"])
 app.include_router(export.router, prefix="/api/v1/export", tags=["export"])
+app.include_router(previews.router, prefix="/api/v1/previews", tags=["previews"])
 
 # WebSocket pour updates temps réel
 @app.websocket("/ws/{project_id}")
 async def websocket_endpoint(websocket: WebSocket, project_id: str):
     await websocket.accept()
-    redis = app.state.redis
-    pubsub = redis.pubsub()
-    await pubsub.subscribe(f"project:{project_id}")
-    
-    try:
-        while True:
-            message = await pubsub.get_message(ignore_subscribe_messages=True)
-            if message:
-                await websocket.send_json(message["data"])
-    except:
-        await pubsub.unsubscribe()
+    await app.state.ws_hub.serve(project_id, websocket)
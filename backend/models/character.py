@@ -1,7 +1,8 @@
-from sqlalchemy import Column, String, Text, JSON, ForeignKey, Integer
+from sqlalchemy import Column, String, Text, JSON, ForeignKey, Integer, DateTime
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
+from datetime import datetime
 
 from core.database import Base
 
@@ -32,3 +33,24 @@ class Character(Base):
     
     # Relations
     project = relationship("Project", back_populates="characters")
+
+class ReferenceSheet(Base):
+    """Fiche de référence réutilisable entre projets (indexée par description normalisée)"""
+    __tablename__ = "reference_sheets"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    description_hash = Column(String(64), nullable=False, index=True)  # sha256(style|description)
+    style = Column(String(50), nullable=False)
+    description = Column(Text)  # Description normalisée
+    
+    # Images générées (clés du blob store) et leurs pHash
+    reference_images = Column(JSON, default=list)
+    image_hashes = Column(JSON, default=list)
+    
+    dataset_prefix = Column(String(500))
+    lora_path = Column(String(500))
+    lora_task_id = Column(String(100))  # Entraînement en cours (vidé à son aboutissement)
+    generation_params = Column(JSON)
+    visual_features = Column(JSON)  # Embedding moyen de la fiche
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, String, JSON, DateTime, ForeignKey, Integer, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+import uuid
+from datetime import datetime
+
+from core.database import Base
+
+class GenerationRun(Base):
+    """Exécution de la génération d'un chapitre, reprise tant qu'elle n'est pas terminée"""
+    __tablename__ = "generation_runs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), index=True)
+    chapter_number = Column(Integer, nullable=False)
+    status = Column(String(50), default="running")  # running, failed, completed
+    attempts = Column(Integer, default=1)
+
+    stages = relationship("RunStage", back_populates="run", cascade="all, delete-orphan")
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+class RunStage(Base):
+    """Étape terminée d'une exécution, avec la sortie renvoyée par la tâche"""
+    __tablename__ = "run_stages"
+    __table_args__ = (UniqueConstraint("run_id", "stage"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    run_id = Column(UUID(as_uuid=True), ForeignKey("generation_runs.id"), index=True)
+    stage = Column(String(100), nullable=False)  # outline, character:<id>, page:<n>, lettering:<n>, export
+    output = Column(JSON)
+
+    run = relationship("GenerationRun", back_populates="stages")
+
+    completed_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, JSON, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, String, Text, JSON, DateTime, Enum, ForeignKey, Integer
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -61,6 +61,8 @@ class Page(Base):
     chapter_id = Column(UUID(as_uuid=True), ForeignKey("chapters.id"))
     page_number = Column(Integer, nullable=False)
     layout = Column(JSON)  # Structure des cases
+    image_key = Column(String(500))  # Planche composée dans le blob store
+    lettered_image_key = Column(String(500))
     
     chapter = relationship("Chapter", back_populates="pages")
     panels = relationship("Panel", back_populates="page", cascade="all, delete-orphan")
@@ -76,6 +78,7 @@ class Panel(Base):
     description = Column(Text)  # Description de la scène
     dialogue = Column(JSON)  # Bulles de dialogue
     image_url = Column(String(500))
+    image_key = Column(String(500))
     
     # Métadonnées de génération
     prompt = Column(Text)
@@ -1,30 +1,91 @@
-import aiohttp
 import asyncio
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import base64
 from PIL import Image
+import uuid
 import io
 
 from core.config import settings
+from services.cpu_pool import run_cpu_bound
+from services.gpu_pool import get_gpu_pool, lora_affinity
+from services.storage import get_blob_store
+from modules.character_design.reference_library import (
+    ReferenceLibrary,
+    dedupe_by_hash,
+    description_hash,
+    lora_key,
+    perceptual_hash
+)
+
+LORA_IMAGE_SIZE = 512
+
+def preprocess_lora_image(img_b64: str, reference_key: str, dataset_key: str) -> int:
+    """Stocke une variation, écrit sa version dataset LoRA et retourne son pHash
+    
+    Exécuté dans le pool CPU.
+    """
+    
+    img_data = base64.b64decode(img_b64)
+    img = Image.open(io.BytesIO(img_data)).convert("RGB")
+    img_resized = img.resize((LORA_IMAGE_SIZE, LORA_IMAGE_SIZE), Image.LANCZOS)
+    
+    buffer = io.BytesIO()
+    img_resized.save(buffer, format="PNG")
+    
+    store = get_blob_store()
+    store.put(reference_key, img_data, content_type="image/png")
+    store.put(dataset_key, buffer.getvalue(), content_type="image/png")
+    return perceptual_hash(img_resized)
 
 class CharacterDesigner:
     def __init__(self):
-        self.sd_endpoint = settings.GPU_ENDPOINT or "http://localhost:7860"
         self.lora_models = {
             "shonen": "anime_shonen_v1.safetensors",
             "shojo": "anime_shojo_v1.safetensors",
             "seinen": "anime_seinen_v1.safetensors"
         }
+        self.reference_library = ReferenceLibrary()
+    
+    async def find_existing_reference(
+        self,
+        description: str,
+        style: str = "shonen"
+    ) -> Optional[Dict[str, Any]]:
+        """Fiche (et LoRA éventuel) déjà générée pour la même description"""
+        return await self.reference_library.find(description, style)
     
     async def create_character_reference(
         self,
         name: str,
         description: str,
         style: str = "shonen",
-        variations: int = 4
+        variations: int = 4,
+        reuse: bool = True
     ) -> Dict[str, Any]:
         """Crée une fiche de référence pour un personnage"""
         
+        # Réutilisation d'une fiche existante (autre projet ou chapitre)
+        if reuse:
+            existing = await self.find_existing_reference(description, style)
+            if existing:
+                return {
+                    "name": name,
+                    "description": description,
+                    "style": style,
+                    "reused": True,
+                    "reference_hash": existing["description_hash"],
+                    "reference_sheet": existing["reference_images"][0],
+                    "reference_images": existing["reference_images"],
+                    "lora_path": existing["lora_path"],
+                    "lora_task_id": existing["lora_task_id"],
+                    "generation_params": existing["generation_params"],
+                    "visual_features": existing["visual_features"],
+                    "lora_dataset": {
+                        "prefix": existing["dataset_prefix"],
+                        "reference_hash": existing["description_hash"]
+                    }
+                }
+        
         # Prompt de base pour character sheet
         base_prompt = f"""anime character reference sheet, {description},
         multiple views, front view, side view, back view, 3/4 view,
@@ -36,96 +97,151 @@ class CharacterDesigner:
         low quality, cropped, incomplete, watermark"""
         
         # Génération via ComfyUI/SD
-        async with aiohttp.ClientSession() as session:
-            payload = {
-                "prompt": base_prompt,
-                "negative_prompt": negative_prompt,
-                "width": 1024,
-                "height": 1024,
-                "steps": 30,
-                "cfg_scale": 7.5,
-                "sampler": "DPM++ 2M Karras",
-                "seed": -1,
-                "batch_size": variations,
-                "lora": self.lora_models.get(style),
-                "lora_strength": 0.8
-            }
-            
-            async with session.post(
-                f"{self.sd_endpoint}/api/generate",
-                json=payload
-            ) as resp:
-                result = await resp.json()
+        payload = {
+            "prompt": base_prompt,
+            "negative_prompt": negative_prompt,
+            "width": 1024,
+            "height": 1024,
+            "steps": 30,
+            "cfg_scale": 7.5,
+            "sampler": "DPM++ 2M Karras",
+            "seed": -1,
+            "batch_size": variations,
+            "lora": self.lora_models.get(style),
+            "lora_strength": 0.8
+        }
+        
+        result = await get_gpu_pool().post(
+            "/api/generate",
+            payload,
+            affinity=lora_affinity([payload["lora"]])
+        )
+        
+        reference_hash = description_hash(description, style)
+        
+        # Extraction des features pour LoRA training
+        dataset = await self._prepare_lora_dataset(
+            result["images"],
+            dataset_id=f"{reference_hash[:16]}-{uuid.uuid4().hex[:8]}"
+        )
+        dataset["reference_hash"] = reference_hash
+        
+        # Embedding moyen des variations gardées, pour les contrôles de cohérence
+        visual_features = await self._extract_visual_features(
+            [result["images"][i] for i in dataset["kept_indices"]]
+        )
+        
+        await self.reference_library.register(
+            description,
+            style,
+            reference_images=dataset["reference_images"],
+            image_hashes=dataset["image_hashes"],
+            dataset_prefix=dataset["prefix"],
+            generation_params=payload,
+            visual_features=visual_features
+        )
         
         # Traitement et sauvegarde des références
-        character_data = {
+        return {
             "name": name,
             "description": description,
             "style": style,
-            "reference_sheet": result["images"][0],
+            "reused": False,
+            "reference_hash": reference_hash,
+            "reference_sheet": dataset["reference_images"][0],
+            "reference_images": dataset["reference_images"],
             "variations": result["images"],
             "seed": result["seed"],
-            "generation_params": payload
+            "generation_params": payload,
+            "visual_features": visual_features,
+            "lora_dataset": dataset
         }
+    
+    async def _extract_visual_features(self, images: List[str]) -> Dict[str, Any]:
+        """Embedding CLIP moyen des images de référence (Character.visual_features)"""
         
-        # Extraction des features pour LoRA training
-        character_data["lora_dataset"] = await self._prepare_lora_dataset(
-            character_data["variations"]
-        )
+        result = await get_gpu_pool().post("/api/embed_images", {"images": images})
         
-        return character_data
+        embeddings = result["embeddings"]
+        dim = len(embeddings[0])
+        mean = [sum(e[d] for e in embeddings) / len(embeddings) for d in range(dim)]
+        
+        return {"embedding": mean, "model": result.get("model")}
     
     async def _prepare_lora_dataset(
         self,
-        images: List[str]
+        images: List[str],
+        dataset_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Prépare le dataset pour l'entraînement LoRA"""
+        """Prépare le dataset pour l'entraînement LoRA
         
-        dataset = {
-            "images": [],
-            "captions": []
-        }
+        Le preprocessing tourne dans le pool CPU et les images sont écrites
+        dans le blob store : le dataset ne contient que des clés. Les
+        variations quasi identiques (pHash proches) sont écartées.
+        """
+        
+        prefix = f"lora_datasets/{dataset_id or uuid.uuid4().hex}"
+        reference_keys = [f"{prefix}/references/{i:03d}.png" for i in range(len(images))]
+        dataset_keys = [f"{prefix}/{i:03d}.png" for i in range(len(images))]
         
-        for i, img_b64 in enumerate(images):
-            # Conversion et preprocessing
-            img_data = base64.b64decode(img_b64)
-            img = Image.open(io.BytesIO(img_data))
-            
-            # Redimensionnement pour training
-            img_resized = img.resize((512, 512), Image.LANCZOS)
-            
-            # Sauvegarde temporaire
-            buffer = io.BytesIO()
-            img_resized.save(buffer, format="PNG")
-            
-            dataset["images"].append(base64.b64encode(buffer.getvalue()).decode())
-            dataset["captions"].append(f"character reference {i+1}")
-        
-        return dataset
+        hashes = await asyncio.gather(*[
+            run_cpu_bound(preprocess_lora_image, img_b64, reference_key, dataset_key)
+            for img_b64, reference_key, dataset_key in zip(images, reference_keys, dataset_keys)
+        ])
+        
+        kept = dedupe_by_hash(hashes, settings.REFERENCE_PHASH_MAX_DISTANCE)
+        
+        # Le trainer ne prend que les images accompagnées d'une caption
+        store = get_blob_store()
+        captions = []
+        for rank, i in enumerate(kept):
+            caption = f"character reference {rank+1}"
+            await asyncio.to_thread(
+                store.put,
+                dataset_keys[i].rsplit(".", 1)[0] + ".txt",
+                caption.encode(),
+                "text/plain"
+            )
+            captions.append(caption)
+        
+        for i in set(range(len(images))) - set(kept):
+            await asyncio.to_thread(store.delete, dataset_keys[i])
+        
+        return {
+            "prefix": prefix,
+            "images": [dataset_keys[i] for i in kept],
+            "captions": captions,
+            "reference_images": reference_keys,
+            "image_hashes": list(hashes),
+            "kept_indices": kept
+        }
     
-    async def train_character_lora(
+    async def start_lora_training(
         self,
         character_id: str,
         dataset: Dict[str, Any]
-    ) -> str:
-        """Entraîne un LoRA spécifique pour un personnage"""
+    ) -> Dict[str, Any]:
+        """Lance l'entraînement du LoRA d'un personnage sans attendre sa fin
+        
+        Le serveur répond tout de suite avec l'identifiant de la tâche
+        d'entraînement ({task_id, status, estimated_time}) ; le LoRA est
+        déposé sous `lora_key` dans le blob store une fois entraîné. La
+        fiche est marquée en cours d'entraînement : une réutilisation ne
+        relance pas le même entraînement.
+        """
         
+        output_key = lora_key(dataset["reference_hash"])
         training_config = {
             "model_name": f"character_{character_id}",
             "base_model": "animefull-final-pruned",
             "dataset": dataset,
+            "output_key": output_key,
             "training_steps": 1000,
             "learning_rate": 1e-4,
             "batch_size": 2,
             "gradient_accumulation_steps": 2
         }
         
-        # Lancement du training asynchrone
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.sd_endpoint}/api/train_lora",
-                json=training_config
-            ) as resp:
-                result = await resp.json()
-        
-        return result["lora_path"]
+        result = await get_gpu_pool().post("/api/train_lora", training_config)
+        await self.reference_library.set_lora_training(dataset["reference_hash"], result["task_id"])
+        return {**result, "lora_key": output_key}
@@ -0,0 +1,156 @@
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select
+from PIL import Image
+import numpy as np
+import unicodedata
+import hashlib
+import re
+
+from core.database import async_session_maker
+from models.character import ReferenceSheet
+
+PHASH_SIZE = 32
+PHASH_LOW_FREQ = 8
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+_DCT = _dct_matrix(PHASH_SIZE)
+
+def normalize_description(description: str) -> str:
+    """Normalise une description visuelle (casse, accents, ponctuation, ordre des tags)"""
+
+    text = unicodedata.normalize("NFKC", description).lower()
+    tags = set()
+    for tag in re.split(r"[,;\n]+", text):
+        tag = re.sub(r"[^\w\s-]", " ", tag)
+        tag = " ".join(tag.split())
+        if tag:
+            tags.add(tag)
+    return ", ".join(sorted(tags))
+
+def description_hash(description: str, style: str) -> str:
+    """Clé de la bibliothèque : même description normalisée + même style"""
+
+    normalized = normalize_description(description)
+    return hashlib.sha256(f"{style}|{normalized}".encode()).hexdigest()
+
+def lora_key(reference_hash: str) -> str:
+    """Clé du LoRA d'une fiche dans le blob store, écrite par le serveur GPU en fin d'entraînement"""
+    return f"loras/{reference_hash[:16]}.safetensors"
+
+def perceptual_hash(img: Image.Image) -> int:
+    """pHash 64 bits : signe des basses fréquences DCT par rapport à la médiane"""
+
+    gray = img.convert("L").resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.float64)
+
+    coeffs = _DCT @ pixels @ _DCT.T
+    low = coeffs[:PHASH_LOW_FREQ, :PHASH_LOW_FREQ].flatten()
+
+    # Le coefficient DC (luminosité moyenne) est exclu du calcul de la médiane
+    bits = low > np.median(low[1:])
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+def dedupe_by_hash(hashes: List[int], max_distance: int) -> List[int]:
+    """Indices des images à garder : une image trop proche d'une image gardée est écartée"""
+
+    kept = []
+    for i, h in enumerate(hashes):
+        if all(hamming_distance(h, hashes[j]) > max_distance for j in kept):
+            kept.append(i)
+    return kept
+
+class ReferenceLibrary:
+    """Bibliothèque des fiches personnages, partagée entre projets et chapitres"""
+
+    def __init__(self, session_maker=async_session_maker):
+        self.session_maker = session_maker
+
+    async def find(
+        self,
+        description: str,
+        style: str
+    ) -> Optional[Dict[str, Any]]:
+        """Cherche une fiche existante pour la même description et le même style"""
+
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(ReferenceSheet)
+                .where(ReferenceSheet.description_hash == description_hash(description, style))
+                .order_by(ReferenceSheet.created_at.desc())
+                .limit(1)
+            )
+            sheet = result.scalars().first()
+
+        if sheet is None:
+            return None
+
+        return {
+            "id": str(sheet.id),
+            "description_hash": sheet.description_hash,
+            "reference_images": sheet.reference_images,
+            "image_hashes": [int(h, 16) for h in sheet.image_hashes or []],
+            "dataset_prefix": sheet.dataset_prefix,
+            "lora_path": sheet.lora_path,
+            "lora_task_id": sheet.lora_task_id,
+            "generation_params": sheet.generation_params,
+            "visual_features": sheet.visual_features
+        }
+
+    async def register(
+        self,
+        description: str,
+        style: str,
+        reference_images: List[str],
+        image_hashes: List[int],
+        dataset_prefix: str,
+        generation_params: Dict[str, Any],
+        visual_features: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Enregistre une nouvelle fiche dans la bibliothèque"""
+
+        sheet = ReferenceSheet(
+            description_hash=description_hash(description, style),
+            style=style,
+            description=normalize_description(description),
+            reference_images=reference_images,
+            image_hashes=[f"{h:016x}" for h in image_hashes],
+            dataset_prefix=dataset_prefix,
+            generation_params=generation_params,
+            visual_features=visual_features
+        )
+
+        async with self.session_maker() as session:
+            session.add(sheet)
+            await session.commit()
+
+        return sheet.description_hash
+
+    async def set_lora_training(self, reference_hash: str, task_id: Optional[str]) -> None:
+        """Marque l'entraînement en cours du LoRA de ces fiches (None : abandonné)"""
+
+        await self._update(reference_hash, lora_task_id=task_id)
+
+    async def attach_lora(self, reference_hash: str, lora_path: str) -> None:
+        """Associe un LoRA entraîné aux fiches de cette description"""
+
+        await self._update(reference_hash, lora_path=lora_path, lora_task_id=None)
+
+    async def _update(self, reference_hash: str, **values: Any) -> None:
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(ReferenceSheet)
+                .where(ReferenceSheet.description_hash == reference_hash)
+            )
+            for sheet in result.scalars():
+                for name, value in values.items():
+                    setattr(sheet, name, value)
+            await session.commit()
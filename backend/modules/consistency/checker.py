@@ -0,0 +1,102 @@
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+from core.config import settings
+from modules.consistency.vector_index import FlatVectorIndex
+
+class CharacterConsistencyChecker:
+    """Détecte en lot les cases où un personnage dérive de sa fiche de référence"""
+
+    def __init__(
+        self,
+        index: Optional[FlatVectorIndex] = None,
+        threshold: Optional[float] = None
+    ):
+        self.index = index or FlatVectorIndex.load(settings.VECTOR_INDEX_PATH)
+        self.threshold = threshold if threshold is not None else settings.CONSISTENCY_THRESHOLD
+
+    @staticmethod
+    def character_key(character: Dict[str, Any]) -> str:
+        return str(character.get("id") or character["name"])
+
+    @staticmethod
+    def panel_characters(panel: Dict[str, Any]) -> List[str]:
+        """Personnages assignés à la case, muets compris, puis ceux qui y parlent"""
+
+        names = list(panel.get("characters") or [])
+        for dialogue in panel.get("dialogue", []):
+            name = dialogue.get("character")
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    def index_characters(
+        self,
+        characters: List[Dict[str, Any]],
+        persist: bool = True
+    ) -> int:
+        """Indexe les embeddings de Character.visual_features["embedding"]"""
+
+        keys, vectors = [], []
+        for character in characters:
+            embedding = (character.get("visual_features") or {}).get("embedding")
+            if embedding:
+                keys.append(self.character_key(character))
+                vectors.append(embedding)
+
+        if keys:
+            self.index.add(keys, np.asarray(vectors, dtype=np.float32))
+            if persist and self.index.path:
+                self.index.merge_and_save()
+
+        return len(keys)
+
+    def find_drifted_panels(
+        self,
+        panels: List[Dict[str, Any]],
+        characters: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Retourne les cases sous le seuil de similarité, avec le pire score par case
+
+        Chaque case fournit soit "character_embeddings" ({nom: vecteur}, crops
+        par personnage), soit un "embedding" global comparé à chaque personnage
+        assigné à la case ("characters") ou présent dans ses dialogues.
+        """
+
+        keys_by_name = {c["name"]: self.character_key(c) for c in characters}
+
+        panel_numbers, names, queries = [], [], []
+        for panel in panels:
+            per_character = panel.get("character_embeddings") or {}
+            present = per_character.keys() or self.panel_characters(panel)
+            for name in present:
+                key = keys_by_name.get(name)
+                vector = per_character.get(name, panel.get("embedding"))
+                if key is None or key not in self.index or vector is None:
+                    continue
+                panel_numbers.append(panel["panel_number"])
+                names.append(name)
+                queries.append(vector)
+
+        if not queries:
+            return []
+
+        # Une seule multiplication pour toutes les paires (case, personnage)
+        scores = self.index.similarity(
+            np.asarray(queries, dtype=np.float32),
+            [keys_by_name[name] for name in names]
+        )
+
+        drifted: Dict[int, Dict[str, Any]] = {}
+        for panel_number, name, score in zip(panel_numbers, names, scores):
+            if score >= self.threshold:
+                continue
+            worst = drifted.get(panel_number)
+            if worst is None or score < worst["score"]:
+                drifted[panel_number] = {
+                    "panel_number": panel_number,
+                    "character": name,
+                    "score": float(score)
+                }
+
+        return sorted(drifted.values(), key=lambda d: d["panel_number"])
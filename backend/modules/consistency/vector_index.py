@@ -0,0 +1,146 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from pathlib import Path
+import fcntl
+import numpy as np
+import os
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class FlatVectorIndex:
+    """Index vectoriel plat en mémoire (similarité cosinus), persisté en .npz
+
+    Quelques centaines de personnages tiennent dans une seule matrice :
+    une recherche exacte par produit matriciel reste plus rapide qu'un IVF.
+    """
+
+    def __init__(self, dim: Optional[int] = None, path: Optional[str] = None):
+        self.dim = dim
+        self.path = path
+        self.ids: List[str] = []
+        self.vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._positions
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Ajoute ou remplace des vecteurs (normalisés à l'insertion)"""
+
+        vectors = _normalize(vectors)
+        if len(ids) != len(vectors):
+            raise ValueError("ids et vectors doivent avoir la même longueur")
+
+        if self.dim is None or not self.ids:
+            self.dim = vectors.shape[1]
+            self.vectors = self.vectors.reshape(0, self.dim)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Dimension {vectors.shape[1]} != {self.dim}")
+
+        new_ids, new_rows = [], []
+        for item_id, vector in zip(ids, vectors):
+            pos = self._positions.get(item_id)
+            if pos is None:
+                self._positions[item_id] = len(self.ids) + len(new_ids)
+                new_ids.append(item_id)
+                new_rows.append(vector)
+            elif pos < len(self.ids):
+                self.vectors[pos] = vector
+            else:
+                # Id répété dans le même lot : le dernier vecteur gagne
+                new_rows[pos - len(self.ids)] = vector
+
+        if new_ids:
+            self.ids.extend(new_ids)
+            self.vectors = np.vstack([self.vectors, np.stack(new_rows)])
+
+    def remove(self, ids: Sequence[str]) -> None:
+        drop = {self._positions[i] for i in ids if i in self._positions}
+        if not drop:
+            return
+
+        keep = [pos for pos in range(len(self.ids)) if pos not in drop]
+        self.ids = [self.ids[pos] for pos in keep]
+        self.vectors = self.vectors[keep]
+        self._positions = {item_id: pos for pos, item_id in enumerate(self.ids)}
+
+    def get(self, item_id: str) -> Optional[np.ndarray]:
+        pos = self._positions.get(item_id)
+        return None if pos is None else self.vectors[pos]
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 1
+    ) -> Tuple[List[List[str]], np.ndarray]:
+        """k plus proches voisins pour un lot de requêtes (m, dim)"""
+
+        queries = _normalize(queries)
+        if not self.ids:
+            return [[] for _ in range(len(queries))], np.zeros((len(queries), 0), dtype=np.float32)
+
+        k = min(k, len(self.ids))
+        scores = queries @ self.vectors.T
+
+        # argpartition O(n) puis tri des k meilleurs seulement
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return [[self.ids[pos] for pos in row] for row in top], top_scores
+
+    def similarity(self, queries: np.ndarray, ids: Sequence[str]) -> np.ndarray:
+        """Similarité cosinus entre chaque requête et l'id correspondant (appariement 1-1)"""
+
+        queries = _normalize(queries)
+        positions = np.array([self._positions[i] for i in ids], dtype=np.int64)
+        return np.einsum("ij,ij->i", queries, self.vectors[positions])
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = Path(path or self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Écriture atomique pour les lecteurs concurrents (autres workers)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, ids=np.array(self.ids, dtype=str), vectors=self.vectors)
+        os.replace(tmp_path, path)
+
+    def merge_and_save(self, path: Optional[str] = None) -> None:
+        """Sauvegarde sans perdre les ajouts concurrents d'autres process
+
+        Le fichier est relu sous verrou exclusif : les ids qu'il est seul à
+        contenir sont repris, les vecteurs en mémoire l'emportent pour les autres.
+        """
+
+        path = Path(path or self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(path.with_name(f".{path.name}.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            on_disk = FlatVectorIndex.load(str(path))
+            missing = [item_id for item_id in on_disk.ids if item_id not in self]
+            if missing:
+                self.add(missing, on_disk.vectors[[on_disk._positions[i] for i in missing]])
+            self.save(str(path))
+
+    @classmethod
+    def load(cls, path: str) -> "FlatVectorIndex":
+        if not Path(path).exists():
+            return cls(path=path)
+
+        with np.load(path) as data:
+            index = cls(dim=data["vectors"].shape[1], path=path)
+            index.ids = [str(i) for i in data["ids"]]
+            index.vectors = data["vectors"].astype(np.float32)
+        index._positions = {item_id: pos for pos, item_id in enumerate(index.ids)}
+        return index
@@ -0,0 +1,123 @@
+from typing import List, Sequence, Tuple
+from PIL import Image
+import base64
+import io
+
+# Format -> (format Pillow, type MIME, extension)
+ANIMATION_FORMATS = {
+    "gif": ("GIF", "image/gif", "gif"),
+    "webp": ("WEBP", "image/webp", "webp"),
+    "apng": ("PNG", "image/apng", "png"),
+}
+
+def shared_palette(frames: Sequence[Image.Image], colors: int = 256, sample_width: int = 128) -> Image.Image:
+    """Palette unique pour toute la séquence
+
+    Calculée une fois sur une mosaïque de vignettes d'au plus 16 frames
+    réparties dans la séquence, au lieu d'une quantification par frame.
+    """
+
+    step = max(1, len(frames) // 16)
+    thumbs = []
+    for frame in frames[::step]:
+        height = max(1, round(frame.height * sample_width / frame.width))
+        thumbs.append(frame.convert("RGB").resize((sample_width, height), Image.BILINEAR))
+
+    mosaic = Image.new("RGB", (sample_width, sum(t.height for t in thumbs)))
+    y = 0
+    for thumb in thumbs:
+        mosaic.paste(thumb, (0, y))
+        y += thumb.height
+
+    return mosaic.quantize(colors=colors, method=Image.Quantize.MEDIANCUT)
+
+def merge_duplicate_frames(
+    frames: Sequence[Image.Image],
+    durations: Sequence[int]
+) -> Tuple[List[Image.Image], List[int]]:
+    """Fusionne les frames identiques consécutives en allongeant la durée de la première"""
+
+    merged_frames: List[Image.Image] = []
+    merged_durations: List[int] = []
+    previous = None
+    for frame, duration in zip(frames, durations):
+        data = frame.tobytes()
+        if previous == data:
+            merged_durations[-1] += duration
+            continue
+        merged_frames.append(frame)
+        merged_durations.append(duration)
+        previous = data
+    return merged_frames, merged_durations
+
+def encode_animation(
+    frames: Sequence[Image.Image],
+    durations: Sequence[int],
+    format: str = "gif",
+    loop: int = 0
+) -> bytes:
+    """Encode une séquence en GIF, WebP animé ou APNG
+
+    GIF et APNG sont remappés sur une palette partagée, sans tramage : un
+    pixel inchangé garde le même index d'une frame à l'autre, si bien que
+    les encodeurs (delta par rectangle englobant chez Pillow, libwebp en
+    WebP) n'écrivent que la zone qui bouge réellement.
+    """
+
+    pillow_format = ANIMATION_FORMATS[format][0]
+
+    if format in ("gif", "apng"):
+        palette = shared_palette(frames)
+        frames = [
+            frame.convert("RGB").quantize(palette=palette, dither=Image.Dither.NONE)
+            for frame in frames
+        ]
+    else:
+        frames = [frame.convert("RGB") for frame in frames]
+
+    frames, durations = merge_duplicate_frames(frames, durations)
+
+    buffer = io.BytesIO()
+    options = {
+        "save_all": True,
+        "append_images": frames[1:],
+        "duration": durations,
+        "loop": loop,
+    }
+    if format == "gif":
+        options["optimize"] = False  # Conserve la palette globale partagée
+    elif format == "webp":
+        options.update(quality=75, method=4, minimize_size=True)
+
+    frames[0].save(buffer, format=pillow_format, **options)
+    return buffer.getvalue()
+
+def compose_animation(
+    animations: Sequence[Tuple[Sequence[str], float]],
+    width: int = 512,
+    format: str = "gif"
+) -> bytes:
+    """Enchaîne les animations de plusieurs cases en une seule (exécuté dans le pool CPU)
+
+    `animations` liste, pour chaque case, ses frames en base64 et son fps.
+    Les cases sans frame sont ignorées.
+    """
+
+    frames: List[Image.Image] = []
+    durations: List[int] = []
+    for frames_b64, fps in animations:
+        duration = max(20, round(1000 / max(fps, 1)))
+        for frame_b64 in frames_b64:
+            frame = Image.open(io.BytesIO(base64.b64decode(frame_b64)))
+            height = max(1, round(frame.height * width / frame.width))
+            frames.append(frame.convert("RGB").resize((width, height), Image.LANCZOS))
+            durations.append(duration)
+
+    if not frames:
+        raise ValueError("Aucune frame reçue du serveur GPU pour les cases animées")
+
+    # Toutes les frames doivent avoir la taille de la première
+    size = frames[0].size
+    frames = [frame if frame.size == size else frame.resize(size, Image.LANCZOS) for frame in frames]
+
+    return encode_animation(frames, durations, format)
@@ -0,0 +1,65 @@
+from typing import Optional
+from functools import lru_cache
+from PIL import Image, ImageChops, ImageCms
+
+from core.config import settings
+
+# Valeurs numériques des intents ICC (stables entre versions de Pillow)
+RENDERING_INTENTS = {
+    "perceptual": 0,
+    "relative_colorimetric": 1,
+    "saturation": 2,
+    "absolute_colorimetric": 3,
+}
+
+@lru_cache(maxsize=8)
+def get_print_transform(profile_path: str, intent: str) -> ImageCms.ImageCmsTransform:
+    """Transformation sRGB -> profil presse, construite une fois par process"""
+
+    srgb = ImageCms.createProfile("sRGB")
+    press = ImageCms.getOpenProfile(profile_path)
+    return ImageCms.buildTransform(
+        srgb,
+        press,
+        "RGB",
+        "CMYK",
+        renderingIntent=RENDERING_INTENTS[intent]
+    )
+
+def is_grayscale(img: Image.Image, tolerance: int = 2) -> bool:
+    """Vrai si la page n'a pas de couleur (écart entre canaux <= tolérance)"""
+
+    if img.mode in ("1", "L", "LA"):
+        return True
+    if img.mode == "CMYK":
+        return False
+
+    r, g, b = img.convert("RGB").split()
+    return (
+        ImageChops.difference(r, g).getextrema()[1] <= tolerance and
+        ImageChops.difference(g, b).getextrema()[1] <= tolerance
+    )
+
+def to_print_cmyk(
+    img: Image.Image,
+    profile_path: Optional[str] = None,
+    intent: Optional[str] = None
+) -> Image.Image:
+    """Convertit une image RGB vers l'espace CMYK de la presse
+
+    Sans profil configuré (PRINT_ICC_PROFILE), repli sur la conversion
+    naïve de Pillow. RGB -> CMYK change le nombre de canaux : la
+    transformation ne peut pas s'appliquer sur place.
+    """
+
+    profile_path = profile_path or settings.PRINT_ICC_PROFILE
+    if img.mode == "CMYK":
+        return img
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    if not profile_path:
+        return img.convert("CMYK")
+
+    transform = get_print_transform(profile_path, intent or settings.PRINT_RENDERING_INTENT)
+    return ImageCms.applyTransform(img, transform)
@@ -1,72 +1,55 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence
 import asyncio
+import hashlib
 from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from PIL import Image
-import io
-import base64
 
 from core.config import settings
+from services.cpu_pool import run_cpu_bound
+from services.gpu_pool import get_gpu_pool
+from services.storage import BlobStore, get_blob_store
+from modules.export.animation import ANIMATION_FORMATS, compose_animation
+from modules.export.pages import load_page_image, page_ref
+from modules.export.pipeline import ExportPipeline
+from modules.export.webtoon import WEBTOON_WIDTH, WebtoonStripBuilder
 
 class MangaExporter:
-    def __init__(self):
+    def __init__(self, store: Optional[BlobStore] = None):
         self.dpi = settings.DEFAULT_DPI
         self.page_size = A4  # (595, 842) points at 72dpi
+        self.store = store or get_blob_store()
         
-    async def export_to_pdf(
+    async def export(
         self,
         project_id: str,
         pages: List[Dict[str, Any]],
+        formats: Sequence[str] = ("pdf",),
         export_format: str = "print"
-    ) -> str:
-        """Exporte le manga en PDF haute qualité"""
+    ) -> Dict[str, str]:
+        """Exporte dans plusieurs formats (pdf, cbz, epub, webp) en une seule passe
         
-        # Buffer pour le PDF
-        pdf_buffer = io.BytesIO()
+        Chaque page est décodée et rééchantillonnée une fois, puis fournie
+        à tous les writers : demander trois formats coûte à peine plus qu'un.
+        Retourne l'URL de chaque format.
+        """
         
-        # Création du canvas
-        c = canvas.Canvas(
-            pdf_buffer,
-            pagesize=self.page_size
-        )
+        pipeline = ExportPipeline(self.store, self.dpi, self.page_size)
+        return await pipeline.run(project_id, pages, formats, export_format)
+    
+    async def export_to_pdf(
+        self,
+        project_id: str,
+        pages: List[Dict[str, Any]],
+        export_format: str = "print"
+    ) -> str:
+        """Exporte le manga en PDF haute qualité
         
-        # Métadonnées
-        c.setAuthor("Manga Factory AI")
-        c.setTitle(f"Manga Project {project_id}")
-        
-        # Ajout des pages
-        for i, page_data in enumerate(pages):
-            if i > 0:
-                c.showPage()
-            
-            # Conversion haute résolution
-            page_image = await self._prepare_page_for_print(
-                page_data["full_page_image"],
-                export_format
-            )
-            
-            # Ajout au PDF
-            img_reader = ImageReader(page_image)
-            c.drawImage(
-                img_reader,
-                0, 0,
-                width=self.page_size[0],
-                height=self.page_size[1],
-                preserveAspectRatio=True
-            )
-        
-        # Finalisation
-        c.save()
-        pdf_buffer.seek(0)
-        
-        # Upload vers S3
-        pdf_url = await self._upload_to_s3(
-            pdf_buffer.getvalue(),
-            f"exports/{project_id}/manga.pdf"
-        )
+        Les pages sont préparées en parallèle dans le pool CPU puis écrites
+        dans l'ordre dans un upload multipart ; seules les pages modifiées
+        depuis le dernier export sont re-rendues (voir ExportPipeline).
+        """
         
-        return pdf_url
+        urls = await self.export(project_id, pages, ["pdf"], export_format)
+        return urls["pdf"]
     
     async def export_to_webtoon(
         self,
@@ -78,52 +61,68 @@ class MangaExporter:
         # Concaténation verticale des pages
         webtoon_strips = []
         
-        for chapter_pages in self._group_by_chapter(pages):
-            strip = await self._create_webtoon_strip(chapter_pages)
+        for chapter_number, chapter_pages in self._group_by_chapter(pages).items():
+            strip = await self._create_webtoon_strip(project_id, chapter_number, chapter_pages)
             webtoon_strips.append(strip)
         
         return {
             "format": "webtoon",
             "strips": webtoon_strips,
             "dimensions": {
-                "width": 800,
+                "width": WEBTOON_WIDTH,
                 "height": "variable"
             }
         }
     
-    async def _prepare_page_for_print(
+    @staticmethod
+    def _group_by_chapter(pages: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+        """Pages regroupées par chapitre, triées par numéro de page"""
+        
+        chapters: Dict[int, List[Dict[str, Any]]] = {}
+        for page in sorted(pages, key=lambda p: (p.get("chapter_number", 1), p.get("page_number", 0))):
+            chapters.setdefault(page.get("chapter_number", 1), []).append(page)
+        return chapters
+    
+    async def _create_webtoon_strip(
         self,
-        page_image_b64: str,
-        format: str
-    ) -> Image.Image:
-        """Prépare une page pour l'impression haute qualité"""
-        
-        # Décodage
-        img_data = base64.b64decode(page_image_b64)
-        img = Image.open(io.BytesIO(img_data))
-        
-        if format == "print":
-            # Redimensionnement à 600 DPI
-            target_width = int(8.27 * self.dpi)  # A4 width in inches
-            target_height = int(11.69 * self.dpi)  # A4 height in inches
-            
-            img = img.resize(
-                (target_width, target_height),
-                Image.LANCZOS
-            )
-            
-            # Conversion CMYK pour impression
-            if img.mode != "CMYK":
-                img = img.convert("CMYK")
-        
-        return img
+        project_id: str,
+        chapter_number: int,
+        chapter_pages: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Bande verticale d'un chapitre, découpée en tranches stockées au fil de l'eau"""
+        
+        builder = WebtoonStripBuilder(
+            self.store,
+            f"exports/{project_id}/webtoon/chapter_{chapter_number:03d}"
+        )
+        
+        for page_data in chapter_pages:
+            await asyncio.to_thread(self._add_page_to_strip, builder, page_ref(page_data))
+        
+        slices = await asyncio.to_thread(builder.finish)
+        return {
+            "chapter_number": chapter_number,
+            "slices": slices,
+            "height": builder.total_height
+        }
+    
+    @staticmethod
+    def _add_page_to_strip(builder: WebtoonStripBuilder, ref: Dict[str, str]) -> None:
+        img = load_page_image(ref)
+        builder.add_page(img)
+        img.close()
     
     async def create_animated_preview(
         self,
         panels: List[Dict[str, Any]],
         animation_params: Dict[str, Any]
     ) -> str:
-        """Crée un GIF animé à partir de certaines cases"""
+        """Crée un aperçu animé (GIF, WebP ou APNG) à partir de certaines cases
+        
+        Les animations de cases sont générées en parallèle, au plus
+        ANIMATION_CONCURRENCY à la fois, puis enchaînées et encodées avec
+        une palette partagée dans le pool CPU.
+        """
         
         animated_panels = [
             p for p in panels 
@@ -133,16 +132,40 @@ class MangaExporter:
         if not animated_panels:
             return None
         
-        # Utilisation d'AnimateDiff v3
-        animations = []
-        for panel in animated_panels:
-            anim = await self._generate_panel_animation(
-                panel,
-                animation_params
-            )
-            animations.append(anim)
+        # Utilisation d'AnimateDiff v3, génération concurrente bornée
+        semaphore = asyncio.Semaphore(settings.ANIMATION_CONCURRENCY)
         
-        # Composition en GIF
-        gif_url = await self._compose_gif(animations)
+        async def generate(panel: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._generate_panel_animation(panel, animation_params)
         
-        return gif_url
+        animations = await asyncio.gather(*[generate(panel) for panel in animated_panels])
+        
+        # Composition et encodage
+        output_format = animation_params.get("format", "gif")
+        _, content_type, extension = ANIMATION_FORMATS[output_format]
+        data = await run_cpu_bound(
+            compose_animation,
+            [(anim["frames"], anim.get("fps", 8)) for anim in animations],
+            animation_params.get("width", 512),
+            output_format
+        )
+        
+        key = f"previews/animations/{hashlib.sha256(data).hexdigest()[:20]}.{extension}"
+        await asyncio.to_thread(self.store.put, key, data, content_type)
+        return self.store.url(key)
+    
+    async def _generate_panel_animation(
+        self,
+        panel: Dict[str, Any],
+        animation_params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Anime une case via le serveur GPU (frames en base64 + fps)"""
+        
+        return await get_gpu_pool().post("/api/animate", {
+            "image": panel["image"],
+            "prompt": panel.get("description", ""),
+            "frames": animation_params.get("frames", 16),
+            "fps": animation_params.get("fps", 8),
+            "motion_strength": animation_params.get("motion_strength", 1.0)
+        })
@@ -0,0 +1,81 @@
+from typing import Dict, Any, Iterable, List, Optional
+import hashlib
+import json
+
+from services.storage import BlobStore
+
+# À incrémenter quand le rendu change : invalide tous les caches de pages
+EXPORT_PIPELINE_VERSION = 1
+
+def settings_digest(**export_settings: Any) -> str:
+    """Empreinte des réglages d'export qui influent sur le rendu d'une page"""
+    payload = json.dumps(
+        {"version": EXPORT_PIPELINE_VERSION, **export_settings},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def page_content_hash(digest: str, page_data: bytes) -> str:
+    """Empreinte d'une page : octets de l'image source + réglages d'export"""
+    h = hashlib.sha256(digest.encode())
+    h.update(page_data)
+    return h.hexdigest()
+
+class ExportManifest:
+    """Manifeste d'export d'un projet pour un format donné
+
+    Associe chaque numéro de page à l'empreinte de ses entrées et à
+    l'artefact déjà rendu (flux compressé de la page) : seules les pages
+    dont l'empreinte change sont rendues à nouveau.
+    """
+
+    def __init__(
+        self,
+        store: BlobStore,
+        project_id: str,
+        format: str,
+        pages: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        self.store = store
+        self.project_id = project_id
+        self.format = format
+        self.pages: Dict[str, Dict[str, Any]] = pages or {}
+
+    @property
+    def key(self) -> str:
+        return f"exports/{self.project_id}/{self.format}/manifest.json"
+
+    def page_prefix(self, page_number: int) -> str:
+        return f"exports/{self.project_id}/{self.format}/pages/page_{page_number:03d}"
+
+    @classmethod
+    def load(cls, store: BlobStore, project_id: str, format: str) -> "ExportManifest":
+        manifest = cls(store, project_id, format)
+        if store.exists(manifest.key):
+            manifest.pages = json.loads(store.get(manifest.key))["pages"]
+        return manifest
+
+    def get(self, page_number: int) -> Optional[Dict[str, Any]]:
+        return self.pages.get(str(page_number))
+
+    def set(self, page_number: int, entry: Dict[str, Any]) -> Optional[str]:
+        """Enregistre l'artefact d'une page ; retourne la clé de l'ancien s'il est périmé"""
+        previous = self.pages.get(str(page_number))
+        self.pages[str(page_number)] = entry
+        if previous and previous["key"] != entry["key"]:
+            return previous["key"]
+        return None
+
+    def prune(self, page_numbers: Iterable[int]) -> List[str]:
+        """Retire les pages disparues du projet ; retourne les clés à supprimer"""
+        keep = {str(n) for n in page_numbers}
+        stale = [n for n in self.pages if n not in keep]
+        return [self.pages.pop(n)["key"] for n in stale]
+
+    def save(self) -> None:
+        self.store.put(
+            self.key,
+            json.dumps({"format": self.format, "pages": self.pages}, sort_keys=True).encode(),
+            content_type="application/json"
+        )
@@ -0,0 +1,120 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from PIL import Image
+import io
+import base64
+
+from services.storage import get_blob_store
+from modules.export.pdf_stream import EncodedImage, encode_image
+from modules.export.color import is_grayscale, to_print_cmyk
+from modules.export.manifest import page_content_hash
+
+# Clés acceptées pour l'image d'une page, par ordre de préférence
+PAGE_IMAGE_KEYS = ("lettered_image_key", "image_key")
+
+# Rendu « liseuse » partagé par CBZ, EPUB et WebP
+READER_HEIGHT = 1920
+READER_JPEG_QUALITY = 85
+READER_WEBP_QUALITY = 80
+
+def page_ref(page_data: Dict[str, Any]) -> Dict[str, str]:
+    """Référence minimale d'une page à envoyer aux workers (clé blob ou base64)"""
+    for name in PAGE_IMAGE_KEYS:
+        if page_data.get(name):
+            return {"key": page_data[name]}
+    return {"b64": page_data["full_page_image"]}
+
+def read_page_bytes(ref: Dict[str, str]) -> bytes:
+    if "key" in ref:
+        return get_blob_store().get(ref["key"])
+    return base64.b64decode(ref["b64"])
+
+def load_page_image(ref: Dict[str, str]) -> Image.Image:
+    img = Image.open(io.BytesIO(read_page_bytes(ref)))
+    img.load()
+    return img
+
+def render_print_page(img: Image.Image, format: str, dpi: int) -> EncodedImage:
+    """Prépare une page pour l'impression haute qualité (l'image source n'est pas modifiée)"""
+
+    black_only = False
+
+    if format == "print":
+        # Pages sans couleur : un seul canal, resampling 3x moins cher et K pur
+        black_only = is_grayscale(img)
+        img = img.convert("L") if black_only else img.convert("RGB")
+
+        # Redimensionnement à 600 DPI
+        target_width = int(8.27 * dpi)  # A4 width in inches
+        target_height = int(11.69 * dpi)  # A4 height in inches
+
+        img = img.resize(
+            (target_width, target_height),
+            Image.LANCZOS
+        )
+
+        # Conversion CMYK calibrée pour impression
+        if not black_only:
+            img = to_print_cmyk(img)
+
+    return encode_image(img, black_only=black_only)
+
+def print_page_output(
+    page_data: bytes,
+    open_image: Callable[[], Image.Image],
+    format: str,
+    dpi: int,
+    digest: str,
+    page_prefix: str,
+    cached: Optional[Dict[str, Any]] = None
+) -> Tuple[Dict[str, Any], EncodedImage]:
+    """Rend une page pour le PDF ou réutilise son rendu en cache
+
+    Si l'empreinte de la page (image source + réglages) correspond au
+    manifeste, le flux stocké est relu tel quel, sans décodage ni
+    resampling. Sinon la page est rendue et son flux déposé dans le store.
+    """
+
+    store = get_blob_store()
+    content_hash = page_content_hash(digest, page_data)
+
+    if cached and cached["hash"] == content_hash and store.exists(cached["key"]):
+        return cached, EncodedImage(
+            width=cached["width"],
+            height=cached["height"],
+            color_space=cached["color_space"],
+            data=store.get(cached["key"]),
+            filter=cached["filter"],
+            decode=cached.get("decode")
+        )
+
+    encoded = render_print_page(open_image(), format, dpi)
+
+    key = f"{page_prefix}_{content_hash[:16]}.bin"
+    store.put(key, encoded.data, content_type="application/octet-stream")
+    entry = {
+        "hash": content_hash,
+        "key": key,
+        "width": encoded.width,
+        "height": encoded.height,
+        "color_space": encoded.color_space,
+        "filter": encoded.filter,
+        "decode": encoded.decode
+    }
+    return entry, encoded
+
+def render_reader_page(img: Image.Image, height: int = READER_HEIGHT) -> Image.Image:
+    """Rendu écran : RGB (ou niveaux de gris), réduit à `height` si plus grand"""
+
+    img = img.convert("L") if is_grayscale(img) else img.convert("RGB")
+    if img.height > height:
+        width = max(1, round(img.width * height / img.height))
+        img = img.resize((width, height), Image.LANCZOS)
+    return img
+
+def encode_reader_image(img: Image.Image, format: str) -> bytes:
+    buffer = io.BytesIO()
+    if format == "webp":
+        img.save(buffer, format="WEBP", quality=READER_WEBP_QUALITY, method=4)
+    else:
+        img.save(buffer, format="JPEG", quality=READER_JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
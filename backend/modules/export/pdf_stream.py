@@ -0,0 +1,186 @@
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from PIL import Image
+import zlib
+
+PDF_COLOR_SPACES = {"L": "/DeviceGray", "RGB": "/DeviceRGB", "CMYK": "/DeviceCMYK"}
+
+# Canal noir seul : teinte 1 = 100 % K, sans passer par C, M et Y
+BLACK_SEPARATION = (
+    "[/Separation /Black /DeviceCMYK"
+    " << /FunctionType 2 /Domain [0 1] /C0 [0 0 0 0] /C1 [0 0 0 1] /N 1 >>]"
+)
+
+@dataclass(frozen=True)
+class EncodedImage:
+    """Image déjà compressée, prête à être écrite comme XObject PDF"""
+    width: int
+    height: int
+    color_space: str  # Nom PDF (/DeviceCMYK) ou tableau ([/Separation ...])
+    data: bytes
+    filter: str = "/FlateDecode"
+    decode: Optional[str] = None  # Ex. "[1 0]" pour inverser un canal unique
+
+def encode_image(
+    img: Image.Image,
+    black_only: bool = False,
+    strip_rows: int = 256
+) -> EncodedImage:
+    """Compresse une image en Flate par bandes horizontales
+
+    Les octets bruts ne sont jamais matérialisés en entier : seule une
+    bande de `strip_rows` lignes existe à la fois en plus du flux compressé.
+    Avec `black_only`, une image en niveaux de gris est écrite sur la seule
+    séparation noire (blanc = 0 % K).
+    """
+
+    if black_only and img.mode != "L":
+        img = img.convert("L")
+    if img.mode not in PDF_COLOR_SPACES:
+        img = img.convert("RGB")
+
+    width, height = img.size
+    compressor = zlib.compressobj(6)
+    chunks = []
+    for top in range(0, height, strip_rows):
+        strip = img.crop((0, top, width, min(top + strip_rows, height)))
+        chunks.append(compressor.compress(strip.tobytes()))
+    chunks.append(compressor.flush())
+
+    if black_only:
+        # Luminance 0 (noir) -> teinte 1 : inversion via /Decode, sans recopie
+        return EncodedImage(width, height, BLACK_SEPARATION, b"".join(chunks), decode="[1 0]")
+
+    return EncodedImage(
+        width=width,
+        height=height,
+        color_space=PDF_COLOR_SPACES[img.mode],
+        data=b"".join(chunks)
+    )
+
+def _pdf_string(value: str) -> bytes:
+    escaped = value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return f"({escaped})".encode("latin-1", "replace")
+
+class StreamingPDFWriter:
+    """Écriture incrémentale d'un PDF d'images, une page à la fois
+
+    Chaque page (image, contenu, objet page) est écrite dès qu'elle est
+    ajoutée ; seuls les offsets des objets sont gardés pour la table xref.
+    Le fichier cible n'a besoin que de write() : pas de seek, ce qui permet
+    d'écrire directement dans un upload multipart.
+    """
+
+    # Objets réservés, écrits à la fermeture
+    CATALOG_ID = 1
+    PAGES_ID = 2
+    INFO_ID = 3
+
+    def __init__(
+        self,
+        fileobj: BinaryIO,
+        title: Optional[str] = None,
+        author: Optional[str] = None
+    ):
+        self._file = fileobj
+        self._position = 0
+        self._offsets: Dict[int, int] = {}
+        self._page_ids: List[int] = []
+        self._next_id = 4
+        self.title = title
+        self.author = author
+
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._position += len(data)
+
+    def _allocate(self) -> int:
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write_object(self, obj_id: int, body: bytes, stream: Optional[bytes] = None) -> None:
+        self._offsets[obj_id] = self._position
+        self._write(f"{obj_id} 0 obj\n".encode())
+        self._write(body)
+        if stream is not None:
+            self._write(b"\nstream\n")
+            self._write(stream)
+            self._write(b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def add_image_page(self, img: Image.Image, page_size: Tuple[float, float]) -> None:
+        """Compresse et écrit une page ; l'image peut être libérée aussitôt après"""
+        self.add_encoded_page(encode_image(img), page_size)
+
+    def add_encoded_page(self, image: EncodedImage, page_size: Tuple[float, float]) -> None:
+        """Écrit une page à partir d'une image déjà compressée (centrée, ratio conservé)"""
+
+        page_w, page_h = page_size
+        scale = min(page_w / image.width, page_h / image.height)
+        draw_w, draw_h = image.width * scale, image.height * scale
+        x, y = (page_w - draw_w) / 2, (page_h - draw_h) / 2
+
+        image_id, content_id, page_id = self._allocate(), self._allocate(), self._allocate()
+
+        decode = f" /Decode {image.decode}" if image.decode else ""
+        self._write_object(
+            image_id,
+            (
+                f"<< /Type /XObject /Subtype /Image /Width {image.width} /Height {image.height}"
+                f" /ColorSpace {image.color_space} /BitsPerComponent 8 /Filter {image.filter}"
+                f"{decode} /Length {len(image.data)} >>"
+            ).encode(),
+            image.data
+        )
+
+        content = f"q {draw_w:.2f} 0 0 {draw_h:.2f} {x:.2f} {y:.2f} cm /Im0 Do Q".encode()
+        self._write_object(content_id, f"<< /Length {len(content)} >>".encode(), content)
+
+        self._write_object(
+            page_id,
+            (
+                f"<< /Type /Page /Parent {self.PAGES_ID} 0 R /MediaBox [0 0 {page_w:.2f} {page_h:.2f}]"
+                f" /Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+            ).encode()
+        )
+        self._page_ids.append(page_id)
+
+    def close(self) -> None:
+        """Écrit l'arbre des pages, le catalogue, la table xref et le trailer"""
+
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(
+            self.PAGES_ID,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode()
+        )
+        self._write_object(
+            self.CATALOG_ID,
+            f"<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>".encode()
+        )
+
+        info = b"<< /Producer " + _pdf_string("Manga Factory AI")
+        if self.title:
+            info += b" /Title " + _pdf_string(self.title)
+        if self.author:
+            info += b" /Author " + _pdf_string(self.author)
+        self._write_object(self.INFO_ID, info + b" >>")
+
+        xref_offset = self._position
+        size = self._next_id
+        xref = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        xref.extend(f"{self._offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, size))
+        self._write("".join(xref).encode())
+
+        self._write(
+            (
+                f"trailer\n<< /Size {size} /Root {self.CATALOG_ID} 0 R /Info {self.INFO_ID} 0 R >>\n"
+                f"startxref\n{xref_offset}\n%%EOF\n"
+            ).encode()
+        )
@@ -0,0 +1,158 @@
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from PIL import Image
+import asyncio
+import io
+
+from core.config import settings
+from services.cpu_pool import map_ordered
+from services.storage import BlobStore
+from modules.export.manifest import ExportManifest, settings_digest
+from modules.export.pages import (
+    encode_reader_image,
+    page_ref,
+    print_page_output,
+    read_page_bytes,
+    render_reader_page
+)
+from modules.export.sinks import ExportSink, get_sink_class
+
+def render_page_outputs(
+    ref: Dict[str, str],
+    needs: Tuple[str, ...],
+    format: str,
+    dpi: int,
+    digest: Optional[str],
+    page_prefix: Optional[str],
+    cached: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Produit tous les rendus d'une page demandés par les sinks (pool CPU)
+
+    La page est lue et décodée une seule fois ; le rendu liseuse est
+    rééchantillonné une fois puis encodé pour chaque format qui le veut.
+    """
+
+    page_data = read_page_bytes(ref)
+    decoded: List[Image.Image] = []
+
+    def open_image() -> Image.Image:
+        if not decoded:
+            img = Image.open(io.BytesIO(page_data))
+            img.load()
+            decoded.append(img)
+        return decoded[0]
+
+    outputs: Dict[str, Any] = {}
+
+    if "print" in needs:
+        outputs["print"] = print_page_output(
+            page_data, open_image, format, dpi, digest, page_prefix, cached
+        )
+
+    reader_formats = [need.split("_", 1)[1] for need in needs if need.startswith("reader_")]
+    if reader_formats:
+        reader = render_reader_page(open_image())
+        outputs["reader_size"] = reader.size
+        for reader_format in reader_formats:
+            outputs[f"reader_{reader_format}"] = encode_reader_image(reader, reader_format)
+        reader.close()
+
+    for img in decoded:
+        img.close()
+    return outputs
+
+class ExportPipeline:
+    """Export multi-formats en une passe : une lecture par page, N writers
+
+    Chaque page passe une fois dans le pool CPU, qui produit les rendus
+    nécessaires à l'ensemble des formats demandés ; les sinks (PDF, CBZ,
+    EPUB, WebP) consomment ensuite la page dans l'ordre, en streaming.
+    """
+
+    def __init__(self, store: BlobStore, dpi: int, page_size: Tuple[float, float]):
+        self.store = store
+        self.dpi = dpi
+        self.page_size = page_size
+
+    async def run(
+        self,
+        project_id: str,
+        pages: List[Dict[str, Any]],
+        formats: Sequence[str],
+        export_format: str = "print"
+    ) -> Dict[str, str]:
+        title = f"Manga Project {project_id}"
+        sinks: List[ExportSink] = [
+            get_sink_class(format)(self.store, project_id, title, self.page_size)
+            for format in dict.fromkeys(formats)
+        ]
+        needs = tuple(sorted({need for sink in sinks for need in sink.needs}))
+
+        # Le rendu impression est mis en cache page par page (manifeste d'export)
+        manifest: Optional[ExportManifest] = None
+        digest = None
+        if "print" in needs:
+            manifest = await asyncio.to_thread(
+                ExportManifest.load, self.store, project_id, f"pdf-{export_format}"
+            )
+            digest = settings_digest(
+                format=export_format,
+                dpi=self.dpi,
+                icc_profile=settings.PRINT_ICC_PROFILE,
+                rendering_intent=settings.PRINT_RENDERING_INTENT
+            )
+
+        opened: List[ExportSink] = []
+        prepared = map_ordered(
+            render_page_outputs,
+            (
+                (
+                    page_ref(page_data),
+                    needs,
+                    export_format,
+                    self.dpi,
+                    digest,
+                    manifest.page_prefix(page_data["page_number"]) if manifest else None,
+                    manifest.get(page_data["page_number"]) if manifest else None
+                )
+                for page_data in pages
+            ),
+            limit=settings.EXPORT_PAGES_IN_FLIGHT
+        )
+
+        stale_keys = []
+        urls: Dict[str, str] = {}
+        try:
+            for sink in sinks:
+                await asyncio.to_thread(sink.open)
+                opened.append(sink)
+
+            page_numbers = iter([page_data["page_number"] for page_data in pages])
+            async for outputs in prepared:
+                page_number = next(page_numbers)
+                if manifest:
+                    stale_key = manifest.set(page_number, outputs["print"][0])
+                    if stale_key:
+                        stale_keys.append(stale_key)
+
+                await asyncio.gather(*[
+                    asyncio.to_thread(sink.add_page, page_number, outputs)
+                    for sink in sinks
+                ])
+
+            while opened:
+                sink = opened[0]
+                urls[sink.format] = await asyncio.to_thread(sink.close)
+                opened.pop(0)
+        except BaseException:
+            await prepared.aclose()  # Annule les pages encore en préparation
+            for sink in opened:
+                await asyncio.to_thread(sink.abort)
+            raise
+
+        if manifest:
+            stale_keys.extend(manifest.prune(page_data["page_number"] for page_data in pages))
+            await asyncio.to_thread(manifest.save)
+            for stale_key in stale_keys:
+                await asyncio.to_thread(self.store.delete, stale_key)
+
+        return urls
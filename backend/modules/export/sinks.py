@@ -0,0 +1,253 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Tuple
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+import zipfile
+import json
+import uuid
+
+from core.config import settings
+from services.storage import BlobStore, MultipartWriter
+from modules.export.pdf_stream import StreamingPDFWriter
+
+class ExportSink(ABC):
+    """Writer streaming d'un format d'export, alimenté page par page dans l'ordre
+
+    `needs` liste les rendus de page dont le format a besoin ("print",
+    "reader_jpeg", "reader_webp") : le pipeline ne produit que ceux-là,
+    une seule fois pour tous les formats.
+    """
+
+    format = ""
+    needs: Tuple[str, ...] = ()
+
+    def __init__(
+        self,
+        store: BlobStore,
+        project_id: str,
+        title: str,
+        page_size: Tuple[float, float]
+    ):
+        self.store = store
+        self.project_id = project_id
+        self.title = title
+        self.page_size = page_size
+
+    def open(self) -> None:
+        pass
+
+    @abstractmethod
+    def add_page(self, page_number: int, outputs: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self) -> str:
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        pass
+
+class MultipartSink(ExportSink):
+    """Format écrit d'un seul tenant dans un upload multipart"""
+
+    extension = ""
+    content_type = "application/octet-stream"
+
+    @property
+    def key(self) -> str:
+        return f"exports/{self.project_id}/manga.{self.extension}"
+
+    def open(self) -> None:
+        self.writer = MultipartWriter(
+            self.store.open_multipart(self.key, self.content_type),
+            part_size=settings.EXPORT_PART_SIZE_MB * 2**20,
+            spool_memory=settings.EXPORT_SPOOL_MEMORY_MB * 2**20
+        )
+
+    def abort(self) -> None:
+        self.writer.abort()
+
+class PDFSink(MultipartSink):
+    format = "pdf"
+    needs = ("print",)
+    extension = "pdf"
+    content_type = "application/pdf"
+
+    def open(self) -> None:
+        super().open()
+        self.pdf = StreamingPDFWriter(self.writer, title=self.title, author="Manga Factory AI")
+
+    def add_page(self, page_number: int, outputs: Dict[str, Any]) -> None:
+        _, encoded = outputs["print"]
+        self.pdf.add_encoded_page(encoded, self.page_size)
+
+    def close(self) -> str:
+        self.pdf.close()
+        return self.writer.close()
+
+class CBZSink(MultipartSink):
+    """Archive de bande dessinée : JPEG stockés sans recompression + ComicInfo.xml"""
+
+    format = "cbz"
+    needs = ("reader_jpeg",)
+    extension = "cbz"
+    content_type = "application/vnd.comicbook+zip"
+
+    def open(self) -> None:
+        super().open()
+        # Le writer n'a pas de seek : zipfile bascule en écriture séquentielle
+        self.archive = zipfile.ZipFile(self.writer, "w", zipfile.ZIP_STORED)
+        self.page_count = 0
+
+    def add_page(self, page_number: int, outputs: Dict[str, Any]) -> None:
+        self.archive.writestr(f"{page_number:03d}.jpg", outputs["reader_jpeg"])
+        self.page_count += 1
+
+    def close(self) -> str:
+        self.archive.writestr(
+            "ComicInfo.xml",
+            (
+                '<?xml version="1.0" encoding="utf-8"?>\n'
+                "<ComicInfo>"
+                f"<Title>{escape(self.title)}</Title>"
+                f"<PageCount>{self.page_count}</PageCount>"
+                "<Manga>YesAndRightToLeft</Manga>"
+                "</ComicInfo>"
+            )
+        )
+        self.archive.close()
+        return self.writer.close()
+
+class EPUBSink(MultipartSink):
+    """EPUB 3 à mise en page fixe, une page XHTML par planche, lecture de droite à gauche"""
+
+    format = "epub"
+    needs = ("reader_jpeg",)
+    extension = "epub"
+    content_type = "application/epub+zip"
+
+    def open(self) -> None:
+        super().open()
+        self.archive = zipfile.ZipFile(self.writer, "w", zipfile.ZIP_DEFLATED)
+        self.pages: List[Tuple[int, Tuple[int, int]]] = []
+
+        # Le type MIME doit être la première entrée, non compressée
+        self.archive.writestr(
+            zipfile.ZipInfo("mimetype"),
+            "application/epub+zip",
+            compress_type=zipfile.ZIP_STORED
+        )
+        self.archive.writestr(
+            "META-INF/container.xml",
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>'
+            "</container>"
+        )
+
+    def add_page(self, page_number: int, outputs: Dict[str, Any]) -> None:
+        width, height = outputs["reader_size"]
+        self.archive.writestr(
+            f"OEBPS/images/page_{page_number:03d}.jpg",
+            outputs["reader_jpeg"],
+            compress_type=zipfile.ZIP_STORED
+        )
+        self.archive.writestr(
+            f"OEBPS/page_{page_number:03d}.xhtml",
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml">'
+            f'<head><title>{page_number}</title><meta name="viewport" content="width={width}, height={height}"/></head>'
+            f'<body style="margin:0"><img src="images/page_{page_number:03d}.jpg" alt="" '
+            f'style="width:{width}px;height:{height}px"/></body></html>'
+        )
+        self.pages.append((page_number, (width, height)))
+
+    def close(self) -> str:
+        manifest_items = ['<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>']
+        spine_items = []
+        for page_number, _ in self.pages:
+            manifest_items.append(
+                f'<item id="p{page_number:03d}" href="page_{page_number:03d}.xhtml" media-type="application/xhtml+xml"/>'
+            )
+            manifest_items.append(
+                f'<item id="img{page_number:03d}" href="images/page_{page_number:03d}.jpg" media-type="image/jpeg"'
+                + (' properties="cover-image"' if page_number == self.pages[0][0] else "")
+                + "/>"
+            )
+            spine_items.append(f'<itemref idref="p{page_number:03d}"/>')
+
+        modified = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        self.archive.writestr(
+            "OEBPS/content.opf",
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="bookid">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:identifier id="bookid">urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, self.project_id)}</dc:identifier>'
+            f"<dc:title>{escape(self.title)}</dc:title>"
+            "<dc:language>ja</dc:language>"
+            f'<meta property="dcterms:modified">{modified}</meta>'
+            '<meta property="rendition:layout">pre-paginated</meta>'
+            '<meta property="rendition:spread">landscape</meta>'
+            "</metadata>"
+            f"<manifest>{''.join(manifest_items)}</manifest>"
+            f'<spine page-progression-direction="rtl">{"".join(spine_items)}</spine>'
+            "</package>"
+        )
+
+        nav_items = "".join(
+            f'<li><a href="page_{page_number:03d}.xhtml">{page_number}</a></li>'
+            for page_number, _ in self.pages
+        )
+        self.archive.writestr(
+            "OEBPS/nav.xhtml",
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">'
+            f"<head><title>{escape(self.title)}</title></head>"
+            f'<body><nav epub:type="toc"><ol>{nav_items}</ol></nav></body></html>'
+        )
+
+        self.archive.close()
+        return self.writer.close()
+
+class WebPSink(ExportSink):
+    """Pages WebP individuelles pour le lecteur web, plus un index JSON"""
+
+    format = "webp"
+    needs = ("reader_webp",)
+
+    def open(self) -> None:
+        self.entries: List[Dict[str, Any]] = []
+
+    def _key(self, name: str) -> str:
+        return f"exports/{self.project_id}/webp/{name}"
+
+    def add_page(self, page_number: int, outputs: Dict[str, Any]) -> None:
+        key = self._key(f"page_{page_number:03d}.webp")
+        self.store.put(key, outputs["reader_webp"], content_type="image/webp")
+        width, height = outputs["reader_size"]
+        self.entries.append({
+            "page_number": page_number,
+            "url": self.store.url(key),
+            "width": width,
+            "height": height
+        })
+
+    def close(self) -> str:
+        key = self._key("index.json")
+        self.store.put(
+            key,
+            json.dumps({"title": self.title, "pages": self.entries}).encode(),
+            content_type="application/json"
+        )
+        return self.store.url(key)
+
+SINKS = {
+    sink.format: sink
+    for sink in (PDFSink, CBZSink, EPUBSink, WebPSink)
+}
+
+def get_sink_class(format: str) -> type:
+    try:
+        return SINKS[format]
+    except KeyError:
+        raise ValueError(f"Format d'export inconnu: {format}") from None
@@ -0,0 +1,80 @@
+from typing import Dict, Any, List, Optional
+from PIL import Image
+import io
+
+from services.storage import BlobStore
+
+WEBTOON_WIDTH = 800
+SLICE_HEIGHT = 1280  # Hauteur max d'une image acceptée par les plateformes webtoon
+
+class WebtoonStripBuilder:
+    """Assemble une bande verticale en tranches de hauteur fixe, au fil de l'eau
+
+    Les pages sont redimensionnées à la largeur webtoon puis recopiées dans
+    un tampon d'une tranche ; chaque tranche pleine est encodée et déposée
+    dans le store aussitôt. La mémoire reste à une tranche plus une page,
+    quelle que soit la longueur de la bande.
+    """
+
+    def __init__(
+        self,
+        store: BlobStore,
+        key_prefix: str,
+        width: int = WEBTOON_WIDTH,
+        slice_height: int = SLICE_HEIGHT,
+        quality: int = 90
+    ):
+        self.store = store
+        self.key_prefix = key_prefix
+        self.width = width
+        self.slice_height = slice_height
+        self.quality = quality
+        self.slices: List[Dict[str, Any]] = []
+        self.total_height = 0
+        self._buffer: Optional[Image.Image] = None
+        self._filled = 0
+
+    def add_page(self, img: Image.Image) -> None:
+        height = max(1, round(img.height * self.width / img.width))
+        page = img.convert("RGB").resize((self.width, height), Image.LANCZOS)
+
+        offset = 0
+        while offset < page.height:
+            if self._buffer is None:
+                self._buffer = Image.new("RGB", (self.width, self.slice_height), "white")
+
+            take = min(self.slice_height - self._filled, page.height - offset)
+            self._buffer.paste(page.crop((0, offset, self.width, offset + take)), (0, self._filled))
+            self._filled += take
+            offset += take
+
+            if self._filled == self.slice_height:
+                self._emit()
+
+        self.total_height += page.height
+        page.close()
+
+    def _emit(self) -> None:
+        # Le tampon est réutilisé : la tranche suivante écrase son contenu
+        slice_img = self._buffer
+        if self._filled < self.slice_height:
+            slice_img = self._buffer.crop((0, 0, self.width, self._filled))
+
+        buffer = io.BytesIO()
+        slice_img.save(buffer, format="JPEG", quality=self.quality, optimize=True)
+
+        key = f"{self.key_prefix}/slice_{len(self.slices) + 1:03d}.jpg"
+        self.store.put(key, buffer.getvalue(), content_type="image/jpeg")
+        self.slices.append({
+            "key": key,
+            "url": self.store.url(key),
+            "height": self._filled
+        })
+        self._filled = 0
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Émet la dernière tranche (partielle) et retourne la liste des tranches"""
+        if self._filled:
+            self._emit()
+        self._buffer = None
+        return self.slices
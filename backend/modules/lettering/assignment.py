@@ -0,0 +1,128 @@
+from typing import Dict, Any, List, Sequence, Set, Tuple
+from collections import defaultdict
+from scipy.optimize import linear_sum_assignment
+import numpy as np
+
+Bounds = Tuple[int, int, int, int]
+
+# Poids du critère taille (longueur du texte vs aire de la bulle) face à l'ordre de lecture
+SIZE_COST_WEIGHT = 0.5
+
+class GridIndex:
+    """Index spatial en grille uniforme sur le centre des bulles"""
+
+    def __init__(self, bounds: Sequence[Bounds], cell_size: int = 256):
+        self.cell_size = cell_size
+        self.centers = np.array(
+            [((x0 + x1) / 2, (y0 + y1) / 2) for x0, y0, x1, y1 in bounds],
+            dtype=np.float64
+        ).reshape(-1, 2)
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for i, (cx, cy) in enumerate(self.centers):
+            self._cells[(int(cx // cell_size), int(cy // cell_size))].append(i)
+
+    def query(self, rect: Bounds) -> List[int]:
+        """Indices des éléments dont le centre tombe dans le rectangle"""
+
+        x0, y0, x1, y1 = rect
+        found = []
+        for gx in range(int(x0 // self.cell_size), int(x1 // self.cell_size) + 1):
+            for gy in range(int(y0 // self.cell_size), int(y1 // self.cell_size) + 1):
+                for i in self._cells.get((gx, gy), ()):
+                    cx, cy = self.centers[i]
+                    if x0 <= cx < x1 and y0 <= cy < y1:
+                        found.append(i)
+        return sorted(found)
+
+def reading_ranks(bounds: Sequence[Bounds], right_to_left: bool = True) -> np.ndarray:
+    """Rang de lecture de chaque bulle : rangées de haut en bas, puis sens de lecture
+
+    Deux bulles sont sur la même rangée si leurs centres sont à moins
+    d'une demi-hauteur médiane l'un de l'autre.
+    """
+
+    boxes = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+    band = max(np.median(boxes[:, 3] - boxes[:, 1]) / 2, 1.0)
+
+    rows = np.zeros(len(boxes), dtype=np.int64)
+    by_y = np.argsort(cy, kind="stable")
+    row, row_top = 0, None
+    for i in by_y:
+        if row_top is not None and cy[i] - row_top > band:
+            row += 1
+            row_top = cy[i]
+        elif row_top is None:
+            row_top = cy[i]
+        rows[i] = row
+
+    order = np.lexsort((-cx if right_to_left else cx, rows))
+    ranks = np.empty(len(boxes), dtype=np.int64)
+    ranks[order] = np.arange(len(boxes))
+    return ranks
+
+def _normalized(values: np.ndarray) -> np.ndarray:
+    return values / (len(values) - 1) if len(values) > 1 else np.zeros(len(values))
+
+def assign_panel(
+    dialogues: List[Dict[str, Any]],
+    bubbles: List[Dict[str, Any]],
+    right_to_left: bool = True
+) -> List[Tuple[int, int]]:
+    """Affectation optimale (hongroise) dialogues -> bulles d'une même case
+
+    Coût = écart de position dans l'ordre de lecture + écart entre la part
+    de texte du dialogue et la part d'aire de la bulle.
+    """
+
+    if not dialogues or not bubbles:
+        return []
+
+    ranks = reading_ranks([b["bounds"] for b in bubbles], right_to_left)
+    bubble_pos = _normalized(ranks.astype(np.float64))
+    dialogue_pos = _normalized(np.arange(len(dialogues), dtype=np.float64))
+
+    lengths = np.array([max(len(d.get("text", "")), 1) for d in dialogues], dtype=np.float64)
+    areas = np.array(
+        [b.get("area") or (b["bounds"][2] - b["bounds"][0]) * (b["bounds"][3] - b["bounds"][1]) for b in bubbles],
+        dtype=np.float64
+    )
+
+    cost = (
+        np.abs(dialogue_pos[:, None] - bubble_pos[None, :]) +
+        SIZE_COST_WEIGHT * np.abs((lengths / lengths.sum())[:, None] - (areas / areas.sum())[None, :])
+    )
+
+    rows, cols = linear_sum_assignment(cost)
+    return list(zip(rows.tolist(), cols.tolist()))
+
+def assign_dialogues_to_bubbles(
+    bubbles: List[Dict[str, Any]],
+    panels_data: List[Dict[str, Any]]
+) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Associe chaque ligne de dialogue de la page à une bulle détectée
+
+    Les bulles sont réparties par case via l'index spatial, puis chaque
+    case est résolue indépendamment : le coût reste O(case), pas O(page²).
+    """
+
+    index = GridIndex([b["bounds"] for b in bubbles])
+    used: Set[int] = set()
+    assignments = []
+
+    for panel in panels_data:
+        dialogues = panel.get("dialogue") or []
+        if not dialogues or not panel.get("bounds"):
+            continue
+
+        candidates = [i for i in index.query(tuple(panel["bounds"])) if i not in used]
+        if not candidates:
+            continue
+
+        right_to_left = dialogues[0].get("language", "ja") == "ja"
+        for row, col in assign_panel(dialogues, [bubbles[i] for i in candidates], right_to_left):
+            used.add(candidates[col])
+            assignments.append((bubbles[candidates[col]], dialogues[row]))
+
+    return assignments
@@ -0,0 +1,37 @@
+from typing import Dict, Any, List, Optional
+import asyncio
+import cv2
+import numpy as np
+
+from services.previews import store_image_with_previews
+from services.storage import get_blob_store
+from modules.lettering.letterer import Letterer
+
+_letterer: Optional[Letterer] = None
+
+def get_letterer() -> Letterer:
+    """Letterer unique par process : polices, métriques et calages restent en cache"""
+    global _letterer
+    if _letterer is None:
+        _letterer = Letterer()
+    return _letterer
+
+def letter_page_by_key(
+    page_key: str,
+    panels_data: List[Dict[str, Any]],
+    output_key: str
+) -> str:
+    """Lettre une page référencée dans le blob store (exécuté dans le pool CPU)
+
+    Seules les clés et les données de dialogue traversent la frontière de
+    process : l'image est lue et écrite directement dans le store.
+    """
+
+    store = get_blob_store()
+    img = cv2.imdecode(np.frombuffer(store.get(page_key), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    letterer = get_letterer()
+    canvas = asyncio.run(letterer.letter_image(img, panels_data))
+
+    store_image_with_previews(output_key, letterer.encode_png(canvas), store=store)
+    return output_key
@@ -0,0 +1,46 @@
+from typing import Dict, Tuple
+from functools import lru_cache
+from PIL import ImageFont
+
+# Les avances sont mesurées une fois à cette taille puis mises à l'échelle
+REFERENCE_SIZE = 100
+
+@lru_cache(maxsize=128)
+def load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Police chargée depuis le disque une seule fois par (chemin, taille)"""
+    return ImageFont.truetype(path, size)
+
+class GlyphMetrics:
+    """Métriques par glyphe d'une police, mesurées une fois et réutilisées à toutes les tailles"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._font = load_font(path, REFERENCE_SIZE)
+        self._advances: Dict[str, float] = {}
+
+        ascent, descent = self._font.getmetrics()
+        self._line_height = ascent + descent
+
+    def advance(self, char: str, size: int) -> float:
+        """Avance horizontale d'un caractère à la taille donnée"""
+
+        advance = self._advances.get(char)
+        if advance is None:
+            advance = self._font.getlength(char)
+            self._advances[char] = advance
+        return advance * size / REFERENCE_SIZE
+
+    def text_width(self, text: str, size: int) -> float:
+        # Approximation sans crénage : suffisante pour le calage en bulle
+        return sum(self.advance(char, size) for char in text)
+
+    def line_height(self, size: int) -> int:
+        return int(round(self._line_height * size / REFERENCE_SIZE))
+
+    def glyph_box(self, size: int) -> Tuple[int, int]:
+        """Case occupée par un glyphe en écriture verticale (largeur, hauteur)"""
+        return self.line_height(size), size
+
+@lru_cache(maxsize=32)
+def get_glyph_metrics(path: str) -> GlyphMetrics:
+    return GlyphMetrics(path)
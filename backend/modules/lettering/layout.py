@@ -0,0 +1,200 @@
+from typing import List, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+import math
+
+from modules.lettering.fonts import GlyphMetrics, get_glyph_metrics
+
+# Rectangle inscrit dans une bulle elliptique : 1/sqrt(2) de la boîte englobante
+BUBBLE_FILL_RATIO = 1 / math.sqrt(2)
+
+@dataclass(frozen=True)
+class TextLayout:
+    """Résultat du calage d'un texte dans une bulle"""
+    font_size: int
+    lines: Tuple[str, ...]  # Lignes (horizontal) ou colonnes de droite à gauche (tategaki)
+    vertical: bool
+    line_height: int  # Pas entre deux lignes, ou entre deux colonnes en vertical
+    width: int
+    height: int
+    overflow: bool = False
+
+class TextLayoutEngine:
+    """Calage de texte par recherche dichotomique de la taille de police
+
+    Les largeurs sont calculées à partir des avances par glyphe mises en
+    cache (GlyphMetrics) : aucune chaîne candidate n'est re-mesurée par
+    FreeType. Les résultats sont mémoïsés par (texte, police, boîte).
+    """
+
+    def __init__(
+        self,
+        min_size: int = 12,
+        max_size: int = 72,
+        line_spacing: float = 0.15,
+        cache_size: int = 4096
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.line_spacing = line_spacing
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, TextLayout]" = OrderedDict()
+
+    def fit(
+        self,
+        text: str,
+        font_path: str,
+        bounds: Tuple[int, int, int, int],
+        vertical: bool = False
+    ) -> TextLayout:
+        """Plus grande taille de police pour laquelle le texte tient dans la bulle"""
+
+        width, height = self.inner_size(bounds)
+        key = (text, font_path, width, height, vertical)
+        layout = self._cache.get(key)
+        if layout is not None:
+            self._cache.move_to_end(key)
+            return layout
+
+        metrics = get_glyph_metrics(font_path)
+        layout_fn = self._layout_vertical if vertical else self._layout_horizontal
+
+        best: Optional[TextLayout] = None
+        low, high = self.min_size, self.max_size
+        while low <= high:
+            size = (low + high) // 2
+            candidate = layout_fn(text, metrics, size, width, height)
+            if candidate is not None:
+                best = candidate
+                low = size + 1
+            else:
+                high = size - 1
+
+        if best is None:
+            # Même la taille minimale déborde : on la garde, marquée comme telle
+            best = layout_fn(text, metrics, self.min_size, width, height, force=True)
+
+        self._cache[key] = best
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return best
+
+    @staticmethod
+    def inner_size(bounds: Tuple[int, int, int, int]) -> Tuple[int, int]:
+        x0, y0, x1, y1 = bounds
+        return (
+            max(1, int((x1 - x0) * BUBBLE_FILL_RATIO)),
+            max(1, int((y1 - y0) * BUBBLE_FILL_RATIO))
+        )
+
+    def _line_step(self, metrics: GlyphMetrics, size: int) -> int:
+        return metrics.line_height(size) + int(round(size * self.line_spacing))
+
+    def wrap(self, text: str, metrics: GlyphMetrics, size: int, max_width: float) -> List[str]:
+        """Retour à la ligne glouton ; coupe par caractère les textes sans espaces"""
+
+        lines: List[str] = []
+        space = metrics.advance(" ", size)
+
+        for paragraph in text.split("\n"):
+            words = paragraph.split(" ") if " " in paragraph else list(paragraph)
+            joiner, joiner_width = (" ", space) if " " in paragraph else ("", 0.0)
+
+            current, current_width = "", 0.0
+            for word in words:
+                word_width = metrics.text_width(word, size)
+
+                if current and current_width + joiner_width + word_width <= max_width:
+                    current += joiner + word
+                    current_width += joiner_width + word_width
+                    continue
+
+                if current:
+                    lines.append(current)
+
+                # Mot plus large que la bulle : découpe par caractère
+                current, current_width = "", 0.0
+                for char in word if word_width > max_width else [word]:
+                    char_width = metrics.text_width(char, size)
+                    if current and current_width + char_width > max_width:
+                        lines.append(current)
+                        current, current_width = "", 0.0
+                    current += char
+                    current_width += char_width
+
+            lines.append(current)
+
+        return lines
+
+    def _layout_horizontal(
+        self,
+        text: str,
+        metrics: GlyphMetrics,
+        size: int,
+        width: int,
+        height: int,
+        force: bool = False
+    ) -> Optional[TextLayout]:
+        lines = self.wrap(text, metrics, size, width)
+        step = self._line_step(metrics, size)
+        text_height = step * (len(lines) - 1) + metrics.line_height(size)
+        text_width = max((metrics.text_width(line, size) for line in lines), default=0)
+
+        overflow = text_height > height or text_width > width
+        if overflow and not force:
+            return None
+
+        return TextLayout(
+            font_size=size,
+            lines=tuple(lines),
+            vertical=False,
+            line_height=step,
+            width=int(math.ceil(text_width)),
+            height=text_height,
+            overflow=overflow
+        )
+
+    def _layout_vertical(
+        self,
+        text: str,
+        metrics: GlyphMetrics,
+        size: int,
+        width: int,
+        height: int,
+        force: bool = False
+    ) -> Optional[TextLayout]:
+        # En tategaki chaque glyphe occupe une case carrée de côté `size`
+        per_column = max(1, height // size)
+        columns: List[str] = []
+        for paragraph in text.replace(" ", "").split("\n"):
+            columns.extend(
+                paragraph[i:i + per_column]
+                for i in range(0, max(len(paragraph), 1), per_column)
+            )
+
+        step = self._line_step(metrics, size)
+        text_width = step * (len(columns) - 1) + metrics.line_height(size)
+        text_height = size * max(len(column) for column in columns)
+
+        overflow = text_width > width or text_height > height
+        if overflow and not force:
+            return None
+
+        return TextLayout(
+            font_size=size,
+            lines=tuple(columns),
+            vertical=True,
+            line_height=step,
+            width=text_width,
+            height=text_height,
+            overflow=overflow
+        )
+
+_default_engine: Optional[TextLayoutEngine] = None
+
+def get_layout_engine() -> TextLayoutEngine:
+    """Moteur partagé par process (le cache de calage est commun à toutes les pages)"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = TextLayoutEngine()
+    return _default_engine
@@ -1,11 +1,20 @@
 from typing import List, Dict, Any, Tuple
 import cv2
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import asyncio
-import aiohttp
+import base64
+import io
 
 from core.config import settings
+from modules.lettering.assignment import assign_dialogues_to_bubbles
+from modules.lettering.fonts import load_font
+from modules.lettering.layout import TextLayout, get_layout_engine
+from modules.lettering.placement import SFXPlacer, render_sfx
+
+# Tailles candidates des onomatopées, relatives à la hauteur de la case
+SFX_SIZE_RATIO = 0.12
+SFX_SCALES = (1.0, 0.8, 0.6)
 
 class Letterer:
     def __init__(self):
@@ -15,6 +24,7 @@ class Letterer:
             "sfx": "assets/fonts/manga_sfx.ttf"
         }
         self.bubble_detector = BubbleDetector()
+        self.layout_engine = get_layout_engine()
         
     async def add_lettering_to_page(
         self,
@@ -26,6 +36,17 @@ class Letterer:
         # Chargement de l'image
         img = self._decode_image(page_image)
         
+        canvas = await self.letter_image(img, panels_data)
+        
+        return self._encode_image(canvas)
+    
+    async def letter_image(
+        self,
+        img: np.ndarray,
+        panels_data: List[Dict[str, Any]]
+    ) -> Image.Image:
+        """Lettre une page BGR déjà décodée et retourne le canevas PIL"""
+        
         # Détection des bulles
         bubbles = await self.bubble_detector.detect_bubbles(img)
         
@@ -35,161 +56,292 @@ class Letterer:
             panels_data
         )
         
+        # Un seul canevas PIL pour toute la page : une conversion à l'aller,
+        # aucune au retour (encodage direct depuis PIL). img reste l'original
+        # pour l'analyse d'image.
+        canvas = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        draw = ImageDraw.Draw(canvas)
+        
         # Ajout du texte
         for bubble, dialogue in bubble_assignments:
-            img = self._add_text_to_bubble(
-                img,
+            self._add_text_to_bubble(
+                canvas,
+                draw,
                 bubble,
                 dialogue
             )
         
-        # Ajout des onomatopées
+        # Ajout des onomatopées (carte d'occupation construite une fois par page)
+        placer = None
         for panel in panels_data:
             if panel.get("sound_effects"):
-                img = await self._add_sound_effects(
+                placer = placer or SFXPlacer(
                     img,
+                    bubbles,
+                    face_cascade=settings.SFX_FACE_CASCADE
+                )
+                await self._add_sound_effects(
+                    canvas,
+                    placer,
                     panel
                 )
         
-        return self._encode_image(img)
+        return canvas
+    
+    def _assign_dialogues_to_bubbles(
+        self,
+        bubbles: List[Dict[str, Any]],
+        panels_data: List[Dict[str, Any]]
+    ) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Associe les dialogues aux bulles, case par case, dans l'ordre de lecture"""
+        return assign_dialogues_to_bubbles(bubbles, panels_data)
+    
+    def _decode_image(self, page_image: str) -> np.ndarray:
+        """Décode une page base64 en image BGR"""
+        data = np.frombuffer(base64.b64decode(page_image), dtype=np.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+    
+    def _encode_image(self, canvas: Image.Image) -> str:
+        """Encode le canevas en PNG base64"""
+        return base64.b64encode(self.encode_png(canvas)).decode()
+    
+    @staticmethod
+    def encode_png(canvas: Image.Image) -> bytes:
+        buffer = io.BytesIO()
+        canvas.save(buffer, format="PNG", dpi=(settings.DEFAULT_DPI, settings.DEFAULT_DPI))
+        return buffer.getvalue()
     
     def _add_text_to_bubble(
         self,
-        img: np.ndarray,
+        canvas: Image.Image,
+        draw: ImageDraw.ImageDraw,
         bubble: Dict[str, Any],
         dialogue: Dict[str, Any]
-    ) -> np.ndarray:
-        """Ajoute du texte dans une bulle"""
+    ) -> None:
+        """Ajoute du texte dans une bulle, directement sur le canevas de la page"""
         
-        # Conversion en PIL
-        pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-        draw = ImageDraw.Draw(pil_img)
+        # Texte vertical pour le japonais
+        vertical = dialogue.get("language", "ja") == "ja"
         
-        # Calcul de la taille optimale
-        font_size = self._calculate_optimal_font_size(
+        # Calcul de la taille optimale et du découpage (mémoïsés)
+        layout = self.layout_engine.fit(
             dialogue["text"],
-            bubble["bounds"]
+            self.fonts["dialogue"],
+            bubble["bounds"],
+            vertical=vertical
         )
         
-        font = ImageFont.truetype(
+        # Police en cache LRU (chemin, taille) : pas de rechargement disque
+        font = load_font(
             self.fonts["dialogue"],
-            font_size
+            layout.font_size
         )
         
-        # Texte vertical pour le japonais
-        if dialogue.get("language", "ja") == "ja":
-            text_img = self._draw_vertical_text(
-                dialogue["text"],
-                font,
-                bubble["bounds"]
-            )
-            pil_img.paste(text_img, bubble["bounds"][:2], text_img)
+        x0, y0, x1, y1 = bubble["bounds"]
+        left = x0 + ((x1 - x0) - layout.width) // 2
+        top = y0 + ((y1 - y0) - layout.height) // 2
+        
+        if vertical:
+            self._draw_vertical_text(draw, layout, font, (left, top))
         else:
-            # Texte horizontal avec word wrap
-            wrapped_text = self._wrap_text(
-                dialogue["text"],
-                font,
-                bubble["bounds"][2] - bubble["bounds"][0]
-            )
-            
-            y_offset = bubble["bounds"][1]
-            for line in wrapped_text:
+            # Texte horizontal, lignes centrées dans la bulle
+            for i, line in enumerate(layout.lines):
+                line_width = font.getlength(line)
                 draw.text(
-                    (bubble["bounds"][0], y_offset),
+                    (x0 + ((x1 - x0) - line_width) / 2, top + i * layout.line_height),
                     line,
                     font=font,
                     fill="black"
                 )
-                y_offset += font.getsize(line)[1] + 5
+    
+    def _draw_vertical_text(
+        self,
+        draw: ImageDraw.ImageDraw,
+        layout: TextLayout,
+        font,
+        origin: Tuple[int, int]
+    ) -> None:
+        """Dessine un texte tategaki : colonnes de haut en bas, de droite à gauche"""
         
-        return cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+        left, top = origin
+        column_width = layout.line_height
+        for i, column in enumerate(layout.lines):
+            x = left + layout.width - (i + 1) * column_width
+            for j, char in enumerate(column):
+                draw.text(
+                    (x + (column_width - font.getlength(char)) / 2, top + j * layout.font_size),
+                    char,
+                    font=font,
+                    fill="black"
+                )
     
     async def _add_sound_effects(
         self,
-        img: np.ndarray,
+        canvas: Image.Image,
+        placer: SFXPlacer,
         panel: Dict[str, Any]
-    ) -> np.ndarray:
+    ) -> None:
         """Ajoute les onomatopées avec style manga"""
         
+        bounds = panel.get("bounds") or (0, 0, canvas.width, canvas.height)
+        base_size = max(24, int((bounds[3] - bounds[1]) * SFX_SIZE_RATIO))
+        
         for sfx in panel["sound_effects"]:
-            if settings.USE_IDEOGRAM:
-                # Génération avec Ideogram 3.0
-                sfx_image = await self._generate_sfx_ideogram(
-                    sfx["text"],
-                    sfx.get("style", "impact")
-                )
-            else:
-                # Utilisation de font locale
-                sfx_image = self._create_sfx_local(
+            # Le scénario produit des chaînes, l'éditeur des objets {text, style}
+            if isinstance(sfx, str):
+                sfx = {"text": sfx}
+            style = sfx.get("style", "impact")
+            
+            # Rendus en police locale (mis en cache)
+            candidates = [
+                self._create_sfx_local(
                     sfx["text"],
-                    sfx.get("style", "impact")
+                    style,
+                    int(base_size * scale)
                 )
+                for scale in SFX_SCALES
+            ]
             
             # Placement intelligent
-            position = self._find_sfx_position(
-                img,
-                sfx_image,
-                panel["bounds"]
+            position, sfx_image = self._find_sfx_position(
+                placer,
+                candidates,
+                bounds
             )
             
-            # Fusion avec l'image
-            img = self._blend_sfx(img, sfx_image, position)
+            # Fusion sur le canevas
+            self._blend_sfx(canvas, sfx_image, position)
+    
+    def _create_sfx_local(self, text: str, style: str, size: int) -> Image.Image:
+        """Rendu local d'une onomatopée, mis en cache par (texte, style, taille)"""
+        return render_sfx(self.fonts["sfx"], text, style, size)
+    
+    def _find_sfx_position(
+        self,
+        placer: SFXPlacer,
+        candidates: List[Image.Image],
+        panel_bounds: Tuple[int, int, int, int]
+    ) -> Tuple[Tuple[int, int], Image.Image]:
+        """Choisit taille et position dans la case, hors bulles, visages et encrage dense"""
         
-        return img
+        position, index = placer.find_position(
+            [candidate.size for candidate in candidates],
+            panel_bounds
+        )
+        placer.mark(position, candidates[index].size)
+        return position, candidates[index]
+    
+    def _blend_sfx(
+        self,
+        canvas: Image.Image,
+        sfx_image: Image.Image,
+        position: Tuple[int, int]
+    ) -> None:
+        """Colle l'onomatopée (RGBA) sur le canevas"""
+        canvas.paste(sfx_image, position, sfx_image)
 
 class BubbleDetector:
-    """Détecteur de bulles de dialogue"""
+    """Détecteur de bulles de dialogue
     
-    def __init__(self):
+    La détection tourne sur une copie réduite de la page : les composantes
+    blanches sont filtrées en lot par NumPy (stats de composantes connexes),
+    puis les features de contour ne sont calculées qu'une fois, pour les
+    seules candidates. Les coordonnées sont ramenées à la pleine résolution.
+    """
+    
+    def __init__(self, work_width: int = 1240):
         self.min_area = 500
         self.max_area = 50000
+        self.min_aspect_ratio = 0.5
+        self.max_aspect_ratio = 2.0
+        self.min_circularity = 0.6
+        self.min_vertices = 6
+        self.work_width = work_width  # Largeur de travail (2480 px -> 1/2)
         
     async def detect_bubbles(self, img: np.ndarray) -> List[Dict[str, Any]]:
         """Détecte les bulles dans l'image"""
+        return self.detect(img)
+    
+    def detect(self, img: np.ndarray) -> List[Dict[str, Any]]:
+        """Version synchrone de detect_bubbles (utilisable dans un pool CPU)"""
         
-        # Preprocessing
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        # Preprocessing sur une copie réduite
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        height, width = gray.shape
+        scale = min(1.0, self.work_width / width)
+        if scale < 1.0:
+            gray = cv2.resize(
+                gray,
+                (round(width * scale), round(height * scale)),
+                interpolation=cv2.INTER_AREA
+            )
         _, binary = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY)
         
-        # Détection des contours
-        contours, _ = cv2.findContours(
-            binary,
-            cv2.RETR_EXTERNAL,
-            cv2.CHAIN_APPROX_SIMPLE
-        )
+        # Seuils d'aire exprimés à l'échelle de travail
+        area_scale = scale * scale
+        min_area = self.min_area * area_scale
+        max_area = self.max_area * area_scale
         
-        bubbles = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if self.min_area < area < self.max_area:
-                # Vérification forme elliptique
-                if self._is_bubble_shape(contour):
-                    x, y, w, h = cv2.boundingRect(contour)
-                    bubbles.append({
-                        "bounds": (x, y, x+w, y+h),
-                        "area": area,
-                        "contour": contour
-                    })
+        # Composantes blanches : une passe, stats en tableau (x, y, w, h, pixels)
+        _, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        stats = stats[1:]
+        x, y, w, h, pixels = stats.T
+        aspect_ratio = w / np.maximum(h, 1)
         
-        return bubbles
-    
-    def _is_bubble_shape(self, contour) -> bool:
-        """Vérifie si le contour ressemble à une bulle"""
+        # Préfiltre vectorisé : aire du contour <= aire de la boîte, et
+        # marge sur le nombre de pixels (le contour passe par leurs centres)
+        candidates = np.flatnonzero(
+            (w * h > min_area) &
+            (pixels * 0.8 < max_area) &
+            (aspect_ratio > self.min_aspect_ratio) &
+            (aspect_ratio < self.max_aspect_ratio)
+        )
+        if candidates.size == 0:
+            return []
         
-        # Approximation polygonale
-        perimeter = cv2.arcLength(contour, True)
-        approx = cv2.approxPolyDP(contour, 0.02 * perimeter, True)
+        # Features de contour calculées une seule fois par candidate
+        contours = []
+        features = np.zeros((candidates.size, 3), dtype=np.float64)
+        for row, component in enumerate(candidates):
+            x0, y0, w0, h0 = stats[component, :4]
+            mask = (labels[y0:y0 + h0, x0:x0 + w0] == component + 1).astype(np.uint8)
+            found, _ = cv2.findContours(
+                mask,
+                cv2.RETR_EXTERNAL,
+                cv2.CHAIN_APPROX_SIMPLE,
+                offset=(int(x0), int(y0))
+            )
+            contour = max(found, key=len)
+            perimeter = cv2.arcLength(contour, True)
+            features[row] = (
+                cv2.contourArea(contour),
+                perimeter,
+                len(cv2.approxPolyDP(contour, 0.02 * perimeter, True))
+            )
+            contours.append(contour)
         
-        # Ratio d'aspect
-        x, y, w, h = cv2.boundingRect(contour)
-        aspect_ratio = float(w) / h
+        area, perimeter, vertices = features.T
+        circularity = 4 * np.pi * area / np.maximum(perimeter * perimeter, 1e-9)
+        keep = np.flatnonzero(
+            (area > min_area) &
+            (area < max_area) &
+            (vertices > self.min_vertices) &  # Forme arrondie
+            (circularity > self.min_circularity)  # Relativement circulaire
+        )
         
-        # Circularité
-        area = cv2.contourArea(contour)
-        circularity = 4 * np.pi * area / (perimeter * perimeter)
+        # Retour en coordonnées pleine résolution
+        bubbles = []
+        for row in keep:
+            x0, y0, w0, h0 = stats[candidates[row], :4] / scale
+            bubbles.append({
+                "bounds": (
+                    int(round(x0)),
+                    int(round(y0)),
+                    int(round(x0 + w0)),
+                    int(round(y0 + h0))
+                ),
+                "area": float(area[row] / area_scale),
+                "contour": np.round(contours[row] / scale).astype(np.int32)
+            })
         
-        return (
-            len(approx) > 6 and  # Forme arrondie
-            0.5 < aspect_ratio < 2.0 and  # Pas trop allongé
-            circularity > 0.6  # Relativement circulaire
-        )
+        return bubbles
@@ -0,0 +1,155 @@
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from functools import lru_cache
+from PIL import Image, ImageDraw
+import numpy as np
+import cv2
+
+from modules.lettering.fonts import load_font
+
+Bounds = Tuple[int, int, int, int]
+
+# Coûts relatifs par pixel de la carte d'occupation
+EDGE_COST = 1.0
+INK_COST = 0.5
+BLOCKED_COST = 50.0  # Bulles et visages : à éviter absolument
+OVERLAP_COST = 50.0  # Chevauchement d'une onomatopée déjà posée
+SCALE_BONUS = 0.15  # Préférence pour les grandes tailles à encombrement égal
+
+SFX_STYLES = {
+    "impact": {"fill": (0, 0, 0, 255), "stroke": (255, 255, 255, 255), "stroke_ratio": 0.12, "angle": -8},
+    "whisper": {"fill": (90, 90, 90, 255), "stroke": (255, 255, 255, 200), "stroke_ratio": 0.05, "angle": 0},
+    "echo": {"fill": (255, 255, 255, 255), "stroke": (0, 0, 0, 255), "stroke_ratio": 0.08, "angle": 4},
+}
+
+@lru_cache(maxsize=256)
+def render_sfx(font_path: str, text: str, style: str, size: int) -> Image.Image:
+    """Rend une onomatopée en RGBA, mis en cache par (police, texte, style, taille)
+
+    L'image retournée est partagée : ne pas la modifier (paste la lit seulement).
+    """
+
+    spec = SFX_STYLES.get(style, SFX_STYLES["impact"])
+    font = load_font(font_path, size)
+    stroke = max(1, int(size * spec["stroke_ratio"]))
+
+    left, top, right, bottom = font.getbbox(text, stroke_width=stroke)
+    img = Image.new("RGBA", (right - left, bottom - top), (0, 0, 0, 0))
+    ImageDraw.Draw(img).text(
+        (-left, -top),
+        text,
+        font=font,
+        fill=spec["fill"],
+        stroke_width=stroke,
+        stroke_fill=spec["stroke"]
+    )
+
+    if spec["angle"]:
+        img = img.rotate(spec["angle"], resample=Image.BICUBIC, expand=True)
+    return img
+
+class SFXPlacer:
+    """Placement des onomatopées dans l'espace libre d'une page
+
+    Une carte de coût (contours, densité d'encre, bulles, visages) est
+    construite une fois par page à échelle réduite, puis intégrée en table
+    de sommes cumulées : chaque rectangle candidat est évalué en O(1), et
+    toute la grille positions x tailles l'est en une opération NumPy.
+    """
+
+    def __init__(
+        self,
+        img: np.ndarray,
+        bubbles: Sequence[Dict[str, Any]] = (),
+        work_scale: float = 0.25,
+        face_cascade: Optional[str] = None
+    ):
+        self.scale = work_scale
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        gray = cv2.resize(gray, None, fx=work_scale, fy=work_scale, interpolation=cv2.INTER_AREA)
+        self.height, self.width = gray.shape
+
+        edges = cv2.Canny(gray, 50, 150) > 0
+        cost = EDGE_COST * edges.astype(np.float32) + INK_COST * (gray < 100)
+
+        for bubble in bubbles:
+            x0, y0, x1, y1 = self._to_work(bubble["bounds"])
+            cost[y0:y1, x0:x1] = BLOCKED_COST
+
+        for x0, y0, x1, y1 in self._detect_faces(gray, face_cascade):
+            cost[y0:y1, x0:x1] = BLOCKED_COST
+
+        self.integral = cv2.integral(cost, sdepth=cv2.CV_64F)
+        self.placed: List[Bounds] = []
+
+    def _to_work(self, bounds: Bounds) -> Bounds:
+        x0, y0, x1, y1 = (int(round(v * self.scale)) for v in bounds)
+        return (
+            min(max(x0, 0), self.width),
+            min(max(y0, 0), self.height),
+            min(max(x1, 0), self.width),
+            min(max(y1, 0), self.height)
+        )
+
+    @staticmethod
+    def _detect_faces(gray: np.ndarray, cascade_path: Optional[str]) -> List[Bounds]:
+        if not cascade_path:
+            return []
+        cascade = _load_cascade(cascade_path)
+        return [(x, y, x + w, y + h) for x, y, w, h in cascade.detectMultiScale(gray, 1.1, 3)]
+
+    def find_position(
+        self,
+        sizes: Sequence[Tuple[int, int]],
+        panel_bounds: Bounds
+    ) -> Tuple[Tuple[int, int], int]:
+        """Meilleure position (pleine résolution) et indice de la taille retenue
+
+        `sizes` liste les tailles candidates de l'onomatopée, de la plus
+        grande à la plus petite.
+        """
+
+        px0, py0, px1, py1 = self._to_work(panel_bounds)
+        best = (np.inf, (panel_bounds[0], panel_bounds[1]), len(sizes) - 1)
+
+        for size_index, (w, h) in enumerate(sizes):
+            sw = max(1, int(round(w * self.scale)))
+            sh = max(1, int(round(h * self.scale)))
+            if sw > px1 - px0 or sh > py1 - py0:
+                continue
+
+            stride = max(1, min(sw, sh) // 4)
+            xs = np.arange(px0, px1 - sw + 1, stride)
+            ys = np.arange(py0, py1 - sh + 1, stride)
+            gx, gy = np.meshgrid(xs, ys)
+
+            # Somme du coût sur chaque rectangle via la table intégrale
+            S = self.integral
+            density = (
+                S[gy + sh, gx + sw] - S[gy, gx + sw] - S[gy + sh, gx] + S[gy, gx]
+            ) / (sw * sh)
+
+            for ox0, oy0, ox1, oy1 in self.placed:
+                overlap_w = np.clip(np.minimum(gx + sw, ox1) - np.maximum(gx, ox0), 0, None)
+                overlap_h = np.clip(np.minimum(gy + sh, oy1) - np.maximum(gy, oy0), 0, None)
+                density = density + OVERLAP_COST * overlap_w * overlap_h / (sw * sh)
+
+            score = density - SCALE_BONUS * (len(sizes) - size_index) / len(sizes)
+            flat = int(np.argmin(score))
+            if score.flat[flat] < best[0]:
+                x, y = int(gx.flat[flat]), int(gy.flat[flat])
+                best = (
+                    float(score.flat[flat]),
+                    (int(round(x / self.scale)), int(round(y / self.scale))),
+                    size_index
+                )
+
+        return best[1], best[2]
+
+    def mark(self, position: Tuple[int, int], size: Tuple[int, int]) -> None:
+        """Réserve la zone occupée par une onomatopée posée"""
+        x, y = position
+        self.placed.append(self._to_work((x, y, x + size[0], y + size[1])))
+
+@lru_cache(maxsize=4)
+def _load_cascade(path: str) -> cv2.CascadeClassifier:
+    return cv2.CascadeClassifier(path)
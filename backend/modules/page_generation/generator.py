@@ -1,23 +1,37 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable, Awaitable
 import asyncio
-import aiohttp
 import json
+import random
 
 from core.config import settings
+from services.gpu_pool import get_gpu_pool, lora_affinity
 from modules.character_design.designer import CharacterDesigner
+from modules.consistency.checker import CharacterConsistencyChecker
 
 class PageGenerator:
+    PAGE_SIZE = (2480, 3508)  # A4 600dpi
+    PAGE_MARGINS = {"top": 100, "bottom": 100, "left": 80, "right": 80}
+    
     def __init__(self):
-        self.sd_endpoint = settings.GPU_ENDPOINT or "http://localhost:7860"
         self.character_designer = CharacterDesigner()
         
     async def generate_page(
         self,
         page_data: Dict[str, Any],
         characters: List[Dict[str, Any]],
-        style_params: Dict[str, Any]
+        style_params: Dict[str, Any],
+        consistency_checker: Optional[CharacterConsistencyChecker] = None,
+        completed_panels: Optional[Dict[int, Dict[str, Any]]] = None,
+        on_panel: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
-        """Génère une page complète avec cohérence"""
+        """Génère une page complète avec cohérence
+        
+        `completed_panels` (par numéro de case) vient d'une exécution
+        interrompue : ces cases sont reprises telles quelles. `on_panel` est
+        appelé après chaque case générée, pour la persister aussitôt.
+        """
+        
+        completed_panels = completed_panels or {}
         
         # Extraction des LoRA des personnages
         character_loras = {
@@ -31,17 +45,34 @@ class PageGenerator:
         context_embeddings = None
         
         for panel in page_data["panels"]:
-            # Génération avec StoryDiffusion pour cohérence
-            panel_result = await self._generate_panel_with_context(
-                panel,
-                character_loras,
-                context_embeddings,
-                style_params
-            )
+            panel_result = completed_panels.get(panel["panel_number"])
+            if panel_result is None:
+                # Génération avec StoryDiffusion pour cohérence
+                panel_result = await self._generate_panel_with_context(
+                    panel,
+                    character_loras,
+                    context_embeddings,
+                    style_params
+                )
+                if on_panel is not None:
+                    await on_panel(panel_result)
             
             generated_panels.append(panel_result)
             context_embeddings = panel_result["embeddings"]
         
+        # Vérification de cohérence en lot : seules les cases qui dérivent
+        # sont regénérées, pas la page entière
+        if consistency_checker is not None:
+            generated_panels = await self._regenerate_drifted_panels(
+                page_data["panels"],
+                generated_panels,
+                character_loras,
+                characters,
+                style_params,
+                consistency_checker,
+                on_panel
+            )
+        
         # Composition de la page
         page_layout = await self._compose_page_layout(
             generated_panels,
@@ -72,8 +103,7 @@ class PageGenerator:
         
         # Ajout des LoRA des personnages présents
         active_loras = []
-        for dialogue in panel.get("dialogue", []):
-            char_name = dialogue.get("character")
+        for char_name in CharacterConsistencyChecker.panel_characters(panel):
             if char_name in character_loras:
                 active_loras.append({
                     "path": character_loras[char_name],
@@ -95,12 +125,16 @@ class PageGenerator:
             "panel_type": panel.get("type", "standard")
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.sd_endpoint}/api/story_generate",
-                json=generation_params
-            ) as resp:
-                result = await resp.json()
+        # Même jeu de LoRA -> même serveur, poids déjà chargés. Seed tirée
+        # ici : une copie doublée sur un autre serveur donne la même case
+        response = await get_gpu_pool().post(
+            "/api/story_generate",
+            {"panels": [generation_params], "seed": random.randrange(2**32)},
+            affinity=lora_affinity(active_loras),
+            timeout=settings.GPU_PANEL_TIMEOUT_S,
+            hedge=True
+        )
+        result = response["panels"][0]
         
         return {
             "panel_number": panel["panel_number"],
@@ -110,6 +144,58 @@ class PageGenerator:
             "prompt_used": prompt
         }
     
+    async def _regenerate_drifted_panels(
+        self,
+        panels: List[Dict[str, Any]],
+        generated_panels: List[Dict[str, Any]],
+        character_loras: Dict[str, str],
+        characters: List[Dict[str, Any]],
+        style_params: Dict[str, Any],
+        checker: CharacterConsistencyChecker,
+        on_panel: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> List[Dict[str, Any]]:
+        """Regénère les cases dont la similarité personnage est sous le seuil"""
+        
+        for _ in range(settings.CONSISTENCY_MAX_RETRIES):
+            embeddings = await self.embed_images([p["image"] for p in generated_panels])
+            drifted = checker.find_drifted_panels(
+                [
+                    {
+                        "panel_number": generated["panel_number"],
+                        "embedding": embedding,
+                        "characters": CharacterConsistencyChecker.panel_characters(panel)
+                    }
+                    for panel, generated, embedding in zip(panels, generated_panels, embeddings)
+                ],
+                characters
+            )
+            if not drifted:
+                break
+            
+            drifted_numbers = {d["panel_number"] for d in drifted}
+            for i, panel in enumerate(panels):
+                if panel["panel_number"] not in drifted_numbers:
+                    continue
+                
+                context = generated_panels[i - 1]["embeddings"] if i > 0 else None
+                generated_panels[i] = await self._generate_panel_with_context(
+                    panel,
+                    character_loras,
+                    context,
+                    style_params
+                )
+                if on_panel is not None:
+                    await on_panel(generated_panels[i])
+        
+        return generated_panels
+    
+    async def embed_images(self, images: List[str]) -> List[List[float]]:
+        """Embeddings image (CLIP) calculés en un seul appel GPU"""
+        
+        result = await get_gpu_pool().post("/api/embed_images", {"images": images})
+        
+        return result["embeddings"]
+    
     async def _compose_page_layout(
         self,
         panels: List[Dict[str, Any]],
@@ -127,16 +213,9 @@ class PageGenerator:
         compose_params = {
             "panels": [p["image"] for p in panels],
             "layout": layout_config,
-            "page_size": (2480, 3508),  # A4 600dpi
-            "margins": {"top": 100, "bottom": 100, "left": 80, "right": 80},
+            "page_size": self.PAGE_SIZE,
+            "margins": self.PAGE_MARGINS,
             "gutter": 20  # Espace entre cases
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.sd_endpoint}/api/compose_page",
-                json=compose_params
-            ) as resp:
-                result = await resp.json()
-        
-        return result
+        return await get_gpu_pool().post("/api/compose_page", compose_params)
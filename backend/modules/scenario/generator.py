@@ -33,6 +33,7 @@ class ScenarioGenerator:
                             "panel_number": 1,
                             "type": "establishing_shot|close_up|action|dialogue",
                             "description": "Description visuelle détaillée",
+                            "characters": ["Nom des personnages visibles, muets compris"],
                             "dialogue": [
                                 {{"character": "Nom", "text": "Dialogue"}}
                             ],
@@ -0,0 +1,79 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, Sequence
+from collections import deque
+from functools import partial
+import multiprocessing
+import asyncio
+import os
+
+from core.config import settings
+
+_executor: Optional[Executor] = None
+
+def cpu_worker_count() -> int:
+    return settings.CPU_WORKERS or os.cpu_count() or 1
+
+def get_cpu_executor() -> Executor:
+    """Pool partagé pour le travail CPU (décodage, resampling, encodage d'images)
+
+    Un process daemon ne peut pas créer d'enfants : dans un enfant Celery
+    prefork, le pool se replie sur des threads (PIL et OpenCV relâchent le
+    GIL, pas le code Python du lettrage). Le worker des files lettering et
+    export tourne donc en `--pool=threads` (docker-compose.yml) : ses tâches
+    s'exécutent dans le process principal, qui peut ouvrir un vrai pool de
+    process.
+    """
+
+    global _executor
+    if _executor is None:
+        max_workers = cpu_worker_count()
+        if multiprocessing.current_process().daemon:
+            _executor = ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            # forkserver : pas de fork d'un process qui a déjà des threads
+            # (boucle du worker, pool Celery)
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("forkserver")
+            )
+    return _executor
+
+async def run_cpu_bound(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Exécute une fonction picklable dans le pool CPU sans bloquer la boucle"""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_cpu_executor(),
+        partial(func, *args, **kwargs)
+    )
+
+async def map_ordered(
+    func: Callable[..., Any],
+    args_iterable: Iterable[Sequence[Any]],
+    limit: Optional[int] = None
+) -> AsyncIterator[Any]:
+    """Applique func dans le pool et produit les résultats dans l'ordre d'entrée
+
+    Au plus `limit` appels sont en vol : un nouvel élément n'est soumis
+    qu'une fois le plus ancien consommé, ce qui borne la mémoire quand les
+    résultats sont volumineux (pages pleine résolution).
+    """
+
+    limit = max(1, limit or cpu_worker_count())
+    pending: deque = deque()
+    try:
+        for args in args_iterable:
+            pending.append(asyncio.ensure_future(run_cpu_bound(func, *args)))
+            if len(pending) >= limit:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+
+def shutdown_cpu_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
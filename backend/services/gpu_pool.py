@@ -0,0 +1,317 @@
+"""Répartition des appels GPU sur plusieurs serveurs de génération
+
+Chaque serveur suit ses requêtes en vol et une moyenne mobile
+exponentielle (EWMA) de sa latence ; un contrôle de santé périodique
+(`/api/health`) écarte ceux qui ne répondent plus et relève la charge
+que leur envoient les autres workers. Le routage se fait par
+« deux choix » : on compare deux candidats et on garde celui dont
+l'attente estimée, (en vol + 1) x latence, est la plus faible.
+
+Pour un même jeu de LoRA, les deux candidats sont toujours les mêmes
+(hachage de rendez-vous) : les poids restent chauds dans le cache du
+serveur, sauf si ces deux serveurs sont nettement plus chargés que le
+reste du pool.
+
+Un disjoncteur par serveur coupe le trafic après plusieurs échecs
+consécutifs, puis laisse passer une requête d'essai après un délai. Les
+appels idempotents (seed fixée par l'appelant) peuvent être doublés :
+sans réponse au bout du p95 observé pour la route, une copie part sur un
+autre serveur et la première réponse l'emporte.
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence
+import asyncio
+import hashlib
+import random
+import time
+import aiohttp
+
+from core.config import settings
+from services.http import get_http_session
+
+# Au-delà de ce facteur d'attente par rapport au meilleur serveur, l'affinité LoRA est ignorée
+STICKY_MAX_LOAD_RATIO = 2.0
+
+def configured_endpoints() -> List[str]:
+    urls = [url.strip().rstrip("/") for url in (settings.GPU_ENDPOINTS or "").split(",") if url.strip()]
+    return urls or [(settings.GPU_ENDPOINT or "http://localhost:7860").rstrip("/")]
+
+def lora_affinity(loras: Iterable[Any]) -> Optional[str]:
+    """Clé d'affinité d'un jeu de LoRA (chemins ou {"path": ...}), indépendante de l'ordre"""
+
+    paths = sorted({lora["path"] if isinstance(lora, dict) else str(lora) for lora in loras if lora})
+    return "|".join(paths) or None
+
+class CircuitBreaker:
+    """Fermé -> ouvert après `threshold` échecs consécutifs -> semi-ouvert après `cooldown`
+
+    En semi-ouvert, une seule requête d'essai passe : son succès referme
+    le disjoncteur, son échec le rouvre pour un nouveau délai.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def allows(self, now: Optional[float] = None) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            now = time.monotonic() if now is None else now
+            if now - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+        return self.state == self.HALF_OPEN and not self.trial_in_flight
+
+    def on_request(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self, now: Optional[float] = None) -> None:
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic() if now is None else now
+
+class GPUEndpoint:
+    def __init__(self, url: str, initial_latency: float = 1.0):
+        self.url = url
+        self.healthy = True
+        self.in_flight = 0
+        # Requêtes en cours sur le serveur, tous process confondus (dernier /api/health)
+        self.remote_in_flight = 0
+        self.latency = initial_latency  # EWMA en secondes
+        self.completed = 0
+        self.failures = 0
+        self.breaker = CircuitBreaker(settings.GPU_BREAKER_FAILURES, settings.GPU_BREAKER_COOLDOWN_S)
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.breaker.allows()
+
+    def expected_wait(self) -> float:
+        # Le compte local est à jour, celui du serveur inclut les autres workers
+        return (max(self.in_flight, self.remote_in_flight) + 1) * self.latency
+
+    def record_success(self, elapsed: float, alpha: float) -> None:
+        self.latency = alpha * elapsed + (1 - alpha) * self.latency
+        self.completed += 1
+        self.breaker.record_success()
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.breaker.record_failure()
+
+    def __repr__(self) -> str:
+        return f"GPUEndpoint({self.url!r}, in_flight={self.in_flight}, latency={self.latency:.2f})"
+
+def rendezvous_rank(key: str, endpoints: Sequence[GPUEndpoint]) -> List[GPUEndpoint]:
+    """Serveurs classés par poids de rendez-vous pour la clé (stable quand le pool change)"""
+
+    def weight(endpoint: GPUEndpoint) -> int:
+        return int.from_bytes(hashlib.blake2b(f"{key}@{endpoint.url}".encode(), digest_size=8).digest(), "big")
+
+    return sorted(endpoints, key=weight, reverse=True)
+
+class GPUPool:
+    def __init__(
+        self,
+        urls: Optional[Sequence[str]] = None,
+        health_interval: Optional[float] = None,
+        ewma_alpha: Optional[float] = None,
+        hedge_min_delay: Optional[float] = None,
+        rng: Optional[random.Random] = None
+    ):
+        self.endpoints = [GPUEndpoint(url) for url in (urls or configured_endpoints())]
+        self.health_interval = health_interval or settings.GPU_HEALTH_INTERVAL_S
+        self.ewma_alpha = ewma_alpha or settings.GPU_LATENCY_EWMA_ALPHA
+        self.hedge_min_delay = settings.GPU_HEDGE_MIN_DELAY_S if hedge_min_delay is None else hedge_min_delay
+        self.rng = rng or random.Random()
+        self._health_task: Optional[asyncio.Task] = None
+        self._latencies: Dict[str, Deque[float]] = {}
+        self.hedged = 0
+
+    def pick(
+        self,
+        affinity: Optional[str] = None,
+        exclude: Sequence[GPUEndpoint] = ()
+    ) -> Optional[GPUEndpoint]:
+        """Serveur pour la prochaine requête ; None si `exclude` ne laisse aucun serveur disponible"""
+
+        candidates = [e for e in self.endpoints if e.available and e not in exclude]
+        if not candidates:
+            if exclude:
+                return None
+            # Tout le pool est coupé : mieux vaut tenter que d'échouer d'office
+            candidates = self.endpoints
+        if len(candidates) == 1:
+            return candidates[0]
+
+        if affinity:
+            preferred = min(rendezvous_rank(affinity, candidates)[:2], key=GPUEndpoint.expected_wait)
+            best = min(e.expected_wait() for e in candidates)
+            if preferred.expected_wait() <= STICKY_MAX_LOAD_RATIO * best:
+                return preferred
+
+        return min(self.rng.sample(candidates, 2), key=GPUEndpoint.expected_wait)
+
+    async def post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        affinity: Optional[str] = None,
+        timeout: Optional[float] = None,
+        hedge: bool = False
+    ) -> Dict[str, Any]:
+        """POST JSON sur le serveur choisi ; la latence observée alimente son EWMA
+
+        `hedge` n'est permis que pour un appel idempotent : la copie
+        envoyée à un autre serveur doit produire le même résultat.
+        """
+
+        self._ensure_health_checks()
+        endpoint = self.pick(affinity)
+        if not hedge:
+            return await self._post_to(endpoint, path, payload, timeout)
+        return await self._post_hedged(endpoint, path, payload, affinity, timeout)
+
+    def hedge_delay(self, path: str) -> Optional[float]:
+        """p95 des latences récentes de la route (None tant que l'échantillon est trop court)"""
+
+        samples = self._latencies.get(path)
+        if not samples or len(samples) < settings.GPU_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return max(p95, self.hedge_min_delay)
+
+    async def _post_hedged(
+        self,
+        primary: GPUEndpoint,
+        path: str,
+        payload: Dict[str, Any],
+        affinity: Optional[str],
+        timeout: Optional[float]
+    ) -> Dict[str, Any]:
+        pending = {asyncio.ensure_future(self._post_to(primary, path, payload, timeout))}
+        try:
+            delay = self.hedge_delay(path)
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                secondary = self.pick(affinity, exclude=[primary])
+                if secondary is not None:
+                    self.hedged += 1
+                    pending.add(asyncio.ensure_future(self._post_to(secondary, path, payload, timeout)))
+
+            error: Optional[BaseException] = None
+            while True:
+                for attempt in done:
+                    if attempt.exception() is None:
+                        return attempt.result()
+                    error = attempt.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # La copie perdante est abandonnée (connexion fermée)
+            for attempt in pending:
+                attempt.cancel()
+
+    async def _post_to(
+        self,
+        endpoint: GPUEndpoint,
+        path: str,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        options = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        endpoint.breaker.on_request()
+        endpoint.in_flight += 1
+        start = time.monotonic()
+        settled = False
+        try:
+            async with get_http_session().post(f"{endpoint.url}{path}", json=payload, **options) as resp:
+                resp.raise_for_status()
+                result = await resp.json()
+
+            elapsed = time.monotonic() - start
+            endpoint.record_success(elapsed, self.ewma_alpha)
+            settled = True
+        except aiohttp.ClientResponseError as error:
+            # Une requête refusée (4xx) ne dit rien de la santé du serveur
+            if error.status >= 500:
+                endpoint.record_failure()
+                settled = True
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            endpoint.record_failure()
+            settled = True
+            raise
+        finally:
+            endpoint.in_flight -= 1
+            if not settled:
+                # Ni succès ni échec (4xx, réponse illisible, copie abandonnée) :
+                # la requête d'essai d'un disjoncteur semi-ouvert est libérée
+                endpoint.breaker.trial_in_flight = False
+
+        self._latencies.setdefault(path, deque(maxlen=settings.GPU_HEDGE_WINDOW)).append(elapsed)
+        return result
+
+    def _ensure_health_checks(self) -> None:
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+
+    async def _health_loop(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    async def check_health(self) -> None:
+        await asyncio.gather(*[self._check(endpoint) for endpoint in self.endpoints])
+
+    async def _check(self, endpoint: GPUEndpoint) -> None:
+        try:
+            async with get_http_session().get(
+                f"{endpoint.url}/api/health",
+                timeout=aiohttp.ClientTimeout(total=settings.GPU_HEALTH_TIMEOUT_S)
+            ) as resp:
+                endpoint.healthy = resp.status == 200
+                if endpoint.healthy:
+                    status = await resp.json()
+                    endpoint.remote_in_flight = max(0, int(status.get("in_flight", 0)))
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            endpoint.healthy = False
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+_pools: Dict[asyncio.AbstractEventLoop, GPUPool] = {}
+
+def get_gpu_pool() -> GPUPool:
+    """Pool de la boucle courante (contrôles de santé et session HTTP y sont liés)"""
+
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = GPUPool()
+    return pool
+
+async def close_gpu_pool() -> None:
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
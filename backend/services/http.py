@@ -0,0 +1,30 @@
+from typing import Dict
+import asyncio
+import aiohttp
+
+from core.config import settings
+
+_sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Session HTTP partagée par boucle : connexions keep-alive réutilisées d'un appel à l'autre
+
+    Une session aiohttp est liée à la boucle qui l'a créée ; le worker
+    Celery et l'API gardent chacun une boucle pour toute leur durée de vie.
+    """
+
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        for other in [other for other in _sessions if other.is_closed()]:
+            del _sessions[other]
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=settings.HTTP_POOL_SIZE)
+        )
+        _sessions[loop] = session
+    return session
+
+async def close_http_session() -> None:
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
@@ -0,0 +1,120 @@
+from typing import Dict, Any, Optional, Tuple
+from PIL import Image
+import hashlib
+import json
+import io
+
+from services.storage import BlobStore, get_blob_store
+
+# Largeurs de la pyramide ; l'éditeur ne charge que le niveau affiché
+PREVIEW_WIDTHS = (256, 512, 1024, 2048)
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+
+def _avif_available() -> bool:
+    """Encodeur AVIF enregistré (natif, ou plugin pour Pillow < 11.2), sans avertissement"""
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+    Image.init()
+    return "AVIF" in Image.SAVE
+
+AVIF_AVAILABLE = _avif_available()
+PREVIEW_FORMATS = ("webp", "avif") if AVIF_AVAILABLE else ("webp",)
+MEDIA_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+def preview_prefix(source_key: str) -> str:
+    return f"previews/{source_key.rsplit('.', 1)[0]}"
+
+def preview_key(source_key: str, width: int, format: str) -> str:
+    return f"{preview_prefix(source_key)}/w{width}.{format}"
+
+def index_key(source_key: str) -> str:
+    return f"{preview_prefix(source_key)}/index.json"
+
+def _encode(img: Image.Image, format: str) -> bytes:
+    buffer = io.BytesIO()
+    if format == "avif":
+        img.save(buffer, format="AVIF", quality=AVIF_QUALITY)
+    else:
+        img.save(buffer, format="WEBP", quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+def build_preview_pyramid(
+    source_key: str,
+    data: Optional[bytes] = None,
+    store: Optional[BlobStore] = None
+) -> Dict[str, Any]:
+    """Génère et stocke la pyramide de vignettes d'une image (exécuté dans le pool CPU)
+
+    Chaque niveau est réduit à partir du précédent (du plus grand au plus
+    petit) : le coût total reste proche d'un seul redimensionnement. L'index
+    retourné porte l'empreinte de la source, qui sert d'ETag.
+    """
+
+    store = store or get_blob_store()
+    if data is None:
+        data = store.get(source_key)
+
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+    widths = sorted({min(width, img.width) for width in PREVIEW_WIDTHS}, reverse=True)
+    levels = []
+    current = img
+    for width in widths:
+        if current.width != width:
+            height = max(1, round(current.height * width / current.width))
+            current = current.resize((width, height), Image.LANCZOS)
+        for format in PREVIEW_FORMATS:
+            store.put(
+                preview_key(source_key, width, format),
+                _encode(current, format),
+                content_type=MEDIA_TYPES[format]
+            )
+        levels.append({"width": width, "height": current.height})
+
+    index = {
+        "source": source_key,
+        "etag": hashlib.sha256(data).hexdigest()[:20],
+        "formats": list(PREVIEW_FORMATS),
+        "levels": sorted(levels, key=lambda level: level["width"])
+    }
+    store.put(index_key(source_key), json.dumps(index).encode(), content_type="application/json")
+    return index
+
+def load_preview_index(source_key: str, store: Optional[BlobStore] = None) -> Optional[Dict[str, Any]]:
+    store = store or get_blob_store()
+    key = index_key(source_key)
+    if not store.exists(key):
+        return None
+    return json.loads(store.get(key))
+
+def pick_level(index: Dict[str, Any], width: int) -> int:
+    """Plus petit niveau au moins aussi large que demandé (sinon le plus grand)"""
+    widths = [level["width"] for level in index["levels"]]
+    return next((w for w in widths if w >= width), widths[-1])
+
+def pick_format(index: Dict[str, Any], accept: str, requested: Optional[str] = None) -> str:
+    formats = index["formats"]
+    if requested in formats:
+        return requested
+    if "avif" in formats and "image/avif" in accept:
+        return "avif"
+    return "webp"
+
+def preview_etag(index: Dict[str, Any], width: int, format: str) -> str:
+    return f'"{index["etag"]}-{width}.{format}"'
+
+def store_image_with_previews(
+    key: str,
+    data: bytes,
+    content_type: str = "image/png",
+    store: Optional[BlobStore] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """Dépose une image de case ou de page et génère sa pyramide dans la foulée"""
+    store = store or get_blob_store()
+    store.put(key, data, content_type=content_type)
+    return key, build_preview_pyramid(key, data, store)
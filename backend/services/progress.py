@@ -0,0 +1,135 @@
+"""Bus de progression de la génération, publié sur Redis
+
+Les étapes émettent des événements fins (case, page, lettrage, export).
+Ceux d'un même projet sont regroupés sur une courte fenêtre : seul le
+dernier état de chaque case/page est gardé, puis publié en un message
+compact sur `project:{id}` (pub/sub, clients connectés) et ajouté à un
+stream Redis plafonné (rattrapage des clients arrivés en cours de route).
+"""
+
+from typing import Dict, Any, List, Optional
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+import asyncio
+import json
+import time
+
+from core.config import settings
+
+def channel_name(project_id: str) -> str:
+    return f"project:{project_id}"
+
+def stream_name(project_id: str) -> str:
+    return f"project:{project_id}:events"
+
+def event_key(event: Dict[str, Any]) -> str:
+    """Identité d'un événement : un événement plus récent de même clé remplace l'ancien"""
+    return f"{event['stage']}:{event.get('page', '')}:{event.get('panel', event.get('id', ''))}"
+
+def encode_message(project_id: str, events: List[Dict[str, Any]]) -> str:
+    return json.dumps(
+        {"type": "progress", "data": {"project_id": project_id, "events": events}},
+        separators=(",", ":")
+    )
+
+class ProgressBus:
+    """Regroupe les événements par projet et les publie au plus une fois par fenêtre"""
+
+    def __init__(
+        self,
+        redis: Optional[aioredis.Redis] = None,
+        window: Optional[float] = None,
+        stream_maxlen: Optional[int] = None
+    ):
+        self._redis = redis
+        self.window = window if window is not None else settings.PROGRESS_WINDOW_MS / 1000
+        self.stream_maxlen = stream_maxlen or settings.PROGRESS_STREAM_MAXLEN
+        self._pending: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        if self._redis is None:
+            self._redis = aioredis.from_url(settings.REDIS_URL)
+        return self._redis
+
+    def emit(self, project_id: str, stage: str, **fields: Any) -> None:
+        """Enregistre un événement ; la publication part à la fin de la fenêtre en cours"""
+
+        event = {"stage": stage, **fields, "ts": round(time.time(), 3)}
+        self._pending.setdefault(project_id, {})[event_key(event)] = event
+
+        if project_id not in self._timers:
+            self._timers[project_id] = asyncio.get_running_loop().create_task(
+                self._flush_later(project_id)
+            )
+
+    async def _flush_later(self, project_id: str) -> None:
+        await asyncio.sleep(self.window)
+        self._timers.pop(project_id, None)
+        await self._publish(project_id)
+
+    async def flush(self, project_id: Optional[str] = None) -> None:
+        """Publie immédiatement (fin d'étape, arrêt du worker)"""
+
+        for pid in ([project_id] if project_id else list(self._pending)):
+            timer = self._timers.pop(pid, None)
+            if timer is not None:
+                timer.cancel()
+            await self._publish(pid)
+
+    async def _publish(self, project_id: str) -> None:
+        events = list(self._pending.pop(project_id, {}).values())
+        if not events:
+            return
+
+        message = encode_message(project_id, events)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.xadd(
+                    stream_name(project_id),
+                    {"data": message},
+                    maxlen=self.stream_maxlen,
+                    approximate=True
+                )
+                pipe.publish(channel_name(project_id), message)
+                await pipe.execute()
+        except RedisError:
+            # La progression est indicative : elle ne doit jamais faire échouer une étape
+            pass
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+async def read_backlog(redis: aioredis.Redis, project_id: str, count: int = 100) -> List[str]:
+    """Derniers messages du projet, du plus ancien au plus récent"""
+
+    entries = await redis.xrevrange(stream_name(project_id), count=count)
+    return [
+        data.decode() if isinstance(data, bytes) else data
+        for _, fields in reversed(entries)
+        for key, data in fields.items()
+        if key in (b"data", "data")
+    ]
+
+_buses: Dict[asyncio.AbstractEventLoop, ProgressBus] = {}
+
+def get_progress_bus() -> ProgressBus:
+    """Bus de la boucle courante (la connexion Redis est liée à la boucle)"""
+
+    loop = asyncio.get_running_loop()
+    bus = _buses.get(loop)
+    if bus is None:
+        bus = _buses[loop] = ProgressBus()
+    return bus
+
+def emit_progress(project_id: str, stage: str, **fields: Any) -> None:
+    get_progress_bus().emit(project_id, stage, **fields)
+
+async def close_progress_bus() -> None:
+    bus = _buses.pop(asyncio.get_running_loop(), None)
+    if bus is not None:
+        await bus.close()
@@ -0,0 +1,143 @@
+"""Registre des exécutions de génération
+
+Chaque étape terminée y est inscrite avec sa sortie. Une tâche relivrée
+(worker tué, `acks_late`) ou une génération relancée retrouve ces
+sorties et ne refait que le travail manquant.
+"""
+
+from typing import Dict, Any, Awaitable, Callable, Optional
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+import uuid
+
+from core.config import settings
+from core.database import async_session_maker
+from models.generation import GenerationRun, RunStage
+from models.project import Project
+from services.progress import emit_progress, get_progress_bus
+
+class RunInProgress(Exception):
+    """Une exécution du chapitre tourne déjà : la relancer doublerait la génération"""
+
+    def __init__(self, run_id: str):
+        super().__init__(f"Generation run {run_id} is still running")
+        self.run_id = run_id
+
+async def _unfinished_run(
+    session: AsyncSession,
+    project_id: str,
+    chapter_number: int
+) -> Optional[GenerationRun]:
+    result = await session.execute(
+        select(GenerationRun)
+        .where(
+            GenerationRun.project_id == uuid.UUID(project_id),
+            GenerationRun.chapter_number == chapter_number,
+            GenerationRun.status != "completed"
+        )
+        .order_by(GenerationRun.created_at.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+async def _is_live(session: AsyncSession, run: GenerationRun) -> bool:
+    """En cours, avec une activité (reprise ou étape terminée) plus récente que le délai d'abandon"""
+
+    if run.status != "running":
+        return False
+    result = await session.execute(
+        select(func.max(RunStage.completed_at)).where(RunStage.run_id == run.id)
+    )
+    last_activity = max(filter(None, [run.updated_at, run.created_at, result.scalar()]))
+    return datetime.utcnow() - last_activity < timedelta(seconds=settings.GENERATION_RUN_STALE_S)
+
+async def live_run(project_id: str, chapter_number: int) -> Optional[str]:
+    """Exécution du chapitre encore en cours, s'il y en a une"""
+
+    async with async_session_maker() as session:
+        run = await _unfinished_run(session, project_id, chapter_number)
+        if run is not None and await _is_live(session, run):
+            return str(run.id)
+        return None
+
+async def start_run(project_id: str, chapter_number: int) -> str:
+    """Reprend la dernière exécution échouée (ou abandonnée) du chapitre, ou en ouvre une
+
+    La ligne du projet est verrouillée le temps de la décision : deux
+    lancements simultanés ne peuvent pas reprendre ni ouvrir chacun une
+    exécution. Une exécution encore vivante lève `RunInProgress`.
+    """
+
+    async with async_session_maker() as session:
+        await session.execute(
+            select(Project.id).where(Project.id == uuid.UUID(project_id)).with_for_update()
+        )
+        run = await _unfinished_run(session, project_id, chapter_number)
+
+        if run is None:
+            run = GenerationRun(project_id=uuid.UUID(project_id), chapter_number=chapter_number)
+            session.add(run)
+        elif await _is_live(session, run):
+            raise RunInProgress(str(run.id))
+        else:
+            run.status = "running"
+            run.attempts += 1
+            run.updated_at = datetime.utcnow()
+
+        await session.commit()
+        return str(run.id)
+
+async def stage_output(run_id: str, stage: str) -> Optional[Dict[str, Any]]:
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(RunStage.output).where(
+                RunStage.run_id == uuid.UUID(run_id),
+                RunStage.stage == stage
+            )
+        )
+        return result.scalar_one_or_none()
+
+async def complete_stage(run_id: str, stage: str, output: Dict[str, Any]) -> None:
+    """Inscrit une étape terminée ; une seconde inscription (tâche rejouée) est ignorée"""
+
+    async with async_session_maker() as session:
+        await session.execute(
+            insert(RunStage)
+            .values(id=uuid.uuid4(), run_id=uuid.UUID(run_id), stage=stage, output=output)
+            .on_conflict_do_nothing(index_elements=["run_id", "stage"])
+        )
+        await session.commit()
+
+async def checkpointed(
+    run_id: str,
+    stage: str,
+    compute: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """Sortie enregistrée de l'étape si elle est déjà faite, sinon calcul puis inscription"""
+
+    output = await stage_output(run_id, stage)
+    if output is not None:
+        return output
+
+    output = await compute()
+    await complete_stage(run_id, stage, output)
+    return output
+
+async def finish_run(run_id: str, status: str = "completed") -> None:
+    """Clôt l'exécution ; en cas d'échec le projet passe en erreur et pourra être relancé"""
+
+    async with async_session_maker() as session:
+        run = await session.get(GenerationRun, uuid.UUID(run_id))
+        run.status = status
+        run.finished_at = datetime.utcnow() if status == "completed" else None
+
+        project = await session.get(Project, run.project_id)
+        project.status = "completed" if status == "completed" else "error"
+        await session.commit()
+
+    # Dernier événement de l'exécution : publié sans attendre la fenêtre
+    project_id = str(run.project_id)
+    emit_progress(project_id, "run", status=status)
+    await get_progress_bus().flush(project_id)
@@ -0,0 +1,481 @@
+"""Étapes du pipeline de génération, exécutées par les tâches Celery
+
+Chaque étape lit ses entrées et écrit ses sorties dans le blob store ;
+seules des clés (et des identifiants) transitent par le broker. Les
+étapes sont inscrites au registre de l'exécution (`run_id`) : rejouées,
+elles renvoient leur sortie enregistrée sans refaire le travail.
+"""
+
+from typing import Dict, Any, List, Optional, Sequence
+from functools import lru_cache
+from sqlalchemy import select
+import asyncio
+import base64
+import json
+import uuid
+
+from core.database import async_session_maker
+from models.project import Project, Chapter, Page, Panel
+from models.character import Character
+from modules.scenario.generator import ScenarioGenerator
+from modules.character_design.designer import CharacterDesigner
+from modules.character_design.reference_library import lora_key
+from modules.page_generation.generator import PageGenerator
+from modules.consistency.checker import CharacterConsistencyChecker
+from modules.lettering.chapter import get_letterer, letter_page_by_key
+from modules.export.exporter import MangaExporter
+from services.cpu_pool import run_cpu_bound
+from services.previews import store_image_with_previews
+from services.progress import emit_progress
+from services.run_ledger import checkpointed, finish_run
+from services.storage import get_blob_store
+
+@lru_cache(maxsize=None)
+def get_scenario_generator() -> ScenarioGenerator:
+    return ScenarioGenerator()
+
+@lru_cache(maxsize=None)
+def get_character_designer() -> CharacterDesigner:
+    return CharacterDesigner()
+
+@lru_cache(maxsize=None)
+def get_page_generator() -> PageGenerator:
+    return PageGenerator()
+
+@lru_cache(maxsize=None)
+def get_exporter() -> MangaExporter:
+    return MangaExporter()
+
+def warm_up() -> None:
+    """Instancie les objets d'étape une fois par process worker
+
+    Clients (OpenAI, store), polices et caches de calage du lettrage sont
+    ensuite partagés par toutes les tâches du process.
+    """
+
+    get_scenario_generator()
+    get_character_designer()
+    get_page_generator()
+    get_exporter()
+    get_letterer()
+    get_blob_store()
+
+def chapter_prefix(project_id: str, chapter_number: int) -> str:
+    return f"projects/{project_id}/chapters/{chapter_number:03d}"
+
+def put_json(key: str, data: Any) -> str:
+    return get_blob_store().put(key, json.dumps(data).encode(), content_type="application/json")
+
+def get_json(key: str) -> Any:
+    return json.loads(get_blob_store().get(key))
+
+async def outline_chapter(project_id: str, chapter_number: int, run_id: str) -> Dict[str, Any]:
+    """Découpage du chapitre ; retourne ce qu'il faut pour déployer la suite du graphe"""
+
+    return await checkpointed(
+        run_id, "outline",
+        lambda: _outline_chapter(project_id, chapter_number)
+    )
+
+async def _outline_chapter(project_id: str, chapter_number: int) -> Dict[str, Any]:
+    async with async_session_maker() as session:
+        project = await session.get(Project, uuid.UUID(project_id))
+        result = await session.execute(
+            select(Character.id).where(Character.project_id == project.id)
+        )
+        character_ids = [str(character_id) for character_id in result.scalars().all()]
+
+    style = project.style.value
+    outline = await get_scenario_generator().generate_chapter_outline(
+        project.synopsis,
+        style,
+        chapter_number
+    )
+
+    outline_key = f"{chapter_prefix(project_id, chapter_number)}/outline.json"
+    await asyncio.to_thread(put_json, outline_key, outline)
+
+    async with async_session_maker() as session:
+        chapter = await _get_chapter(session, project_id, chapter_number)
+        if chapter is None:
+            chapter = Chapter(project_id=uuid.UUID(project_id), number=chapter_number)
+            session.add(chapter)
+        chapter.title = outline.get("title")
+        chapter.synopsis = outline.get("synopsis")
+        chapter.script = outline
+        await session.commit()
+
+    emit_progress(project_id, "outline", status="done", pages=len(outline["pages"]))
+
+    return {
+        "project_id": project_id,
+        "chapter_number": chapter_number,
+        "style": style,
+        "outline_key": outline_key,
+        "page_numbers": [page["page_number"] for page in outline["pages"]],
+        "character_ids": character_ids
+    }
+
+async def design_character(project_id: str, character_id: str, style: str, run_id: str) -> Dict[str, Any]:
+    """Fiche de référence d'un personnage du projet ; lance l'entraînement de son LoRA"""
+
+    return await checkpointed(
+        run_id, f"character:{character_id}",
+        lambda: _design_character(project_id, character_id, style)
+    )
+
+async def _design_character(project_id: str, character_id: str, style: str) -> Dict[str, Any]:
+    async with async_session_maker() as session:
+        character = await session.get(Character, uuid.UUID(character_id))
+
+    designer = get_character_designer()
+    reference = await designer.create_character_reference(
+        character.name,
+        character.visual_description,
+        style
+    )
+    # Le LoRA s'entraîne en tâche de fond : les pages de ce chapitre se
+    # contentent de la fiche de référence, les suivants utiliseront le LoRA
+    reference_hash = reference["lora_dataset"]["reference_hash"]
+    if reference.get("lora_path"):
+        training = None
+    elif reference.get("lora_task_id"):
+        # Fiche réutilisée dont le LoRA est déjà en cours d'entraînement
+        training = {
+            "task_id": reference["lora_task_id"],
+            "status": "training",
+            "lora_key": lora_key(reference_hash)
+        }
+    else:
+        training = await designer.start_lora_training(character_id, reference["lora_dataset"])
+    reference.pop("lora_task_id", None)
+
+    async with async_session_maker() as session:
+        character = await session.get(Character, uuid.UUID(character_id))
+        if training is None:
+            character.lora_path = reference["lora_path"]
+            character.training_status = "completed"
+        else:
+            reference.pop("lora_path", None)
+            reference["lora_training"] = training
+            character.training_status = "training"
+            character.training_params = {"task_id": training.get("task_id")}
+        await session.commit()
+
+    # Les variations en base64 ne servent plus : seules les clés sont gardées
+    reference.pop("variations", None)
+    reference["id"] = character_id
+    reference["visual_description"] = character.visual_description
+
+    key = f"projects/{project_id}/characters/{character_id}.json"
+    await asyncio.to_thread(put_json, key, reference)
+    # Index partagé (VECTOR_INDEX_PATH) relu par chaque page pour les contrôles de dérive
+    await asyncio.to_thread(CharacterConsistencyChecker().index_characters, [reference])
+    emit_progress(project_id, "character", id=character_id, status="done")
+
+    output = {"character_id": character_id, "key": key}
+    if training is not None:
+        output["lora_pending"] = {"reference_hash": reference_hash, "lora_key": training["lora_key"]}
+    return output
+
+async def collect_character_lora(character_id: str, reference_hash: str, lora_key: str) -> bool:
+    """Rattache le LoRA à la fiche et au personnage s'il est arrivé dans le blob store"""
+
+    if not await asyncio.to_thread(get_blob_store().exists, lora_key):
+        return False
+
+    await get_character_designer().reference_library.attach_lora(reference_hash, lora_key)
+    async with async_session_maker() as session:
+        character = await session.get(Character, uuid.UUID(character_id))
+        character.lora_path = lora_key
+        character.training_status = "completed"
+        await session.commit()
+    return True
+
+async def abandon_character_lora(character_id: str, reference_hash: str) -> None:
+    """Entraînement jamais abouti : la prochaine réutilisation de la fiche le relancera"""
+
+    await get_character_designer().reference_library.set_lora_training(reference_hash, None)
+    async with async_session_maker() as session:
+        character = await session.get(Character, uuid.UUID(character_id))
+        character.training_status = "failed"
+        await session.commit()
+
+def _lettering_panels(
+    page_data: Dict[str, Any],
+    page_result: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Dialogues et SFX du découpage, avec les cadres des cases sur la page composée"""
+
+    layout_panels = (page_result.get("layout") or {}).get("layout", {}).get("panels", [])
+    margins = PageGenerator.PAGE_MARGINS
+
+    panels = []
+    for i, panel in enumerate(page_data["panels"]):
+        entry = {
+            "panel_number": panel.get("panel_number", i + 1),
+            "dialogue": panel.get("dialogue", []),
+            "sound_effects": panel.get("sound_effects", [])
+        }
+        if i < len(layout_panels):
+            box = layout_panels[i]
+            x0 = margins["left"] + box["x"]
+            y0 = margins["top"] + box["y"]
+            entry["bounds"] = [x0, y0, x0 + box["width"], y0 + box["height"]]
+        panels.append(entry)
+    return panels
+
+async def _get_chapter(session, project_id: str, chapter_number: int) -> Optional[Chapter]:
+    result = await session.execute(
+        select(Chapter).where(
+            Chapter.project_id == uuid.UUID(project_id),
+            Chapter.number == chapter_number
+        )
+    )
+    return result.scalars().first()
+
+async def _get_or_create_page(project_id: str, chapter_number: int, page_number: int) -> uuid.UUID:
+    async with async_session_maker() as session:
+        chapter = await _get_chapter(session, project_id, chapter_number)
+        result = await session.execute(
+            select(Page).where(Page.chapter_id == chapter.id, Page.page_number == page_number)
+        )
+        page = result.scalars().first()
+        if page is None:
+            page = Page(chapter_id=chapter.id, page_number=page_number)
+            session.add(page)
+            await session.commit()
+        return page.id
+
+async def _load_completed_panels(page_id: uuid.UUID) -> Dict[int, Dict[str, Any]]:
+    """Cases déjà générées et persistées par une exécution précédente de la page"""
+
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(Panel).where(Panel.page_id == page_id, Panel.image_key.isnot(None))
+        )
+        panels = result.scalars().all()
+
+    store = get_blob_store()
+    images = await asyncio.gather(*[
+        asyncio.to_thread(store.get, panel.image_key) for panel in panels
+    ])
+    return {
+        panel.panel_number: {
+            "panel_number": panel.panel_number,
+            "image": base64.b64encode(image).decode(),
+            "embeddings": (panel.generation_params or {}).get("embeddings"),
+            "seed": panel.seed,
+            "prompt_used": panel.prompt
+        }
+        for panel, image in zip(panels, images)
+    }
+
+def _panel_saver(
+    project_id: str,
+    page_id: uuid.UUID,
+    panels_prefix: str,
+    page_data: Dict[str, Any]
+):
+    """Callback qui persiste chaque case dès sa génération (image, seed, prompt)"""
+
+    panels_by_number = {panel["panel_number"]: panel for panel in page_data["panels"]}
+
+    async def save(panel_result: Dict[str, Any]) -> None:
+        number = panel_result["panel_number"]
+        key = f"{panels_prefix}_panel_{number:02d}.png"
+        await run_cpu_bound(store_image_with_previews, key, base64.b64decode(panel_result["image"]))
+
+        panel_data = panels_by_number.get(number, {})
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(Panel).where(Panel.page_id == page_id, Panel.panel_number == number)
+            )
+            panel = result.scalars().first()
+            if panel is None:
+                panel = Panel(page_id=page_id, panel_number=number)
+                session.add(panel)
+            panel.description = panel_data.get("description")
+            panel.dialogue = panel_data.get("dialogue", [])
+            panel.image_key = key
+            panel.image_url = get_blob_store().url(key)
+            panel.seed = panel_result.get("seed")
+            panel.prompt = panel_result.get("prompt_used")
+            panel.generation_params = {"embeddings": panel_result.get("embeddings")}
+            await session.commit()
+
+        emit_progress(
+            project_id, "panel",
+            page=page_data["page_number"], panel=number, status="done", image_key=key
+        )
+
+    return save
+
+async def generate_page(
+    project_id: str,
+    chapter_number: int,
+    page_number: int,
+    outline_key: str,
+    character_keys: Sequence[str],
+    style: str,
+    run_id: str
+) -> Dict[str, Any]:
+    """Génère une planche et la dépose dans le store (avec sa pyramide d'aperçus)"""
+
+    return await checkpointed(
+        run_id, f"page:{page_number}",
+        lambda: _generate_page(
+            project_id, chapter_number, page_number, outline_key, character_keys, style
+        )
+    )
+
+async def _generate_page(
+    project_id: str,
+    chapter_number: int,
+    page_number: int,
+    outline_key: str,
+    character_keys: Sequence[str],
+    style: str
+) -> Dict[str, Any]:
+    outline, characters = await asyncio.gather(
+        asyncio.to_thread(get_json, outline_key),
+        asyncio.gather(*[asyncio.to_thread(get_json, key) for key in character_keys])
+    )
+    page_data = next(page for page in outline["pages"] if page["page_number"] == page_number)
+
+    # Les cases persistées par une tentative interrompue ne sont ni
+    # ré-enrichies ni regénérées
+    page_id = await _get_or_create_page(project_id, chapter_number, page_number)
+    completed = await _load_completed_panels(page_id)
+    pending = [panel for panel in page_data["panels"] if panel["panel_number"] not in completed]
+
+    scenario = get_scenario_generator()
+    descriptions = await asyncio.gather(*[
+        scenario.enhance_panel_description(panel, characters)
+        for panel in pending
+    ])
+    enhanced = {
+        panel["panel_number"]: description
+        for panel, description in zip(pending, descriptions)
+    }
+    page_data = {
+        **page_data,
+        "panels": [
+            {
+                **panel,
+                "enhanced_description": enhanced.get(panel["panel_number"], panel.get("description", ""))
+            }
+            for panel in page_data["panels"]
+        ]
+    }
+
+    # Index partagé construit par design_character ; les personnages conçus
+    # avant lui n'y figurent pas et sont indexés pour cette page seulement
+    checker = await asyncio.to_thread(CharacterConsistencyChecker)
+    checker.index_characters(
+        [c for c in characters if checker.character_key(c) not in checker.index],
+        persist=False
+    )
+
+    result = await get_page_generator().generate_page(
+        page_data,
+        list(characters),
+        {"style": style},
+        consistency_checker=checker,
+        completed_panels=completed,
+        on_panel=_panel_saver(
+            project_id,
+            page_id,
+            f"{chapter_prefix(project_id, chapter_number)}/panels/page_{page_number:03d}",
+            page_data
+        )
+    )
+
+    prefix = f"{chapter_prefix(project_id, chapter_number)}/pages/page_{page_number:03d}"
+    image_key = f"{prefix}.png"
+    await run_cpu_bound(
+        store_image_with_previews,
+        image_key,
+        base64.b64decode(result["full_page_image"])
+    )
+
+    page_key = f"{prefix}.json"
+    await asyncio.to_thread(put_json, page_key, {
+        "page_number": page_number,
+        "panels": _lettering_panels(page_data, result),
+        "seeds": [panel.get("seed") for panel in result["panels"]]
+    })
+
+    async with async_session_maker() as session:
+        page = await session.get(Page, page_id)
+        page.image_key = image_key
+        page.layout = (result.get("layout") or {}).get("layout")
+        await session.commit()
+
+    emit_progress(project_id, "page", page=page_number, status="generated", image_key=image_key)
+
+    return {"page_number": page_number, "image_key": image_key, "page_key": page_key}
+
+async def letter_page(
+    page_result: Dict[str, Any],
+    project_id: str,
+    chapter_number: int,
+    run_id: str
+) -> Dict[str, Any]:
+    """Lettrage d'une planche déjà générée (pool CPU du worker)"""
+
+    return await checkpointed(
+        run_id, f"lettering:{page_result['page_number']}",
+        lambda: _letter_page(page_result, project_id, chapter_number)
+    )
+
+async def _letter_page(page_result: Dict[str, Any], project_id: str, chapter_number: int) -> Dict[str, Any]:
+    page = await asyncio.to_thread(get_json, page_result["page_key"])
+    output_key = (
+        f"{chapter_prefix(project_id, chapter_number)}/lettered/"
+        f"page_{page_result['page_number']:03d}.png"
+    )
+    await run_cpu_bound(letter_page_by_key, page_result["image_key"], page["panels"], output_key)
+
+    async with async_session_maker() as session:
+        chapter = await _get_chapter(session, project_id, chapter_number)
+        result = await session.execute(
+            select(Page).where(
+                Page.chapter_id == chapter.id,
+                Page.page_number == page_result["page_number"]
+            )
+        )
+        row = result.scalars().first()
+        if row is not None:
+            row.lettered_image_key = output_key
+            await session.commit()
+
+    emit_progress(
+        project_id, "page",
+        page=page_result["page_number"], status="lettered", image_key=output_key
+    )
+
+    return {**page_result, "lettered_image_key": output_key}
+
+async def export_chapter(
+    page_results: List[Dict[str, Any]],
+    project_id: str,
+    chapter_number: int,
+    formats: Sequence[str],
+    run_id: str
+) -> Dict[str, Any]:
+    """Export du chapitre une fois toutes les planches lettrées, puis clôture de l'exécution"""
+
+    async def export() -> Dict[str, Any]:
+        pages = sorted(page_results, key=lambda page: page["page_number"])
+        urls = await get_exporter().export(
+            f"{project_id}/chapter_{chapter_number:03d}",
+            [{**page, "chapter_number": chapter_number} for page in pages],
+            formats
+        )
+        return {"status": "completed", "project_id": project_id, "exports": urls}
+
+    output = await checkpointed(run_id, "export", export)
+    emit_progress(project_id, "export", status="done", exports=output["exports"])
+    await finish_run(run_id)
+    return output
@@ -0,0 +1,299 @@
+from abc import ABC, abstractmethod
+from typing import BinaryIO, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from functools import lru_cache
+import tempfile
+import shutil
+import uuid
+import os
+
+from core.config import settings
+
+class BlobStore(ABC):
+    """Stockage objet adressé par clé (images, datasets, exports)"""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def open_multipart(self, key: str, content_type: Optional[str] = None) -> "MultipartUpload":
+        """Upload en plusieurs parts : l'objet n'apparaît qu'à complete()"""
+        raise NotImplementedError
+
+class MultipartUpload(ABC):
+    """Upload multipart en cours (sémantique S3 : parts numérotées à partir de 1)"""
+
+    @abstractmethod
+    def upload_part(self, part_number: int, body: BinaryIO) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete(self) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def abort(self) -> None:
+        raise NotImplementedError
+
+class MultipartWriter:
+    """Fichier en écriture seule envoyé part par part pendant qu'on écrit
+
+    La part courante est un SpooledTemporaryFile (mémoire puis disque) ;
+    dès qu'elle atteint part_size elle est envoyée en arrière-plan. Au plus
+    max_pending parts sont en vol : la mémoire ne dépend pas de la taille
+    totale du fichier.
+    """
+
+    def __init__(
+        self,
+        upload: MultipartUpload,
+        part_size: int = 16 * 2**20,
+        spool_memory: int = 4 * 2**20,
+        max_pending: int = 2
+    ):
+        self.upload = upload
+        self.part_size = part_size
+        self.spool_memory = spool_memory
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_pending)
+        self._pending: List[Future] = []
+        self._part_number = 0
+        self._position = 0
+        self._current = self._new_part()
+
+    def _new_part(self):
+        return tempfile.SpooledTemporaryFile(max_size=self.spool_memory)
+
+    def write(self, data: bytes) -> int:
+        self._current.write(data)
+        self._position += len(data)
+        if self._current.tell() >= self.part_size:
+            self._flush_part()
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def _flush_part(self) -> None:
+        part, self._current = self._current, self._new_part()
+        self._part_number += 1
+        part.seek(0)
+
+        # Contre-pression : on attend la plus ancienne part si trop sont en vol
+        while len(self._pending) >= self.max_pending:
+            self._pending.pop(0).result()
+
+        self._pending.append(
+            self._executor.submit(self._send, self._part_number, part)
+        )
+
+    def _send(self, part_number: int, part) -> None:
+        try:
+            self.upload.upload_part(part_number, part)
+        finally:
+            part.close()
+
+    def close(self) -> str:
+        """Envoie la dernière part, attend les envois et finalise l'objet"""
+        try:
+            if self._current.tell() > 0 or self._part_number == 0:
+                self._flush_part()
+            for future in self._pending:
+                future.result()
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._pending = []
+            self._executor.shutdown(wait=True)
+        return self.upload.complete()
+
+    def abort(self) -> None:
+        for future in self._pending:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        self._current.close()
+        self.upload.abort()
+
+class LocalMultipartUpload(MultipartUpload):
+    """Stand-in local compatible S3 : parts sur disque, assemblage à complete()"""
+
+    def __init__(self, store: "LocalBlobStore", key: str):
+        self.store = store
+        self.key = key
+        self.parts_dir = store.root / ".multipart" / uuid.uuid4().hex
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+
+    def upload_part(self, part_number: int, body: BinaryIO) -> None:
+        with open(self.parts_dir / f"{part_number:05d}", "wb") as f:
+            shutil.copyfileobj(body, f)
+
+    def complete(self) -> str:
+        path = self.store.path(self.key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+        with open(tmp_path, "wb") as out:
+            for part in sorted(self.parts_dir.iterdir()):
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out)
+        os.replace(tmp_path, path)
+
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return self.store.url(self.key)
+
+    def abort(self) -> None:
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+
+class S3MultipartUpload(MultipartUpload):
+    def __init__(self, store: "S3BlobStore", key: str, content_type: Optional[str] = None):
+        self.store = store
+        self.key = key
+        extra = {"ContentType": content_type} if content_type else {}
+        self.upload_id = store.client.create_multipart_upload(
+            Bucket=store.bucket, Key=key, **extra
+        )["UploadId"]
+        self._etags = {}
+
+    def upload_part(self, part_number: int, body: BinaryIO) -> None:
+        response = self.store.client.upload_part(
+            Bucket=self.store.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        self._etags[part_number] = response["ETag"]
+
+    def complete(self) -> str:
+        self.store.client.complete_multipart_upload(
+            Bucket=self.store.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": number, "ETag": etag}
+                    for number, etag in sorted(self._etags.items())
+                ]
+            }
+        )
+        return self.store.url(self.key)
+
+    def abort(self) -> None:
+        self.store.client.abort_multipart_upload(
+            Bucket=self.store.bucket,
+            Key=self.key,
+            UploadId=self.upload_id
+        )
+
+class LocalBlobStore(BlobStore):
+    """Stockage sur disque, partagé avec le serveur GPU via le volume /models"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Clé invalide: {key}")
+        return path
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None) -> str:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Écriture atomique : un lecteur ne voit jamais de fichier partiel
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        return key
+
+    def get(self, key: str) -> bytes:
+        return self.path(key).read_bytes()
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+    def url(self, key: str) -> str:
+        return self.path(key).as_uri()
+
+    def open_multipart(self, key: str, content_type: Optional[str] = None) -> MultipartUpload:
+        return LocalMultipartUpload(self, key)
+
+class S3BlobStore(BlobStore):
+    """Stockage S3 (ou compatible S3 via S3_ENDPOINT_URL)"""
+
+    def __init__(self, bucket: str):
+        import boto3
+
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            aws_access_key_id=settings.S3_ACCESS_KEY,
+            aws_secret_access_key=settings.S3_SECRET_KEY,
+            region_name=settings.S3_REGION,
+            endpoint_url=settings.S3_ENDPOINT_URL
+        )
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None) -> str:
+        extra = {"ContentType": content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
+        return key
+
+    def get(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def url(self, key: str) -> str:
+        if settings.S3_ENDPOINT_URL:
+            return f"{settings.S3_ENDPOINT_URL.rstrip('/')}/{self.bucket}/{key}"
+        return f"https://{self.bucket}.s3.{settings.S3_REGION}.amazonaws.com/{key}"
+
+    def open_multipart(self, key: str, content_type: Optional[str] = None) -> MultipartUpload:
+        return S3MultipartUpload(self, key, content_type)
+
+@lru_cache(maxsize=None)
+def get_blob_store(backend: Optional[str] = None) -> BlobStore:
+    """Retourne le store configuré (un par process, réutilisable dans les workers)"""
+
+    backend = backend or settings.BLOB_BACKEND
+    if backend == "local":
+        return LocalBlobStore(settings.BLOB_LOCAL_ROOT)
+    if backend == "s3":
+        return S3BlobStore(settings.S3_BUCKET)
+    raise ValueError(f"BLOB_BACKEND inconnu: {backend}")
@@ -1,15 +1,12 @@
-from celery import Celery, Task
+from celery import Celery, Task, chain, chord, group
 from celery.result import AsyncResult
-import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, List, Sequence
+import time
 import uuid
 
 from core.config import settings
-from modules.scenario.generator import ScenarioGenerator
-from modules.character_design.designer import CharacterDesigner
-from modules.page_generation.generator import PageGenerator
-from modules.lettering.letterer import Letterer
-from modules.export.exporter import MangaExporter
+from services import stages, run_ledger
+from services.worker_runtime import runtime
 
 celery_app = Celery(
     "manga_factory",
@@ -26,6 +23,22 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=3600,  # 1 heure max par tâche
     task_soft_time_limit=3300,
+    # Tâches longues : un worker ne réserve pas d'avance les pages des autres
+    worker_prefetch_multiplier=1,
+    # Acquittement après exécution : une tâche dont le worker meurt est
+    # relivrée, et reprend grâce au registre d'exécution
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    # Une file par étape : GPU (design, pages) et CPU (lettrage, export) séparés
+    task_routes={
+        "manga.outline_chapter": {"queue": "scenario"},
+        "manga.fan_out_pages": {"queue": "scenario"},
+        "manga.design_character": {"queue": "design"},
+        "manga.watch_lora_training": {"queue": "design"},
+        "manga.generate_page": {"queue": "pages"},
+        "manga.letter_page": {"queue": "lettering"},
+        "manga.export_chapter": {"queue": "export"},
+    },
 )
 
 class CallbackTask(Task):
@@ -35,70 +48,162 @@ class CallbackTask(Task):
         pass
     
     def on_failure(self, exc, task_id, args, kwargs, einfo):
-        """Échec"""
-        pass
+        """Échec : l'exécution reste reprenable, le projet passe en erreur"""
+        run_id = kwargs.get("run_id")
+        if run_id:
+            run_async(run_ledger.finish_run(run_id, status="failed"))
+
+def run_async(coro):
+    """Exécute une étape async sur la boucle persistante du process worker"""
+    return runtime.run(coro)
 
 @celery_app.task(bind=True, base=CallbackTask, name="generate_manga")
-def generate_manga_task(self, project_id: str) -> Dict[str, Any]:
-    """Tâche principale de génération de manga"""
+def generate_manga_task(self, project_id: str, formats: Sequence[str] = ("pdf",)) -> Dict[str, Any]:
+    """Tâche principale : remplacée par le graphe d'étapes du chapitre
     
-    # Conversion en async
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    scénario -> personnages (group) -> pages (chord de chaînes
+    génération | lettrage) -> export. Le résultat final reste attaché à
+    l'identifiant de cette tâche. Une exécution inachevée du chapitre
+    (worker tué, limite de temps) est reprise là où elle s'est arrêtée.
+    """
     
-    try:
-        result = loop.run_until_complete(
-            _generate_manga_async(self, project_id)
-        )
-        return result
-    finally:
-        loop.close()
+    run_id = run_async(run_ledger.start_run(project_id, 1))
+    return self.replace(outline_chapter_task.s(project_id, 1, list(formats), run_id=run_id))
 
-async def _generate_manga_async(task: Task, project_id: str):
-    """Logique async de génération"""
+@celery_app.task(bind=True, base=CallbackTask, name="manga.outline_chapter")
+def outline_chapter_task(
+    self,
+    project_id: str,
+    chapter_number: int,
+    formats: List[str],
+    run_id: str
+) -> Dict[str, Any]:
+    """Découpage du chapitre, puis design des personnages en parallèle"""
     
-    # Update progress
-    task.update_state(
-        state='PROGRESS',
-        meta={'current': 0, 'total': 100, 'status': 'Initialisation...'}
-    )
+    # La progression passe par emit_progress (WebSocket), pas par le backend de résultats
+    outline = run_async(stages.outline_chapter(project_id, chapter_number, run_id))
     
-    # 1. Génération du scénario
-    scenario_gen = ScenarioGenerator()
-    task.update_state(
-        state='PROGRESS',
-        meta={'current': 10, 'total': 100, 'status': 'Génération du scénario...'}
+    fan_out = fan_out_pages_task.s(
+        project_id,
+        chapter_number,
+        outline["outline_key"],
+        outline["page_numbers"],
+        outline["style"],
+        formats,
+        run_id=run_id
     )
     
-    # 2. Design des personnages
-    character_designer = CharacterDesigner()
-    task.update_state(
-        state='PROGRESS',
-        meta={'current': 30, 'total': 100, 'status': 'Création des personnages...'}
-    )
+    if not outline["character_ids"]:
+        return self.replace(fan_out.clone(args=([],)))
     
-    # 3. Génération des pages
-    page_gen = PageGenerator()
-    task.update_state(
-        state='PROGRESS',
-        meta={'current': 60, 'total': 100, 'status': 'Génération des planches...'}
+    design = group(
+        design_character_task.s(project_id, character_id, outline["style"], run_id=run_id)
+        for character_id in outline["character_ids"]
     )
+    return self.replace(chord(design, fan_out))
+
+@celery_app.task(bind=True, base=CallbackTask, name="manga.design_character")
+def design_character_task(
+    self,
+    project_id: str,
+    character_id: str,
+    style: str,
+    run_id: str
+) -> Dict[str, Any]:
+    result = run_async(stages.design_character(project_id, character_id, style, run_id))
     
-    # 4. Lettrage
-    letterer = Letterer()
-    task.update_state(
-        state='PROGRESS',
-        meta={'current': 80, 'total': 100, 'status': 'Ajout du lettrage...'}
-    )
+    # Le chapitre n'attend pas le LoRA : son arrivée est surveillée à part
+    pending = result.get("lora_pending")
+    if pending:
+        watch_lora_training_task.apply_async(
+            args=(character_id, pending["reference_hash"], pending["lora_key"]),
+            kwargs={"deadline": time.time() + settings.LORA_TRAINING_TIMEOUT_S},
+            countdown=settings.LORA_POLL_INTERVAL_S
+        )
+    return result
+
+@celery_app.task(bind=True, name="manga.watch_lora_training", max_retries=None)
+def watch_lora_training_task(
+    self,
+    character_id: str,
+    reference_hash: str,
+    lora_key: str,
+    deadline: float
+) -> bool:
+    """Rattache le LoRA entraîné dès qu'il est dans le blob store, sinon revérifie plus tard"""
     
-    # 5. Export final
-    exporter = MangaExporter()
-    task.update_state(
-        state='PROGRESS',
-        meta={'current': 95, 'total': 100, 'status': 'Export en cours...'}
-    )
+    if run_async(stages.collect_character_lora(character_id, reference_hash, lora_key)):
+        return True
+    if time.time() >= deadline:
+        run_async(stages.abandon_character_lora(character_id, reference_hash))
+        return False
+    raise self.retry(countdown=settings.LORA_POLL_INTERVAL_S)
+
+@celery_app.task(bind=True, base=CallbackTask, name="manga.fan_out_pages")
+def fan_out_pages_task(
+    self,
+    character_results: List[Dict[str, Any]],
+    project_id: str,
+    chapter_number: int,
+    outline_key: str,
+    page_numbers: List[int],
+    style: str,
+    formats: List[str],
+    run_id: str
+) -> Dict[str, Any]:
+    """Une chaîne génération | lettrage par page, réparties sur tous les workers"""
     
-    return {'status': 'completed', 'project_id': project_id}
+    character_keys = [result["key"] for result in character_results]
+    pages = group(
+        chain(
+            generate_page_task.s(
+                project_id, chapter_number, page_number, outline_key, character_keys, style,
+                run_id=run_id
+            ),
+            letter_page_task.s(project_id, chapter_number, run_id=run_id)
+        )
+        for page_number in page_numbers
+    )
+    return self.replace(chord(
+        pages,
+        export_chapter_task.s(project_id, chapter_number, formats, run_id=run_id)
+    ))
+
+@celery_app.task(bind=True, base=CallbackTask, name="manga.generate_page")
+def generate_page_task(
+    self,
+    project_id: str,
+    chapter_number: int,
+    page_number: int,
+    outline_key: str,
+    character_keys: List[str],
+    style: str,
+    run_id: str
+) -> Dict[str, Any]:
+    return run_async(stages.generate_page(
+        project_id, chapter_number, page_number, outline_key, character_keys, style, run_id
+    ))
+
+@celery_app.task(bind=True, base=CallbackTask, name="manga.letter_page")
+def letter_page_task(
+    self,
+    page_result: Dict[str, Any],
+    project_id: str,
+    chapter_number: int,
+    run_id: str
+) -> Dict[str, Any]:
+    return run_async(stages.letter_page(page_result, project_id, chapter_number, run_id))
+
+@celery_app.task(bind=True, base=CallbackTask, name="manga.export_chapter")
+def export_chapter_task(
+    self,
+    page_results: List[Dict[str, Any]],
+    project_id: str,
+    chapter_number: int,
+    formats: List[str],
+    run_id: str
+) -> Dict[str, Any]:
+    return run_async(stages.export_chapter(page_results, project_id, chapter_number, formats, run_id))
 
 def enqueue_generation_task(project_id: str) -> str:
     """Lance une tâche de génération"""
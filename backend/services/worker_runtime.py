@@ -0,0 +1,115 @@
+"""Cycle de vie des process worker Celery
+
+Chaque process garde une boucle asyncio pour toute sa durée de vie,
+dans un thread dédié démarré sur `worker_process_init`. Les tâches y
+soumettent leurs coroutines : pool de connexions SQLAlchemy, session
+HTTP et clients des étapes restent chauds d'une tâche à l'autre au lieu
+d'être recréés (puis fermés) à chaque tâche.
+"""
+
+from concurrent.futures import Future
+from typing import Any, Awaitable, Optional
+import asyncio
+import logging
+import threading
+
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
+
+from core.database import engine
+from services import stages
+from services.cpu_pool import shutdown_cpu_executor
+from services.gpu_pool import close_gpu_pool
+from services.http import close_http_session
+from services.progress import close_progress_bus
+
+logger = logging.getLogger(__name__)
+
+class WorkerRuntime:
+    """Boucle asyncio persistante, exécutée dans un thread du process worker"""
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None and self.loop.is_running()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                args=(ready,),
+                name="worker-loop",
+                daemon=True
+            )
+            self._thread.start()
+            ready.wait()
+
+        # Connexions héritées du process parent (fork) : jamais réutilisées
+        self.run(engine.dispose(close=False))
+
+    def _run_loop(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    def run(self, coro: Awaitable[Any]) -> Any:
+        """Exécute une coroutine sur la boucle du worker et attend son résultat
+
+        Si la tâche est interrompue (SoftTimeLimitExceeded, arrêt du
+        worker), la coroutine est annulée sur la boucle avant de propager.
+        """
+
+        if not self.running:
+            self.start()
+
+        future: Future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self) -> None:
+        with self._lock:
+            if not self.running:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._close_resources(), self.loop).result(timeout=30)
+            except Exception:
+                logger.exception("Échec de la fermeture des ressources du worker")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=30)
+            self.loop.close()
+            self.loop = None
+            self._thread = None
+
+        shutdown_cpu_executor()
+
+    async def _close_resources(self) -> None:
+        await close_progress_bus()
+        await close_gpu_pool()
+        await close_http_session()
+        await engine.dispose()
+
+runtime = WorkerRuntime()
+
+@worker_process_init.connect
+def _start_runtime(**kwargs) -> None:
+    runtime.start()
+    stages.warm_up()
+
+@worker_process_shutdown.connect
+def _stop_runtime_process(**kwargs) -> None:
+    runtime.stop()
+
+@worker_shutdown.connect
+def _stop_runtime(**kwargs) -> None:
+    # Pools solo/threads : pas de worker_process_shutdown
+    runtime.stop()
@@ -0,0 +1,197 @@
+"""Diffusion WebSocket de la progression des projets
+
+Un seul abonnement Redis par projet actif, quel que soit le nombre de
+sockets ouvertes dessus. Chaque message reçu est déposé dans la file
+bornée de chaque client ; un client dont la file est pleine (lecteur trop
+lent) est déconnecté plutôt que de retenir les autres. L'abonnement est
+fermé au départ du dernier client.
+"""
+
+from typing import Dict, List, Optional, Set
+from fastapi import WebSocket
+from redis import asyncio as aioredis
+import asyncio
+
+from core.config import settings
+from services.progress import channel_name, read_backlog
+
+# Code de fermeture envoyé à un client trop lent ("Try Again Later")
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+class HubClient:
+    """Socket attachée à un projet, alimentée par sa propre file bornée"""
+
+    def __init__(self, websocket: WebSocket, project_id: str, queue_size: int):
+        self.websocket = websocket
+        self.project_id = project_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = asyncio.Event()
+        # Messages reçus en direct pendant le rattrapage, envoyés après lui
+        self.held: Optional[List[str]] = []
+
+    def offer(self, message: str) -> bool:
+        """Dépose un message sans attendre ; False si le client ne suit plus"""
+        if self.held is not None:
+            self.held.append(message)
+            return True
+        return self._put(message)
+
+    def replay(self, backlog: List[str]) -> None:
+        """Envoie le rattrapage puis les messages directs retenus, sans doublon
+
+        Un message publié entre l'abonnement et la lecture du stream figure
+        dans les deux : publication et stream portent le même texte.
+        """
+
+        seen = set(backlog)
+        held, self.held = self.held or [], None
+        for message in backlog + [m for m in held if m not in seen]:
+            if not self._put(message):
+                return
+
+    def _put(self, message: str) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.dropped.set()
+            return False
+
+    async def run(self) -> None:
+        """Envoie la file jusqu'à la déconnexion du client (ou son éviction)"""
+
+        tasks = {
+            asyncio.create_task(self._send_loop()),
+            asyncio.create_task(self._receive_loop()),
+            asyncio.create_task(self.dropped.wait()),
+        }
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        for task in done:
+            # Déconnexion (ou envoi sur une socket déjà fermée) : fin normale
+            task.exception()
+
+        if self.dropped.is_set():
+            try:
+                await asyncio.wait_for(
+                    self.websocket.close(code=SLOW_CLIENT_CLOSE_CODE),
+                    timeout=1
+                )
+            except Exception:
+                pass
+
+    async def _send_loop(self) -> None:
+        while True:
+            await self.websocket.send_text(await self.queue.get())
+
+    async def _receive_loop(self) -> None:
+        # Seule la fermeture côté client est attendue ici
+        while True:
+            await self.websocket.receive_text()
+
+class ProjectChannel:
+    """Abonnement Redis d'un projet et ensemble des clients qui le suivent"""
+
+    def __init__(self, project_id: str, pubsub):
+        self.project_id = project_id
+        self.pubsub = pubsub
+        self.clients: Set[HubClient] = set()
+        self.reader: Optional[asyncio.Task] = None
+
+    async def read(self) -> None:
+        try:
+            async for message in self.pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = message["data"]
+                if isinstance(data, bytes):
+                    data = data.decode()
+                for client in list(self.clients):
+                    if not client.offer(data):
+                        self.clients.discard(client)
+        except Exception:
+            # Abonnement perdu : les clients sont fermés et se reconnecteront
+            for client in self.clients:
+                client.dropped.set()
+
+class WebSocketHub:
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        queue_size: Optional[int] = None,
+        backlog: Optional[int] = None
+    ):
+        self.redis = redis
+        self.queue_size = queue_size or settings.WS_CLIENT_QUEUE_SIZE
+        self.backlog = settings.WS_BACKLOG_MESSAGES if backlog is None else backlog
+        self.channels: Dict[str, ProjectChannel] = {}
+        self._lock = asyncio.Lock()
+
+    async def attach(self, project_id: str, websocket: WebSocket) -> HubClient:
+        """Rattache une socket acceptée : rattrapage depuis le stream, puis direct
+
+        L'abonnement précède la lecture du stream : un message publié entre
+        les deux est retenu puis dédoublonné, jamais perdu.
+        """
+
+        client = HubClient(websocket, project_id, self.queue_size)
+
+        async with self._lock:
+            channel = self.channels.get(project_id)
+            if channel is not None and channel.reader.done():
+                # Abonnement perdu : remplacé, ses anciens clients partent d'eux-mêmes
+                self.channels.pop(project_id)
+                await self._close_channel(channel)
+                channel = None
+            if channel is None:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(channel_name(project_id))
+                channel = ProjectChannel(project_id, pubsub)
+                channel.reader = asyncio.create_task(channel.read())
+                self.channels[project_id] = channel
+            channel.clients.add(client)
+
+        try:
+            backlog = await read_backlog(self.redis, project_id, self.backlog) if self.backlog else []
+        except Exception:
+            await self.detach(client)
+            raise
+        client.replay(backlog)
+        return client
+
+    async def detach(self, client: HubClient) -> None:
+        async with self._lock:
+            channel = self.channels.get(client.project_id)
+            if channel is None:
+                return
+            channel.clients.discard(client)
+            if not channel.clients:
+                del self.channels[client.project_id]
+                await self._close_channel(channel)
+
+    async def serve(self, project_id: str, websocket: WebSocket) -> None:
+        """Cycle de vie complet d'une socket de progression"""
+
+        client = await self.attach(project_id, websocket)
+        try:
+            await client.run()
+        finally:
+            await self.detach(client)
+
+    async def _close_channel(self, channel: ProjectChannel) -> None:
+        channel.reader.cancel()
+        await asyncio.gather(channel.reader, return_exceptions=True)
+        try:
+            await channel.pubsub.unsubscribe()
+            await channel.pubsub.close()
+        except Exception:
+            pass
+
+    async def close(self) -> None:
+        async with self._lock:
+            channels, self.channels = list(self.channels.values()), {}
+            for channel in channels:
+                await self._close_channel(channel)
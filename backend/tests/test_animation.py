@@ -0,0 +1,44 @@
+import base64
+import io
+
+import pytest
+
+from PIL import Image, ImageDraw
+
+from modules.export.animation import compose_animation, encode_animation, merge_duplicate_frames
+
+def _frames():
+    frames = []
+    for x in (0, 0, 0, 20, 40):
+        frame = Image.new("RGB", (96, 64), (240, 240, 240))
+        ImageDraw.Draw(frame).ellipse((x, 16, x + 24, 40), fill=(200, 40, 40))
+        frames.append(frame)
+    return frames
+
+def test_duplicate_frames_are_merged():
+    """Les frames identiques consécutives deviennent une seule frame plus longue"""
+    frames, durations = merge_duplicate_frames(_frames(), [100] * 5)
+
+    assert len(frames) == 3
+    assert durations == [300, 100, 100]
+
+def test_all_formats_share_one_sequence():
+    """GIF, WebP animé et APNG encodent la même séquence dédoublonnée"""
+    for format, pillow_format in (("gif", "GIF"), ("webp", "WEBP"), ("apng", "PNG")):
+        data = encode_animation(_frames(), [100] * 5, format)
+        with Image.open(io.BytesIO(data)) as img:
+            assert img.format == pillow_format
+            assert img.n_frames == 3
+
+def test_panels_without_frames_are_skipped():
+    """Une case sans frame est ignorée ; aucune frame du tout est une erreur explicite"""
+    buffer = io.BytesIO()
+    _frames()[3].save(buffer, format="PNG")
+    frame = base64.b64encode(buffer.getvalue()).decode()
+
+    data = compose_animation([([], 8), ([frame, frame], 8)], width=96)
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.n_frames == 1
+
+    with pytest.raises(ValueError):
+        compose_animation([([], 8)])
@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+
+from modules.lettering.letterer import BubbleDetector
+
+BUBBLES = [((600, 700), (150, 100)), ((1800, 2400), (100, 140))]
+
+def _page() -> np.ndarray:
+    page = np.full((3508, 2480, 3), 255, dtype=np.uint8)
+    cv2.rectangle(page, (80, 100), (2400, 3400), (0, 0, 0), 6)
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        p0 = (int(rng.integers(100, 2380)), int(rng.integers(120, 3380)))
+        p1 = (p0[0] + int(rng.integers(-60, 60)), p0[1] + int(rng.integers(-60, 60)))
+        cv2.line(page, p0, p1, (0, 0, 0), 3)
+    for center, axes in BUBBLES:
+        cv2.ellipse(page, center, axes, 0, 0, 360, (255, 255, 255), -1)
+        cv2.ellipse(page, center, axes, 0, 0, 360, (0, 0, 0), 4)
+    return page
+
+def test_detects_ellipse_bubbles_at_full_resolution():
+    """Les bulles sont trouvées sur la copie réduite et rendues en pleine résolution"""
+    bubbles = BubbleDetector().detect(_page())
+
+    found = sorted(bubble["bounds"] for bubble in bubbles)
+    assert len(found) == len(BUBBLES)
+    for bounds, ((cx, cy), (ax, ay)) in zip(found, sorted(BUBBLES)):
+        expected = (cx - ax, cy - ay, cx + ax, cy + ay)
+        # Intérieur de la bulle : le trait de 4 px et l'arrondi de l'échelle
+        assert all(abs(a - b) <= 8 for a, b in zip(bounds, expected))
+    for bubble in bubbles:
+        x0, y0, x1, y1 = bubble["bounds"]
+        assert bubble["area"] < (x1 - x0) * (y1 - y0)
+        assert bubble["contour"][:, 0, 0].min() >= x0 - 2
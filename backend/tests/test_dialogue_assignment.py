@@ -0,0 +1,41 @@
+from modules.lettering.assignment import GridIndex, assign_dialogues_to_bubbles
+
+def _bubble(x0, y0, x1, y1):
+    return {"bounds": (x0, y0, x1, y1), "area": (x1 - x0) * (y1 - y0)}
+
+def test_grid_index_buckets_bubbles_by_panel():
+    """Seules les bulles dont le centre est dans la case sont retournées"""
+    index = GridIndex([(10, 10, 50, 50), (600, 40, 700, 120), (300, 900, 360, 960)], cell_size=128)
+
+    assert index.query((0, 0, 500, 500)) == [0]
+    assert index.query((500, 0, 1000, 500)) == [1]
+    assert index.query((0, 0, 1000, 1000)) == [0, 1, 2]
+
+def test_dialogues_follow_manga_reading_order_per_panel():
+    """Droite à gauche puis haut en bas, sans déborder sur la case voisine"""
+    bubbles = [
+        _bubble(100, 100, 300, 300),    # Case 1, à gauche
+        _bubble(600, 100, 800, 300),    # Case 1, à droite : lue en premier
+        _bubble(400, 1200, 600, 1400),  # Case 2
+    ]
+    panels = [
+        {
+            "bounds": (0, 0, 1000, 1000),
+            "dialogue": [
+                {"character": "Hero", "text": "Premier !"},
+                {"character": "Rival", "text": "Deuxième."}
+            ]
+        },
+        {
+            "bounds": (0, 1000, 1000, 2000),
+            "dialogue": [{"character": "Hero", "text": "Troisième."}]
+        }
+    ]
+
+    assignments = assign_dialogues_to_bubbles(bubbles, panels)
+
+    assert [(b["bounds"], d["text"]) for b, d in assignments] == [
+        ((600, 100, 800, 300), "Premier !"),
+        ((100, 100, 300, 300), "Deuxième."),
+        ((400, 1200, 600, 1400), "Troisième.")
+    ]
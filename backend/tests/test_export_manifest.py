@@ -0,0 +1,30 @@
+from modules.export.manifest import ExportManifest, page_content_hash, settings_digest
+from services.storage import LocalBlobStore
+
+def test_only_changed_pages_get_a_new_hash():
+    """L'empreinte change avec l'image ou les réglages, pas autrement"""
+    digest = settings_digest(format="print", dpi=600)
+
+    assert page_content_hash(digest, b"page-1") == page_content_hash(digest, b"page-1")
+    assert page_content_hash(digest, b"page-1") != page_content_hash(digest, b"page-1 retouchee")
+    assert page_content_hash(digest, b"page-1") != page_content_hash(
+        settings_digest(format="print", dpi=300), b"page-1"
+    )
+
+def test_manifest_roundtrip_and_stale_keys(tmp_path):
+    """Le manifeste est persisté et signale les rendus périmés à supprimer"""
+    store = LocalBlobStore(str(tmp_path))
+    manifest = ExportManifest.load(store, "p1", "pdf-print")
+    assert manifest.get(1) is None
+
+    manifest.set(1, {"hash": "a", "key": "exports/p1/pdf-print/pages/page_001_a.bin"})
+    manifest.set(2, {"hash": "b", "key": "exports/p1/pdf-print/pages/page_002_b.bin"})
+    manifest.save()
+
+    reloaded = ExportManifest.load(store, "p1", "pdf-print")
+    assert reloaded.get(2)["hash"] == "b"
+
+    # Page 1 retouchée, page 2 supprimée du projet
+    stale = reloaded.set(1, {"hash": "c", "key": "exports/p1/pdf-print/pages/page_001_c.bin"})
+    assert stale == "exports/p1/pdf-print/pages/page_001_a.bin"
+    assert reloaded.prune([1]) == ["exports/p1/pdf-print/pages/page_002_b.bin"]
@@ -0,0 +1,37 @@
+import io
+import zipfile
+
+from modules.export.sinks import CBZSink, EPUBSink
+from services.storage import LocalBlobStore
+
+def _feed(sink, page_count=3):
+    sink.open()
+    for page_number in range(1, page_count + 1):
+        sink.add_page(page_number, {
+            "reader_jpeg": b"\xff\xd8fake-jpeg-%d" % page_number,
+            "reader_size": (1357, 1920)
+        })
+    return sink.close()
+
+def test_cbz_and_epub_share_the_same_page_rendition(tmp_path):
+    """Les deux archives sont écrites en streaming à partir des mêmes JPEG"""
+    store = LocalBlobStore(str(tmp_path))
+
+    _feed(CBZSink(store, "p1", "Test", (595, 842)))
+    _feed(EPUBSink(store, "p1", "Test", (595, 842)))
+
+    with zipfile.ZipFile(io.BytesIO(store.get("exports/p1/manga.cbz"))) as cbz:
+        assert cbz.testzip() is None
+        assert cbz.read("002.jpg") == b"\xff\xd8fake-jpeg-2"
+        assert "<PageCount>3</PageCount>" in cbz.read("ComicInfo.xml").decode()
+
+    epub_data = store.get("exports/p1/manga.epub")
+    with zipfile.ZipFile(io.BytesIO(epub_data)) as epub:
+        assert epub.namelist()[0] == "mimetype"
+        assert epub.getinfo("mimetype").compress_type == zipfile.ZIP_STORED
+        assert epub.read("OEBPS/images/page_002.jpg") == b"\xff\xd8fake-jpeg-2"
+        opf = epub.read("OEBPS/content.opf").decode()
+        assert 'page-progression-direction="rtl"' in opf
+        assert opf.count("<itemref") == 3
+    # Le type MIME est lisible en clair à l'offset 30 (exigence EPUB OCF)
+    assert epub_data[30:38] == b"mimetype"
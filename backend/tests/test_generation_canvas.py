@@ -0,0 +1,210 @@
+import asyncio
+import base64
+import io
+import json
+import uuid
+from types import SimpleNamespace
+
+from celery.backends.cache import CacheBackend
+from PIL import Image, ImageDraw
+
+from modules.character_design import designer as designer_module
+from modules.character_design.designer import CharacterDesigner
+from modules.character_design.reference_library import lora_key
+from modules.consistency.vector_index import FlatVectorIndex
+from core.config import settings
+from services import run_ledger, stages, task_queue
+from services.storage import LocalBlobStore
+from services.worker_runtime import WorkerRuntime
+
+def _variation(shape: str) -> str:
+    img = Image.new("RGB", (256, 256), "white")
+    draw = ImageDraw.Draw(img)
+    if shape == "ellipse":
+        draw.ellipse((50, 40, 200, 230), fill="black")
+    else:
+        draw.rectangle((20, 150, 240, 170), fill="black")
+        draw.rectangle((30, 20, 70, 100), fill="black")
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+class StubGPUPool:
+    """Répond comme manga_api : l'entraînement LoRA ne renvoie qu'un identifiant de tâche"""
+
+    def __init__(self):
+        self.paths = []
+
+    async def post(self, path, payload, affinity=None, timeout=None, hedge=False):
+        self.paths.append(path)
+        if path == "/api/generate":
+            return {"images": [_variation("ellipse"), _variation("pose")], "seed": 42}
+        if path == "/api/embed_images":
+            return {"embeddings": [[1.0, 0.0] for _ in payload["images"]], "model": "clip"}
+        if path == "/api/train_lora":
+            return {"task_id": "train-1", "status": "training_started", "estimated_time": 1800}
+        raise AssertionError(f"route inattendue: {path}")
+
+class FakeSession:
+    def __init__(self, character):
+        self.character = character
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get(self, model, ident):
+        return self.character
+
+    async def commit(self):
+        pass
+
+def test_canvas_designs_characters_without_waiting_for_lora(monkeypatch, tmp_path):
+    """Le graphe va jusqu'à l'export pendant que le LoRA s'entraîne côté GPU"""
+    project_id, character_id = str(uuid.uuid4()), str(uuid.uuid4())
+    character = SimpleNamespace(
+        name="Aiko",
+        visual_description="short red hair, school uniform",
+        lora_path=None,
+        training_status="pending",
+        training_params=None
+    )
+    store = LocalBlobStore(str(tmp_path))
+    pool = StubGPUPool()
+    designer = CharacterDesigner()
+    calls = {}
+
+    async def no_reference(*args, **kwargs):
+        return None
+
+    async def inline(func, *args):
+        return func(*args)
+
+    async def start_run(project_id, chapter_number):
+        return "run-1"
+
+    async def checkpointed(run_id, stage, compute):
+        return await compute()
+
+    async def outline_chapter(project_id, chapter_number, run_id):
+        return {
+            "project_id": project_id,
+            "chapter_number": chapter_number,
+            "style": "shonen",
+            "outline_key": "outline.json",
+            "page_numbers": [1, 2],
+            "character_ids": [character_id]
+        }
+
+    async def generate_page(project_id, chapter_number, page_number, outline_key, character_keys, style, run_id):
+        calls.setdefault("character_keys", []).append(character_keys)
+        return {"page_number": page_number}
+
+    async def letter_page(page_result, project_id, chapter_number, run_id):
+        return page_result
+
+    async def export_chapter(page_results, project_id, chapter_number, formats, run_id):
+        return {"pages": sorted(page["page_number"] for page in page_results)}
+
+    async def set_lora_training(reference_hash, task_id):
+        calls["training_marked"] = task_id
+
+    monkeypatch.setattr(designer.reference_library, "find", no_reference)
+    monkeypatch.setattr(designer.reference_library, "register", no_reference)
+    monkeypatch.setattr(designer.reference_library, "set_lora_training", set_lora_training)
+    monkeypatch.setattr(designer_module, "get_gpu_pool", lambda: pool)
+    monkeypatch.setattr(designer_module, "get_blob_store", lambda: store)
+    monkeypatch.setattr(designer_module, "run_cpu_bound", inline)
+    monkeypatch.setattr(stages, "get_character_designer", lambda: designer)
+    monkeypatch.setattr(stages, "get_blob_store", lambda: store)
+    monkeypatch.setattr(stages, "async_session_maker", lambda: FakeSession(character))
+    monkeypatch.setattr(stages, "emit_progress", lambda *args, **kwargs: None)
+    monkeypatch.setattr(settings, "VECTOR_INDEX_PATH", str(tmp_path / "characters.npz"))
+    monkeypatch.setattr(stages, "checkpointed", checkpointed)
+    monkeypatch.setattr(stages, "outline_chapter", outline_chapter)
+    monkeypatch.setattr(stages, "generate_page", generate_page)
+    monkeypatch.setattr(stages, "letter_page", letter_page)
+    monkeypatch.setattr(stages, "export_chapter", export_chapter)
+    monkeypatch.setattr(run_ledger, "start_run", start_run)
+    monkeypatch.setattr(task_queue.celery_app.conf, "task_always_eager", True)
+    monkeypatch.setattr(task_queue.celery_app.conf, "task_eager_propagates", True)
+    # Le chord suit ses résultats via le backend : en mémoire, sans Redis
+    monkeypatch.setattr(
+        task_queue.celery_app,
+        "_backend_cache",
+        CacheBackend(app=task_queue.celery_app, backend="memory")
+    )
+    runtime = WorkerRuntime()
+    monkeypatch.setattr(task_queue, "runtime", runtime)
+    watched = []
+    monkeypatch.setattr(
+        task_queue.watch_lora_training_task,
+        "apply_async",
+        lambda args, kwargs, countdown: watched.append(args)
+    )
+
+    try:
+        result = task_queue.generate_manga_task.apply(args=(project_id,)).get()
+    finally:
+        runtime.stop()
+
+    assert result == {"pages": [1, 2]}
+    assert pool.paths.count("/api/train_lora") == 1
+
+    key = f"projects/{project_id}/characters/{character_id}.json"
+    assert calls["character_keys"] == [[key], [key]]
+    reference = json.loads(store.get(key))
+    assert "lora_path" not in reference
+    assert reference["lora_training"]["task_id"] == "train-1"
+    assert character.training_status == "training"
+    assert character.training_params == {"task_id": "train-1"}
+
+    # La fiche est marquée en entraînement et l'arrivée du LoRA surveillée
+    assert calls["training_marked"] == "train-1"
+    reference_hash = reference["lora_dataset"]["reference_hash"]
+    assert watched == [(character_id, reference_hash, lora_key(reference_hash))]
+    assert reference["lora_training"]["lora_key"] == lora_key(reference_hash)
+
+    # Embedding de la fiche versé à l'index partagé relu par les pages
+    assert character_id in FlatVectorIndex.load(settings.VECTOR_INDEX_PATH)
+
+def test_reused_sheet_in_training_is_not_trained_again(monkeypatch, tmp_path):
+    """Une fiche réutilisée dont le LoRA s'entraîne déjà ne relance pas d'entraînement"""
+    character = SimpleNamespace(
+        name="Aiko",
+        visual_description="short red hair, school uniform",
+        lora_path=None,
+        training_status="pending",
+        training_params=None
+    )
+    store = LocalBlobStore(str(tmp_path))
+    pool = StubGPUPool()
+    designer = CharacterDesigner()
+
+    async def existing(description, style):
+        return {
+            "description_hash": "ab" * 32,
+            "reference_images": ["lora_datasets/x/references/000.png"],
+            "image_hashes": [1],
+            "dataset_prefix": "lora_datasets/x",
+            "lora_path": None,
+            "lora_task_id": "train-0",
+            "generation_params": {},
+            "visual_features": {}
+        }
+
+    monkeypatch.setattr(designer.reference_library, "find", existing)
+    monkeypatch.setattr(designer_module, "get_gpu_pool", lambda: pool)
+    monkeypatch.setattr(stages, "get_character_designer", lambda: designer)
+    monkeypatch.setattr(stages, "get_blob_store", lambda: store)
+    monkeypatch.setattr(stages, "async_session_maker", lambda: FakeSession(character))
+    monkeypatch.setattr(stages, "emit_progress", lambda *args, **kwargs: None)
+    monkeypatch.setattr(settings, "VECTOR_INDEX_PATH", str(tmp_path / "characters.npz"))
+
+    output = asyncio.run(stages._design_character("p1", str(uuid.uuid4()), "shonen"))
+
+    assert pool.paths == []
+    assert character.training_params == {"task_id": "train-0"}
+    assert output["lora_pending"] == {"reference_hash": "ab" * 32, "lora_key": lora_key("ab" * 32)}
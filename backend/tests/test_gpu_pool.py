@@ -0,0 +1,133 @@
+import asyncio
+import random
+import aiohttp
+import pytest
+
+from services import gpu_pool
+from services.gpu_pool import CircuitBreaker, GPUPool, lora_affinity
+
+def make_pool(count=4):
+    return GPUPool([f"http://gpu{i}:7860" for i in range(count)], rng=random.Random(0))
+
+def test_two_choices_prefers_least_expected_wait():
+    pool = make_pool(2)
+    busy, idle = pool.endpoints
+    busy.in_flight = 3
+
+    assert all(pool.pick() is idle for _ in range(20))
+
+    # À charge égale, un serveur plus lent perd aussi
+    busy.in_flight = 0
+    busy.latency = 5.0
+    assert pool.pick() is idle
+
+def test_load_from_other_workers_counts_in_expected_wait():
+    """Un serveur chargé par d'autres process (vu via /api/health) n'a pas l'air libre"""
+    pool = make_pool(2)
+    shared, idle = pool.endpoints
+    shared.remote_in_flight = 4
+
+    assert shared.expected_wait() == 5 * shared.latency
+    assert all(pool.pick() is idle for _ in range(20))
+
+def test_same_lora_set_sticks_to_same_endpoint():
+    pool = make_pool(8)
+    key = lora_affinity([{"path": "b.safetensors"}, {"path": "a.safetensors"}])
+    assert key == lora_affinity(["a.safetensors", "b.safetensors"])
+
+    picks = {pool.pick(key).url for _ in range(50)}
+    assert len(picks) == 1
+
+    # Serveur préféré saturé : l'affinité cède à la charge
+    preferred = next(e for e in pool.endpoints if e.url in picks)
+    preferred.in_flight = 10
+    assert pool.pick(key) is not preferred
+
+def test_unhealthy_endpoints_are_skipped():
+    pool = make_pool(3)
+    pool.endpoints[0].healthy = False
+    for _ in range(pool.endpoints[1].breaker.threshold):
+        pool.endpoints[1].record_failure()
+
+    assert all(pool.pick().url == "http://gpu2:7860" for _ in range(10))
+
+def test_circuit_breaker_opens_then_lets_one_trial_through():
+    breaker = CircuitBreaker(threshold=3, cooldown=10)
+    for _ in range(2):
+        breaker.record_failure(now=0)
+    assert breaker.allows(now=0)
+
+    breaker.record_failure(now=0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allows(now=5)
+
+    # Après le délai, une seule requête d'essai
+    assert breaker.allows(now=10)
+    breaker.on_request()
+    assert not breaker.allows(now=10)
+
+    breaker.record_failure(now=10)
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allows(now=15)
+
+    assert breaker.allows(now=20)
+    breaker.on_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged_to_another_endpoint(monkeypatch):
+    pool = GPUPool(["http://slow:7860", "http://fast:7860"], hedge_min_delay=0.01)
+    slow, fast = pool.endpoints
+    calls = []
+
+    async def fake_post_to(endpoint, path, payload, timeout=None):
+        calls.append(endpoint.url)
+        await asyncio.sleep(10 if endpoint is slow else 0.01)
+        return {"from": endpoint.url}
+
+    monkeypatch.setattr(pool, "_post_to", fake_post_to)
+    monkeypatch.setattr(pool, "_ensure_health_checks", lambda: None)
+    monkeypatch.setattr(pool, "pick", lambda affinity=None, exclude=(): fast if slow in exclude else slow)
+    pool._latencies["/api/story_generate"] = [0.02] * 50
+
+    result = await asyncio.wait_for(
+        pool.post("/api/story_generate", {"seed": 1}, hedge=True),
+        timeout=1
+    )
+
+    assert result == {"from": "http://fast:7860"}
+    assert calls == ["http://slow:7860", "http://fast:7860"]
+    assert pool.hedged == 1
+
+class RejectingResponse:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        raise aiohttp.ClientResponseError(None, (), status=422, message="invalid payload")
+
+class RejectingSession:
+    def post(self, url, json=None, **options):
+        return RejectingResponse()
+
+@pytest.mark.asyncio
+async def test_rejected_trial_request_frees_half_open_breaker(monkeypatch):
+    """Une requête d'essai refusée (4xx) ne bloque pas le serveur semi-ouvert pour toujours"""
+    pool = make_pool(1)
+    endpoint = pool.endpoints[0]
+    monkeypatch.setattr(gpu_pool, "get_http_session", lambda: RejectingSession())
+
+    for _ in range(endpoint.breaker.threshold):
+        endpoint.record_failure()
+    endpoint.breaker.opened_at -= endpoint.breaker.cooldown
+    assert endpoint.available
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        await pool._post_to(endpoint, "/api/story_generate", {"seed": 1})
+
+    assert endpoint.breaker.state == CircuitBreaker.HALF_OPEN
+    assert endpoint.available
+    assert endpoint.in_flight == 0
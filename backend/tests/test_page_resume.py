@@ -0,0 +1,46 @@
+import pytest
+
+from modules.page_generation.generator import PageGenerator
+
+@pytest.mark.asyncio
+async def test_completed_panels_are_not_regenerated(monkeypatch):
+    """Reprise d'une page : seules les cases manquantes sont générées puis persistées"""
+    generator = PageGenerator()
+    generated = []
+
+    async def fake_generate(panel, character_loras, context, style_params):
+        generated.append((panel["panel_number"], context))
+        return {
+            "panel_number": panel["panel_number"],
+            "image": f"img{panel['panel_number']}",
+            "embeddings": [float(panel["panel_number"])],
+            "seed": panel["panel_number"],
+            "prompt_used": ""
+        }
+
+    async def fake_compose(panels, layout_type):
+        return {"composed_image": ",".join(p["image"] for p in panels), "layout": {}}
+
+    monkeypatch.setattr(generator, "_generate_panel_with_context", fake_generate)
+    monkeypatch.setattr(generator, "_compose_page_layout", fake_compose)
+
+    saved = []
+
+    async def on_panel(panel_result):
+        saved.append(panel_result["panel_number"])
+
+    completed = {
+        1: {"panel_number": 1, "image": "old1", "embeddings": [9.0], "seed": 7, "prompt_used": ""}
+    }
+    result = await generator.generate_page(
+        {"page_number": 1, "panels": [{"panel_number": n} for n in (1, 2, 3)]},
+        [],
+        {"style": "shonen"},
+        completed_panels=completed,
+        on_panel=on_panel
+    )
+
+    # La case 2 repart du contexte de la case reprise
+    assert generated == [(2, [9.0]), (3, [2.0])]
+    assert saved == [2, 3]
+    assert result["full_page_image"] == "old1,img2,img3"
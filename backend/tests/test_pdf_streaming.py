@@ -0,0 +1,76 @@
+import re
+import zlib
+
+from PIL import Image
+
+from modules.export.color import is_grayscale, to_print_cmyk
+from modules.export.pdf_stream import BLACK_SEPARATION, StreamingPDFWriter, encode_image
+from services.storage import LocalBlobStore, MultipartWriter
+
+def test_pdf_streamed_in_multipart_parts(tmp_path):
+    """Le PDF est écrit part par part puis assemblé, avec une table xref valide"""
+    store = LocalBlobStore(str(tmp_path))
+    upload = store.open_multipart("exports/p1/manga.pdf", "application/pdf")
+    parts = []
+    upload_part = upload.upload_part
+
+    def record_part(part_number, body):
+        parts.append(part_number)
+        upload_part(part_number, body)
+
+    upload.upload_part = record_part
+    writer = MultipartWriter(upload, part_size=4096, spool_memory=1024)
+
+    pdf = StreamingPDFWriter(writer, title="Test (vol. 1)")
+    for shade in (0, 128, 255):
+        page = Image.effect_noise((120, 170), 64).point(lambda v: (v + shade) % 256)
+        pdf.add_image_page(page, (595, 842))
+        page.close()
+    pdf.close()
+    writer.close()
+
+    # Plusieurs parts ont été envoyées, puis nettoyées après assemblage
+    assert len(parts) > 1
+    assert sorted(parts) == list(range(1, len(parts) + 1))
+    assert upload.parts_dir.exists() is False
+    data = store.get("exports/p1/manga.pdf")
+
+    assert data.startswith(b"%PDF-1.4")
+    assert data.rstrip().endswith(b"%%EOF")
+    assert b"/Count 3" in data
+
+    xref_offset = int(re.search(rb"startxref\n(\d+)", data).group(1))
+    assert data[xref_offset:xref_offset + 4] == b"xref"
+
+    entries = re.findall(rb"(\d{10}) 00000 n ", data[xref_offset:])
+    for obj_id, offset in enumerate(entries, start=1):
+        offset = int(offset)
+        assert data[offset:].startswith(f"{obj_id} 0 obj".encode())
+
+def test_aborted_upload_leaves_no_object(tmp_path):
+    """Un export interrompu ne laisse ni objet ni parts orphelines"""
+    store = LocalBlobStore(str(tmp_path))
+    upload = store.open_multipart("exports/p1/manga.pdf")
+    writer = MultipartWriter(upload, part_size=16)
+
+    writer.write(b"x" * 100)
+    writer.abort()
+
+    assert not store.exists("exports/p1/manga.pdf")
+    assert not upload.parts_dir.exists()
+
+def test_gray_pages_use_black_separation_only():
+    """Une page sans couleur est écrite sur le seul canal K, une page couleur en CMYK"""
+    gray_page = Image.merge("RGB", [Image.linear_gradient("L")] * 3)
+    color_page = Image.new("RGB", (64, 64), (200, 30, 30))
+
+    assert is_grayscale(gray_page)
+    assert not is_grayscale(color_page)
+
+    encoded = encode_image(gray_page, black_only=True)
+    assert encoded.color_space == BLACK_SEPARATION
+    assert encoded.decode == "[1 0]"
+    assert len(zlib.decompress(encoded.data)) == 256 * 256
+
+    cmyk = to_print_cmyk(color_page)
+    assert encode_image(cmyk).color_space == "/DeviceCMYK"
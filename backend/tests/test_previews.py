@@ -0,0 +1,47 @@
+import io
+
+from PIL import Image
+
+from api.routers.previews import key_project_id
+from services.previews import (
+    build_preview_pyramid,
+    load_preview_index,
+    pick_format,
+    pick_level,
+    preview_etag,
+    preview_key
+)
+from services.storage import LocalBlobStore
+
+def test_pyramid_levels_and_selection(tmp_path):
+    """Chaque niveau est stocké en WebP ; on sert le plus petit niveau suffisant"""
+    store = LocalBlobStore(str(tmp_path))
+    buffer = io.BytesIO()
+    Image.new("RGB", (2480, 3508), "white").save(buffer, format="PNG")
+    store.put("projects/p1/pages/page_001.png", buffer.getvalue())
+
+    index = build_preview_pyramid("projects/p1/pages/page_001.png", store=store)
+
+    assert [level["width"] for level in index["levels"]] == [256, 512, 1024, 2048]
+    with Image.open(io.BytesIO(store.get(preview_key(index["source"], 256, "webp")))) as thumb:
+        assert thumb.size == (256, round(3508 * 256 / 2480))
+
+    assert pick_level(index, 300) == 512
+    assert pick_level(index, 4000) == 2048
+    assert pick_format(index, "image/webp,*/*") == "webp"
+
+    # L'ETag ne dépend que du contenu source : identique après reconstruction
+    rebuilt = build_preview_pyramid("projects/p1/pages/page_001.png", store=store)
+    assert preview_etag(rebuilt, 512, "webp") == preview_etag(index, 512, "webp")
+    assert load_preview_index("projects/p1/pages/page_001.png", store) == rebuilt
+
+def test_only_project_images_are_served():
+    """Seules les images d'un projet identifié passent ; le reste est un 404 sans lecture du store"""
+    project_id = "0b6f6f1e-2f6a-4c55-9a3e-1f2d3c4b5a69"
+
+    assert str(key_project_id(f"projects/{project_id}/pages/page_001.png")) == project_id
+    assert str(key_project_id(f"projects/{project_id}/panels/panel_01.JPG")) == project_id
+    assert key_project_id(f"projects/{project_id}/chapters/001/outline.json") is None
+    assert key_project_id(f"projects/{project_id}/../other/page_001.png") is None
+    assert key_project_id("projects/not-a-uuid/pages/page_001.png") is None
+    assert key_project_id("lora_datasets/abc/000.png") is None
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import pytest
+
+from services.progress import ProgressBus
+
+class RecordingPipeline:
+    def __init__(self, sent):
+        self.sent = sent
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def xadd(self, name, fields, maxlen=None, approximate=True):
+        self.sent.append(("xadd", name, fields["data"], maxlen))
+
+    def publish(self, channel, message):
+        self.sent.append(("publish", channel, message))
+
+    async def execute(self):
+        pass
+
+class RecordingRedis:
+    def __init__(self):
+        self.sent = []
+
+    def pipeline(self, transaction=True):
+        return RecordingPipeline(self.sent)
+
+@pytest.mark.asyncio
+async def test_events_are_coalesced_per_window():
+    """Une rafale d'événements donne un seul message, avec le dernier état de chaque page"""
+    redis = RecordingRedis()
+    bus = ProgressBus(redis=redis, window=0.05, stream_maxlen=50)
+
+    for panel in range(1, 7):
+        bus.emit("p1", "panel", page=1, panel=panel, status="done")
+    bus.emit("p1", "page", page=1, status="generated")
+    bus.emit("p1", "page", page=1, status="lettered")
+
+    assert redis.sent == []
+    await asyncio.sleep(0.1)
+
+    assert [entry[0] for entry in redis.sent] == ["xadd", "publish"]
+    _, stream, message, maxlen = redis.sent[0]
+    assert stream == "project:p1:events" and maxlen == 50
+    assert redis.sent[1][1:] == ("project:p1", message)
+
+    events = json.loads(message)["data"]["events"]
+    assert len(events) == 7
+    assert [e["status"] for e in events if e["stage"] == "page"] == ["lettered"]
+
+@pytest.mark.asyncio
+async def test_flush_publishes_immediately():
+    redis = RecordingRedis()
+    bus = ProgressBus(redis=redis, window=60)
+
+    bus.emit("p1", "run", status="completed")
+    await bus.flush("p1")
+
+    assert len(redis.sent) == 2
+    await bus.flush("p1")
+    assert len(redis.sent) == 2
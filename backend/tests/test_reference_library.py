@@ -0,0 +1,39 @@
+from PIL import Image, ImageDraw
+
+from modules.character_design.reference_library import (
+    dedupe_by_hash,
+    description_hash,
+    hamming_distance,
+    normalize_description,
+    perceptual_hash
+)
+
+def _character_image(offset: int = 0, shape: str = "ellipse") -> Image.Image:
+    img = Image.new("RGB", (512, 512), "white")
+    draw = ImageDraw.Draw(img)
+    if shape == "ellipse":
+        draw.ellipse((100 + offset, 80, 400 + offset, 460), fill="black")
+    else:
+        draw.rectangle((40, 300, 480, 340), fill="black")
+        draw.rectangle((60, 40, 140, 200), fill="black")
+    return img
+
+def test_normalized_description_ignores_case_order_and_punctuation():
+    """Deux descriptions équivalentes partagent la même clé"""
+    a = "Spiky black hair, red scarf, school uniform!"
+    b = "school uniform,  RED scarf , spiky black hair"
+
+    assert normalize_description(a) == normalize_description(b)
+    assert description_hash(a, "shonen") == description_hash(b, "shonen")
+    assert description_hash(a, "shonen") != description_hash(a, "shojo")
+
+def test_near_duplicate_variations_are_dropped():
+    """Les variations quasi identiques sont écartées du dataset LoRA"""
+    hashes = [
+        perceptual_hash(_character_image()),
+        perceptual_hash(_character_image(offset=2)),
+        perceptual_hash(_character_image(shape="pose"))
+    ]
+
+    assert hamming_distance(hashes[0], hashes[1]) <= 6
+    assert dedupe_by_hash(hashes, max_distance=6) == [0, 2]
@@ -0,0 +1,73 @@
+import numpy as np
+
+from modules.consistency.checker import CharacterConsistencyChecker
+from modules.consistency.vector_index import FlatVectorIndex
+
+def test_batched_search_and_persistence(tmp_path):
+    """Recherche k-NN en lot, puis rechargement depuis le fichier .npz"""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 16)).astype(np.float32)
+
+    index = FlatVectorIndex(path=str(tmp_path / "characters.npz"))
+    index.add([f"char-{i}" for i in range(50)], vectors)
+    index.save()
+
+    reloaded = FlatVectorIndex.load(str(tmp_path / "characters.npz"))
+    ids, scores = reloaded.search(vectors[[3, 7, 42]] + 0.01, k=2)
+
+    assert [row[0] for row in ids] == ["char-3", "char-7", "char-42"]
+    assert scores.shape == (3, 2)
+    assert np.all(scores[:, 0] >= scores[:, 1])
+
+def test_only_drifted_panels_are_reported():
+    """Seules les cases sous le seuil sont signalées pour regénération"""
+    index = FlatVectorIndex()
+    checker = CharacterConsistencyChecker(index=index, threshold=0.9)
+    characters = [
+        {"name": "Hero", "visual_features": {"embedding": [1.0, 0.0, 0.0]}},
+        {"name": "Rival", "visual_features": {"embedding": [0.0, 1.0, 0.0]}}
+    ]
+    checker.index_characters(characters, persist=False)
+
+    panels = [
+        {"panel_number": 1, "character_embeddings": {"Hero": [0.99, 0.05, 0.0]}},
+        {"panel_number": 2, "character_embeddings": {"Hero": [0.2, 0.9, 0.0], "Rival": [0.0, 1.0, 0.0]}},
+        {"panel_number": 3, "embedding": [0.0, 0.98, 0.1], "dialogue": [{"character": "Rival", "text": "..."}]}
+    ]
+
+    drifted = checker.find_drifted_panels(panels, characters)
+
+    assert [d["panel_number"] for d in drifted] == [2]
+    assert drifted[0]["character"] == "Hero"
+
+def test_concurrent_additions_survive_save(tmp_path):
+    """Deux process qui indexent chacun un personnage n'écrasent pas l'ajout de l'autre"""
+    path = str(tmp_path / "characters.npz")
+    first, second = FlatVectorIndex.load(path), FlatVectorIndex.load(path)
+
+    first.add(["hero"], np.array([[1.0, 0.0]]))
+    first.merge_and_save()
+    second.add(["rival"], np.array([[0.0, 1.0]]))
+    second.merge_and_save()
+
+    assert sorted(FlatVectorIndex.load(path).ids) == ["hero", "rival"]
+
+def test_silent_characters_assigned_to_panel_are_checked():
+    """Un personnage assigné à la case mais muet est contrôlé lui aussi"""
+    checker = CharacterConsistencyChecker(index=FlatVectorIndex(), threshold=0.9)
+    characters = [
+        {"name": "Hero", "visual_features": {"embedding": [1.0, 0.0]}},
+        {"name": "Rival", "visual_features": {"embedding": [0.0, 1.0]}}
+    ]
+    checker.index_characters(characters, persist=False)
+
+    panels = [{
+        "panel_number": 1,
+        "embedding": [1.0, 0.0],
+        "characters": ["Rival"],
+        "dialogue": [{"character": "Hero", "text": "..."}]
+    }]
+
+    drifted = checker.find_drifted_panels(panels, characters)
+
+    assert drifted == [{"panel_number": 1, "character": "Rival", "score": 0.0}]
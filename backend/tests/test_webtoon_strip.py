@@ -0,0 +1,22 @@
+from PIL import Image
+
+from modules.export.webtoon import WebtoonStripBuilder
+from services.storage import LocalBlobStore
+
+def test_strip_is_emitted_in_fixed_height_slices(tmp_path):
+    """Les pages sont mises à 800 px de large et découpées en tranches stockées"""
+    store = LocalBlobStore(str(tmp_path))
+    builder = WebtoonStripBuilder(store, "exports/p1/webtoon/chapter_001")
+
+    for shade in (0, 120, 240):
+        builder.add_page(Image.new("RGB", (400, 600), (shade, shade, shade)))
+        # Jamais plus d'une tranche non émise en mémoire
+        assert builder._filled < builder.slice_height
+
+    slices = builder.finish()
+
+    assert builder.total_height == 3 * 1200
+    assert [s["height"] for s in slices] == [1280, 1280, 1040]
+    for s in slices:
+        with Image.open(store.path(s["key"])) as img:
+            assert img.size == (800, s["height"])
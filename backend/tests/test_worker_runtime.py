@@ -0,0 +1,19 @@
+import asyncio
+
+from services.worker_runtime import WorkerRuntime
+
+def test_tasks_share_one_persistent_loop():
+    """Deux tâches successives tournent sur la même boucle, qui survit entre elles"""
+    runtime = WorkerRuntime()
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    try:
+        first = runtime.run(current_loop())
+        assert runtime.run(current_loop()) is first
+        assert runtime.running
+    finally:
+        runtime.stop()
+
+    assert not runtime.running
@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+
+from services.ws_hub import SLOW_CLIENT_CLOSE_CODE, WebSocketHub
+
+class QueuePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages = asyncio.Queue()
+        self.closed = False
+
+    async def subscribe(self, channel):
+        self.redis.subscriptions[channel] = self
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+    async def unsubscribe(self):
+        self.redis.subscriptions = {
+            channel: pubsub for channel, pubsub in self.redis.subscriptions.items()
+            if pubsub is not self
+        }
+
+    async def close(self):
+        self.closed = True
+
+class QueueRedis:
+    def __init__(self):
+        self.subscriptions = {}
+
+    def pubsub(self):
+        return QueuePubSub(self)
+
+    async def xrevrange(self, name, count=None):
+        return []
+
+    def publish(self, channel, data):
+        self.subscriptions[channel].messages.put_nowait({"type": "message", "data": data})
+
+class FakeSocket:
+    def __init__(self, stalled=False):
+        self.sent = []
+        self.stalled = stalled
+        self.closed_with = None
+        self.disconnect = asyncio.Event()
+
+    async def send_text(self, data):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(data)
+
+    async def receive_text(self):
+        await self.disconnect.wait()
+        raise ConnectionError("disconnected")
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+@pytest.mark.asyncio
+async def test_one_subscription_per_project_and_slow_clients_dropped():
+    redis = QueueRedis()
+    hub = WebSocketHub(redis, queue_size=2, backlog=0)
+
+    fast, slow = FakeSocket(), FakeSocket(stalled=True)
+    serving = [asyncio.create_task(hub.serve("p1", socket)) for socket in (fast, slow)]
+    await asyncio.sleep(0.01)
+
+    assert list(redis.subscriptions) == ["project:p1"]
+
+    for i in range(5):
+        redis.publish("project:p1", f"m{i}".encode())
+        await asyncio.sleep(0.01)
+
+    assert fast.sent == [f"m{i}" for i in range(5)]
+    assert slow.closed_with == SLOW_CLIENT_CLOSE_CODE
+    assert len(hub.channels["p1"].clients) == 1
+
+    # Départ du dernier client : l'abonnement est fermé
+    fast.disconnect.set()
+    await asyncio.gather(*serving)
+    assert hub.channels == {}
+    assert redis.subscriptions == {}
+
+class RacingRedis(QueueRedis):
+    """Un message est publié pendant la lecture du stream : il figure dans les deux"""
+
+    def __init__(self, backlog, published):
+        super().__init__()
+        self.backlog = backlog
+        self.published = published
+
+    async def xrevrange(self, name, count=None):
+        for message in self.published:
+            self.publish("project:p1", message.encode())
+        # Laisse le lecteur de l'abonnement distribuer les messages publiés
+        await asyncio.sleep(0.01)
+        return [(str(i).encode(), {b"data": m.encode()}) for i, m in reversed(list(enumerate(self.backlog)))]
+
+@pytest.mark.asyncio
+async def test_messages_published_during_backlog_read_are_kept_once():
+    """Abonnement avant rattrapage : rien n'est perdu entre les deux, rien n'est doublé"""
+    redis = RacingRedis(backlog=["m0", "m1"], published=["m1", "m2"])
+    hub = WebSocketHub(redis, queue_size=8, backlog=10)
+
+    socket = FakeSocket()
+    serving = asyncio.create_task(hub.serve("p1", socket))
+    await asyncio.sleep(0.05)
+
+    redis.publish("project:p1", b"m3")
+    await asyncio.sleep(0.01)
+
+    assert socket.sent == ["m0", "m1", "m2", "m3"]
+
+    socket.disconnect.set()
+    await serving
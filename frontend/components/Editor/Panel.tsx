@@ -2,6 +2,7 @@ import { useDrag } from 'react-dnd';
 import { Panel as PanelType, PanelLayout } from '@/types';
 import Image from 'next/image';
 import { Edit2, Trash2, RefreshCw } from 'lucide-react';
+import { PreviewImage } from '@/components/Preview/PreviewImage';
 
 interface PanelProps {
   panel: PanelType;
@@ -36,7 +37,14 @@ export function Panel({ panel, layoutInfo, index, onEdit, onDelete, onRegenerate
       style={gridAreaStyle}
     >
       {/* Image de la case */}
-      {panel.imageUrl ? (
+      {panel.imageKey ? (
+        <PreviewImage
+          imageKey={panel.imageKey}
+          displayWidth={512}
+          alt={`Panel ${panel.panelNumber}`}
+          className="absolute inset-0 w-full h-full object-cover"
+        />
+      ) : panel.imageUrl ? (
         <Image
           src={panel.imageUrl}
           alt={`Panel ${panel.panelNumber}`}
@@ -0,0 +1,18 @@
+import { ImgHTMLAttributes } from 'react';
+import { usePreview } from '@/lib/previews';
+
+interface PreviewImageProps extends Omit<ImgHTMLAttributes<HTMLImageElement>, 'src'> {
+  imageKey: string;
+  displayWidth: number;
+  version?: string;
+}
+
+// Vignette déjà optimisée par le backend, chargée avec l'authentification de l'utilisateur
+export function PreviewImage({ imageKey, displayWidth, version, alt, ...props }: PreviewImageProps) {
+  const src = usePreview(imageKey, displayWidth, version);
+
+  if (!src) {
+    return null;
+  }
+  return <img src={src} alt={alt} decoding="async" {...props} />;
+}
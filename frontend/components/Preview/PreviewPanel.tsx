@@ -4,6 +4,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { Button } from '@/components/ui/button';
 import { Textarea } from '@/components/ui/textarea';
 import { Download, Eye, Maximize2 } from 'lucide-react';
+import { PreviewImage } from '@/components/Preview/PreviewImage';
 
 interface PreviewPanelProps {
   page?: Page;
@@ -15,6 +16,8 @@ export function PreviewPanel({ page, onPanelEdit }: PreviewPanelProps) {
   const [editMode, setEditMode] = useState(false);
   const [dialogueText, setDialogueText] = useState('');
 
+  const pageImageKey = page?.letteredImageKey || page?.imageKey;
+
   const handleDialogueEdit = () => {
     if (selectedPanel) {
       onPanelEdit(selectedPanel.id, {
@@ -42,7 +45,14 @@ export function PreviewPanel({ page, onPanelEdit }: PreviewPanelProps) {
 
         <TabsContent value="page" className="p-4">
           <div className="relative aspect-[210/297] bg-gray-100 rounded-lg overflow-hidden">
-            {page?.fullPageImage && (
+            {pageImageKey ? (
+              <PreviewImage
+                imageKey={pageImageKey}
+                displayWidth={600}
+                alt="Page preview"
+                className="w-full h-full object-contain"
+              />
+            ) : page?.fullPageImage && (
               <img 
                 src={page.fullPageImage} 
                 alt="Page preview"
@@ -74,10 +84,20 @@ export function PreviewPanel({ page, onPanelEdit }: PreviewPanelProps) {
                   ${selectedPanel?.id === panel.id ? 'border-blue-500' : 'border-gray-200'}
                 `}
               >
-                {panel.imageUrl && (
+                {panel.imageKey ? (
+                  <PreviewImage
+                    imageKey={panel.imageKey}
+                    displayWidth={256}
+                    alt={`Panel ${panel.panelNumber}`}
+                    loading="lazy"
+                    className="w-full h-32 object-cover"
+                  />
+                ) : panel.imageUrl && (
                   <img 
                     src={panel.imageUrl} 
                     alt={`Panel ${panel.panelNumber}`}
+                    loading="lazy"
+                    decoding="async"
                     className="w-full h-32 object-cover"
                   />
                 )}
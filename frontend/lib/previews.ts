@@ -0,0 +1,59 @@
+import { useEffect, useState } from 'react';
+import { apiClient } from '@/lib/api/client';
+
+// Doit rester aligné sur PREVIEW_WIDTHS côté backend (services/previews.py)
+const PREVIEW_WIDTHS = [256, 512, 1024, 2048];
+
+/**
+ * Chemin (relatif à l'API) de la vignette adaptée à la largeur affichée (en px CSS).
+ * Le niveau de pyramide tient compte de la densité d'écran ; le format
+ * (AVIF/WebP) est négocié par le serveur via l'en-tête Accept.
+ */
+export function previewPath(imageKey: string, displayWidth: number, version?: string): string {
+  const dpr = typeof window !== 'undefined' ? window.devicePixelRatio || 1 : 1;
+  const target = Math.ceil(displayWidth * dpr);
+  const width = PREVIEW_WIDTHS.find((w) => w >= target) ?? PREVIEW_WIDTHS[PREVIEW_WIDTHS.length - 1];
+
+  const params = new URLSearchParams({ w: String(width) });
+  if (version) {
+    params.set('v', version);
+  }
+  return `/previews/${imageKey}?${params.toString()}`;
+}
+
+/**
+ * URL locale (blob:) de la vignette, chargée avec le jeton de l'utilisateur.
+ * Les vignettes ne sont servies qu'au propriétaire du projet : une balise
+ * <img> ne pouvant pas envoyer l'en-tête Authorization, on passe par le
+ * client API (le cache HTTP privé du navigateur et les ETag restent actifs).
+ */
+export function usePreview(imageKey: string | undefined, displayWidth: number, version?: string): string | undefined {
+  const [src, setSrc] = useState<string>();
+
+  useEffect(() => {
+    if (!imageKey) {
+      setSrc(undefined);
+      return;
+    }
+
+    let objectUrl: string | undefined;
+    let cancelled = false;
+    apiClient
+      .get(previewPath(imageKey, displayWidth, version), { responseType: 'blob' })
+      .then((response) => {
+        if (cancelled) return;
+        objectUrl = URL.createObjectURL(response.data);
+        setSrc(objectUrl);
+      })
+      .catch(() => {
+        if (!cancelled) setSrc(undefined);
+      });
+
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [imageKey, displayWidth, version]);
+
+  return src;
+}
@@ -24,6 +24,8 @@ export interface Page {
   layout: PageLayout;
   panels: Panel[];
   fullPageImage?: string;
+  imageKey?: string;
+  letteredImageKey?: string;
 }
 
 export interface Panel {
@@ -32,6 +34,7 @@ export interface Panel {
   description: string;
   dialogue: Dialogue[];
   imageUrl?: string;
+  imageKey?: string;
   bounds?: Rectangle;
   soundEffects?: SoundEffect[];
 }
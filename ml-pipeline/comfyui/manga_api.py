@@ -7,6 +7,9 @@ from typing import List, Dict, Any, Optional
 import asyncio
 import base64
 import io
+import os
+import uuid
+from pathlib import Path
 from PIL import Image
 import numpy as np
 import torch
@@ -14,6 +17,93 @@ import json
 
 app = FastAPI()
 
+# Requêtes en cours, exposées au pool de serveurs du backend via /api/health
+_in_flight = 0
+
+@app.middleware("http")
+async def count_in_flight(request, call_next):
+    global _in_flight
+    _in_flight += 1
+    try:
+        return await call_next(request)
+    finally:
+        _in_flight -= 1
+
+@app.get("/api/health")
+async def health():
+    """Contrôle de santé du pool GPU (le backend écarte les serveurs qui ne répondent pas)"""
+    return {
+        "status": "ok",
+        "cuda": torch.cuda.is_available(),
+        "in_flight": _in_flight - 1
+    }
+
+# Blob store partagé avec le backend : volume /models en local ; en S3,
+# BLOB_ROOT sert de cache des datasets téléchargés
+BLOB_ROOT = Path(os.environ.get("BLOB_ROOT", "/models/blobs"))
+BLOB_BACKEND = os.environ.get("BLOB_BACKEND", "local")
+if BLOB_BACKEND not in ("local", "s3"):
+    raise RuntimeError(f"BLOB_BACKEND inconnu: {BLOB_BACKEND}")
+
+_s3 = None
+
+def get_s3_client():
+    """Client S3 configuré comme celui du backend (S3_* ; S3_ENDPOINT_URL pour MinIO)"""
+    global _s3
+    if _s3 is None:
+        import boto3
+        
+        _s3 = boto3.client(
+            "s3",
+            aws_access_key_id=os.environ["S3_ACCESS_KEY"],
+            aws_secret_access_key=os.environ["S3_SECRET_KEY"],
+            region_name=os.environ.get("S3_REGION", "us-east-1"),
+            endpoint_url=os.environ.get("S3_ENDPOINT_URL")
+        )
+    return _s3
+
+def fetch_dataset(prefix: str) -> Optional[Path]:
+    """Dossier local d'un dataset du blob store (None s'il n'existe pas)
+    
+    En S3, les objets du préfixe sont copiés sous BLOB_ROOT ; ceux déjà
+    présents avec la même taille ne sont pas retéléchargés.
+    """
+    
+    dataset_path = (BLOB_ROOT / prefix).resolve()
+    if BLOB_ROOT.resolve() not in dataset_path.parents:
+        return None
+    
+    if BLOB_BACKEND == "s3":
+        client = get_s3_client()
+        bucket = os.environ["S3_BUCKET"]
+        pages = client.get_paginator("list_objects_v2").paginate(
+            Bucket=bucket,
+            Prefix=prefix.rstrip("/") + "/"
+        )
+        for page in pages:
+            for obj in page.get("Contents", []):
+                target = (BLOB_ROOT / obj["Key"]).resolve()
+                if dataset_path not in target.parents:
+                    continue
+                if target.exists() and target.stat().st_size == obj["Size"]:
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                client.download_file(bucket, obj["Key"], str(target))
+    
+    return dataset_path if dataset_path.is_dir() else None
+
+def publish_blob(path: Path, key: str) -> None:
+    """Dépose un fichier sous `key` dans le blob store ; la clé n'apparaît qu'une fois complète"""
+    
+    if BLOB_BACKEND == "s3":
+        get_s3_client().upload_file(str(path), os.environ["S3_BUCKET"], key)
+        return
+    target = (BLOB_ROOT / key).resolve()
+    if BLOB_ROOT.resolve() not in target.parents:
+        raise ValueError(f"Clé invalide: {key}")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(path, target)
+
 # Import ComfyUI modules
 import sys
 sys.path.append('/app')
@@ -35,11 +125,17 @@ class MangaGenerationRequest(BaseModel):
     context_embeddings: Optional[str] = None
     panel_type: str = "standard"
 
+class EmbedImagesRequest(BaseModel):
+    images: List[str]
+
 class StoryDiffusionRequest(BaseModel):
     panels: List[Dict[str, Any]]
     style_reference: Optional[str] = None
     character_loras: Dict[str, str] = {}
     maintain_consistency: bool = True
+    # Seed de la séquence (case i : seed + i) ; une case peut fixer la sienne.
+    # Fixée par l'appelant, une requête doublée sur un autre serveur donne les mêmes cases
+    seed: int = -1
 
 @app.post("/api/generate")
 async def generate_manga_panel(request: MangaGenerationRequest):
@@ -66,14 +162,16 @@ async def generate_story_sequence(request: StoryDiffusionRequest):
     
     results = []
     context = None
+    base_seed = request.seed if request.seed != -1 else int(np.random.randint(0, 2**32))
     
-    for panel in request.panels:
+    for i, panel in enumerate(request.panels):
         # Workflow avec contexte de cohérence
         workflow = build_story_workflow(
             panel,
             context,
             request.character_loras,
-            request.style_reference
+            request.style_reference,
+            seed=panel.get("seed", (base_seed + i) % 2**32)
         )
         
         prompt_id = execution.queue_prompt(workflow)[1]
@@ -88,10 +186,17 @@ async def generate_story_sequence(request: StoryDiffusionRequest):
 async def train_character_lora(request: Dict[str, Any]):
     """Lance l'entraînement d'un LoRA personnage"""
     
+    # Le dataset est référencé par préfixe dans le blob store : lecture
+    # des fichiers (copiés en local depuis S3), sans images en base64
+    dataset_path = await asyncio.to_thread(fetch_dataset, request["dataset"]["prefix"])
+    if dataset_path is None:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    
     # Configuration du training
     training_config = {
         "model_name": request["model_name"],
-        "dataset": request["dataset"],
+        "dataset_path": str(dataset_path),
+        "output_key": request.get("output_key", f"loras/{request['model_name']}.safetensors"),
         "base_model": request.get("base_model", "anything-v5"),
         "steps": request.get("training_steps", 1000),
         "batch_size": request.get("batch_size", 2),
@@ -109,6 +214,98 @@ async def train_character_lora(request: Dict[str, Any]):
         "estimated_time": training_config["steps"] * 2  # secondes estimées
     })
 
+@app.get("/api/train_lora/{task_id}")
+async def lora_training_status(task_id: str):
+    """État d'un entraînement lancé par ce serveur"""
+    
+    task = _trainings.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Training not found")
+    if not task.done():
+        return {"task_id": task_id, "status": "training"}
+    if task.exception() is not None:
+        return {"task_id": task_id, "status": "failed", "error": str(task.exception())}
+    return {"task_id": task_id, "status": "completed", "lora_path": task.result()}
+
+# Script d'entraînement (ml-pipeline/lora_training, monté dans le conteneur)
+LORA_TRAIN_SCRIPT = Path(os.environ.get("LORA_TRAIN_SCRIPT", "/lora_training/train_character.py"))
+LORA_BASE_MODELS = Path(os.environ.get("LORA_BASE_MODELS", "/models/diffusers"))
+STEPS_PER_EPOCH = 100
+
+_trainings: Dict[str, asyncio.Task] = {}
+
+async def launch_lora_training(config: Dict[str, Any]) -> str:
+    """Démarre l'entraînement en tâche de fond et retourne son identifiant"""
+    
+    task_id = uuid.uuid4().hex
+    _trainings[task_id] = asyncio.create_task(run_lora_training(task_id, config))
+    return task_id
+
+async def run_lora_training(task_id: str, config: Dict[str, Any]) -> str:
+    """Entraîne dans un process séparé puis publie le LoRA sous `output_key`
+    
+    Le backend surveille l'apparition de cette clé dans le blob store pour
+    rattacher le LoRA à la fiche de référence.
+    """
+    
+    work_dir = BLOB_ROOT / "training" / task_id
+    work_dir.mkdir(parents=True, exist_ok=True)
+    config_path = work_dir / "config.json"
+    output_path = work_dir / "lora.safetensors"
+    config_path.write_text(json.dumps({
+        "base_model_path": str(LORA_BASE_MODELS / config["base_model"]),
+        "trigger_word": config["model_name"],
+        "num_epochs": max(1, config["steps"] // STEPS_PER_EPOCH),
+        "steps_per_epoch": STEPS_PER_EPOCH,
+        "batch_size": config["batch_size"],
+        "learning_rate": config["learning_rate"],
+        "rank": config["rank"],
+        "alpha": config["alpha"],
+    }))
+    
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, str(LORA_TRAIN_SCRIPT),
+        "--config", str(config_path),
+        "--dataset", config["dataset_path"],
+        "--output", str(output_path)
+    )
+    if await process.wait() != 0:
+        raise RuntimeError(f"Entraînement {task_id} en échec (code {process.returncode})")
+    
+    await asyncio.to_thread(publish_blob, output_path, config["output_key"])
+    return config["output_key"]
+
+CLIP_MODEL_NAME = os.environ.get("CLIP_MODEL", "openai/clip-vit-large-patch14")
+_clip = None
+
+def get_clip():
+    """Charge CLIP une seule fois par process"""
+    global _clip
+    if _clip is None:
+        from transformers import CLIPModel, CLIPProcessor
+        
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        model = CLIPModel.from_pretrained(CLIP_MODEL_NAME).to(device).eval()
+        _clip = (model, CLIPProcessor.from_pretrained(CLIP_MODEL_NAME), device)
+    return _clip
+
+@app.post("/api/embed_images")
+async def embed_images(request: EmbedImagesRequest):
+    """Embeddings CLIP normalisés pour un lot d'images (contrôles de cohérence)"""
+    
+    model, processor, device = get_clip()
+    images = [decode_base64_image(img).convert("RGB") for img in request.images]
+    
+    inputs = processor(images=images, return_tensors="pt").to(device)
+    with torch.no_grad():
+        features = model.get_image_features(**inputs)
+    features = torch.nn.functional.normalize(features, dim=-1)
+    
+    return JSONResponse({
+        "embeddings": features.cpu().tolist(),
+        "model": CLIP_MODEL_NAME
+    })
+
 @app.post("/api/compose_page")
 async def compose_manga_page(request: Dict[str, Any]):
     """Compose une page manga à partir des cases"""
@@ -232,6 +429,36 @@ def build_manga_workflow(request: MangaGenerationRequest) -> Dict:
     
     return workflow
 
+def build_story_workflow(
+    panel: Dict[str, Any],
+    context: Optional[str],
+    character_loras: Dict[str, str],
+    style_reference: Optional[str],
+    seed: int
+) -> Dict:
+    """Workflow d'une case de séquence : celui d'une case seule, en mode story et à seed fixée"""
+    
+    loras = list(panel.get("loras", []))
+    known = {lora["path"] for lora in loras}
+    loras += [
+        {"path": path, "strength": 0.8}
+        for path in character_loras.values() if path not in known
+    ]
+    
+    prompt = panel.get("prompt", "")
+    if style_reference:
+        prompt = f"{prompt}, {style_reference}"
+    
+    # Les champs inconnus de la case sont ignorés par le modèle
+    return build_manga_workflow(MangaGenerationRequest(**{
+        **panel,
+        "prompt": prompt,
+        "loras": loras,
+        "story_mode": True,
+        "context_embeddings": context,
+        "seed": seed
+    }))
+
 async def wait_for_result(prompt_id: str, timeout: int = 300):
     """Attend le résultat d'une génération"""
     
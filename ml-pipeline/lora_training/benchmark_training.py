@@ -0,0 +1,137 @@
+"""Benchmark CPU de la boucle d'entraînement LoRA sur un modèle miniature aléatoire
+
+Permet de détecter les régressions de la boucle d'entraînement sans GPU ni
+téléchargement de poids :
+
+    python benchmark_training.py --epochs 3 --images 16 --batch-size 4
+"""
+
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+import torch
+from diffusers import AutoencoderKL, DDPMScheduler, UNet2DConditionModel
+from transformers import CLIPTextConfig, CLIPTextModel
+import numpy as np
+from PIL import Image
+
+from train_character import CharacterLoRATrainer, TrainingProfiler
+
+class TinyTokenizer:
+    """Tokenizer minimal (hash des mots) compatible avec l'appel du trainer"""
+
+    def __init__(self, vocab_size=1000, model_max_length=77):
+        self.vocab_size = vocab_size
+        self.model_max_length = model_max_length
+
+    def __call__(self, texts, padding="max_length", max_length=None, truncation=True, return_tensors="pt"):
+        max_length = max_length or self.model_max_length
+        input_ids = torch.zeros((len(texts), max_length), dtype=torch.long)
+
+        for row, text in enumerate(texts):
+            ids = [hash(word) % (self.vocab_size - 1) + 1 for word in text.split()]
+            ids = ids[:max_length]
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+
+        return argparse.Namespace(input_ids=input_ids)
+
+def build_tiny_components(seed=0):
+    """Construit un UNet, un VAE et un text encoder miniatures initialisés aléatoirement"""
+
+    torch.manual_seed(seed)
+
+    unet = UNet2DConditionModel(
+        sample_size=32,
+        in_channels=4,
+        out_channels=4,
+        layers_per_block=1,
+        block_out_channels=(32, 64),
+        down_block_types=("CrossAttnDownBlock2D", "DownBlock2D"),
+        up_block_types=("UpBlock2D", "CrossAttnUpBlock2D"),
+        cross_attention_dim=32,
+        attention_head_dim=8
+    )
+    vae = AutoencoderKL(
+        in_channels=3,
+        out_channels=3,
+        down_block_types=("DownEncoderBlock2D", "DownEncoderBlock2D"),
+        up_block_types=("UpDecoderBlock2D", "UpDecoderBlock2D"),
+        block_out_channels=(32, 64),
+        latent_channels=4
+    )
+    text_encoder = CLIPTextModel(CLIPTextConfig(
+        hidden_size=32,
+        intermediate_size=37,
+        num_attention_heads=4,
+        num_hidden_layers=2,
+        vocab_size=1000,
+        max_position_embeddings=77
+    ))
+
+    return {
+        "unet": unet,
+        "vae": vae,
+        "text_encoder": text_encoder,
+        "tokenizer": TinyTokenizer(),
+        "scheduler": DDPMScheduler(num_train_timesteps=1000)
+    }
+
+def write_random_dataset(dataset_dir, num_images, resolution):
+    """Écrit un dataset d'images aléatoires avec leurs captions"""
+
+    rng = np.random.default_rng(0)
+    for i in range(num_images):
+        pixels = rng.integers(0, 256, (resolution, resolution, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(dataset_dir / f"{i:03d}.png")
+        (dataset_dir / f"{i:03d}.txt").write_text(f"character reference {i+1}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--resolution", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads")
+    parser.add_argument("--profile-output", help="Fichier JSON Lines pour le rapport (logger par défaut, sur stderr)")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    config = {
+        "device": "cpu",
+        "trigger_word": "benchchar",
+        "base_model_path": "tiny-random",
+        "learning_rate": 1e-4,
+        "num_epochs": args.epochs,
+        "batch_size": args.batch_size,
+        "resolution": args.resolution,
+        "rank": 4,
+        "alpha": 4
+    }
+
+    profiler = TrainingProfiler(
+        torch.device("cpu"),
+        enabled=True,
+        output=args.profile_output
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_dir = Path(tmp) / "dataset"
+        dataset_dir.mkdir()
+        write_random_dataset(dataset_dir, args.images, args.resolution)
+
+        trainer = CharacterLoRATrainer(
+            config,
+            components=build_tiny_components(),
+            profiler=profiler
+        )
+        result = trainer.train(dataset_dir, str(Path(tmp) / "lora.pt"))
+
+    profiler.emit({"event": "summary", "status": result["status"], "final_loss": result["final_loss"]})
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,11 @@
 
 import os
 import json
+import time
+import logging
 import argparse
+import resource
+from contextlib import contextmanager
 from pathlib import Path
 import torch
 from diffusers import StableDiffusionPipeline, AutoencoderKL
@@ -12,22 +16,135 @@ import numpy as np
 from PIL import Image
 from tqdm import tqdm
 
+logger = logging.getLogger(__name__)
+
+class TrainingProfiler:
+    """Mesure le temps par phase d'entraînement et émet un rapport JSON par epoch"""
+    
+    PHASES = (
+        "data_loading",
+        "vae_encode",
+        "text_encode",
+        "unet_forward",
+        "backward",
+        "optimizer"
+    )
+    
+    def __init__(self, device, enabled=False, output=None):
+        self.device = device
+        self.enabled = enabled
+        self.output = output
+        self._phase_times = {}
+        self._epoch_start = 0.0
+    
+    def _synchronize(self):
+        # Les kernels CUDA sont asynchrones : sans synchro, le temps
+        # serait attribué à la phase suivante
+        if self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+    
+    @contextmanager
+    def phase(self, name):
+        """Chronomètre une phase (no-op hors mode --profile)"""
+        if not self.enabled:
+            yield
+            return
+        
+        self._synchronize()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._synchronize()
+            self._phase_times[name] = (
+                self._phase_times.get(name, 0.0) + time.perf_counter() - start
+            )
+    
+    def start_epoch(self):
+        if not self.enabled:
+            return
+        
+        self._phase_times = {name: 0.0 for name in self.PHASES}
+        if self.device.type == "cuda":
+            torch.cuda.reset_peak_memory_stats(self.device)
+        self._synchronize()
+        self._epoch_start = time.perf_counter()
+    
+    def end_epoch(self, epoch, samples, loss):
+        """Émet le rapport JSON de l'epoch"""
+        if not self.enabled:
+            return None
+        
+        self._synchronize()
+        elapsed = time.perf_counter() - self._epoch_start
+        
+        report = {
+            "event": "epoch",
+            "epoch": epoch,
+            "samples": samples,
+            "seconds": round(elapsed, 4),
+            "samples_per_sec": round(samples / elapsed, 3) if elapsed > 0 else None,
+            "loss": loss,
+            "phases": {
+                name: round(seconds, 4)
+                for name, seconds in self._phase_times.items()
+            },
+            "peak_memory_mb": self.peak_memory_mb()
+        }
+        self.emit(report)
+        return report
+    
+    def peak_memory_mb(self):
+        """Pic mémoire : allocations CUDA de l'epoch, ou RSS max du process sur CPU"""
+        if self.device.type == "cuda":
+            return round(torch.cuda.max_memory_allocated(self.device) / 2**20, 1)
+        # ru_maxrss est en kilo-octets sous Linux
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    
+    def emit(self, record):
+        if not self.enabled:
+            return
+        
+        # Fichier JSON Lines si demandé, sinon le logger : stdout reste aux
+        # messages du script
+        line = json.dumps(record)
+        if self.output:
+            with open(self.output, "a") as f:
+                f.write(line + "\n")
+        else:
+            logger.info(line)
+
 class CharacterLoRATrainer:
-    def __init__(self, config):
+    def __init__(self, config, components=None, profiler=None):
         self.config = config
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.device = torch.device(
+            config.get("device") or ("cuda" if torch.cuda.is_available() else "cpu")
+        )
+        self.profiler = profiler or TrainingProfiler(self.device)
         
-        # Chargement du modèle de base
-        self.pipeline = StableDiffusionPipeline.from_pretrained(
-            config["base_model_path"],
-            torch_dtype=torch.float16,
-            safety_checker=None
-        ).to(self.device)
+        if components is None:
+            # Chargement du modèle de base
+            self.pipeline = StableDiffusionPipeline.from_pretrained(
+                config["base_model_path"],
+                torch_dtype=torch.float16,
+                safety_checker=None
+            ).to(self.device)
+            components = {
+                "vae": self.pipeline.vae,
+                "text_encoder": self.pipeline.text_encoder,
+                "tokenizer": self.pipeline.tokenizer,
+                "unet": self.pipeline.unet,
+                "scheduler": self.pipeline.scheduler
+            }
+        else:
+            # Composants fournis directement (benchmark, tests)
+            self.pipeline = None
         
-        self.vae = self.pipeline.vae
-        self.text_encoder = self.pipeline.text_encoder
-        self.tokenizer = self.pipeline.tokenizer
-        self.unet = self.pipeline.unet
+        self.vae = components["vae"].to(self.device)
+        self.text_encoder = components["text_encoder"].to(self.device)
+        self.tokenizer = components["tokenizer"]
+        self.unet = components["unet"].to(self.device)
+        self.noise_scheduler = components["scheduler"]
         
     def prepare_dataset(self, dataset_path):
         """Prépare le dataset depuis les images de référence"""
@@ -36,6 +153,7 @@ class CharacterLoRATrainer:
         captions = []
         
         dataset_dir = Path(dataset_path)
+        resolution = self.config.get("resolution", 512)
         
         # Chargement des images et captions
         for img_path in dataset_dir.glob("*.png"):
@@ -43,7 +161,7 @@ class CharacterLoRATrainer:
             
             if caption_path.exists():
                 img = Image.open(img_path).convert("RGB")
-                img = img.resize((512, 512), Image.LANCZOS)
+                img = img.resize((resolution, resolution), Image.LANCZOS)
                 images.append(img)
                 
                 with open(caption_path, "r") as f:
@@ -91,7 +209,13 @@ class CharacterLoRATrainer:
         """Lance l'entraînement"""
         
         # Préparation du dataset
+        start = time.perf_counter()
         images, captions = self.prepare_dataset(dataset_path)
+        self.profiler.emit({
+            "event": "dataset",
+            "images": len(images),
+            "seconds": round(time.perf_counter() - start, 4)
+        })
         
         if not images:
             raise ValueError("Aucune image trouvée dans le dataset")
@@ -113,51 +237,62 @@ class CharacterLoRATrainer:
         batch_size = self.config["batch_size"]
         
         for epoch in range(num_epochs):
+            # Somme des losses pondérées par la taille de lot : le dernier
+            # lot peut être incomplet
             epoch_loss = 0
+            self.profiler.start_epoch()
             progress_bar = tqdm(range(0, len(images), batch_size), desc=f"Epoch {epoch+1}/{num_epochs}")
             
             for batch_start in progress_bar:
                 batch_images = images[batch_start:batch_start + batch_size]
                 batch_captions = captions[batch_start:batch_start + batch_size]
                 
-                # Encodage des images
-                latents = []
-                for img in batch_images:
-                    img_tensor = torch.from_numpy(np.array(img)).float() / 127.5 - 1
-                    img_tensor = img_tensor.permute(2, 0, 1).unsqueeze(0).to(self.device)
-                    latent = self.vae.encode(img_tensor).latent_dist.sample() * 0.18215
-                    latents.append(latent)
+                with self.profiler.phase("data_loading"):
+                    pixel_values = torch.stack([
+                        torch.from_numpy(np.array(img)).float() / 127.5 - 1
+                        for img in batch_images
+                    ]).permute(0, 3, 1, 2).to(self.device, dtype=self.vae.dtype)
+                    
+                    text_inputs = self.tokenizer(
+                        batch_captions,
+                        padding="max_length",
+                        max_length=self.tokenizer.model_max_length,
+                        truncation=True,
+                        return_tensors="pt"
+                    )
                 
-                latents = torch.cat(latents, dim=0)
+                # Encodage des images
+                with self.profiler.phase("vae_encode"), torch.no_grad():
+                    latents = self.vae.encode(pixel_values).latent_dist.sample() * 0.18215
                 
                 # Encodage du texte
-                text_inputs = self.tokenizer(
-                    batch_captions,
-                    padding="max_length",
-                    max_length=self.tokenizer.model_max_length,
-                    truncation=True,
-                    return_tensors="pt"
-                )
-                text_embeddings = self.text_encoder(text_inputs.input_ids.to(self.device))[0]
-                
-                # Ajout du bruit
-                noise = torch.randn_like(latents)
-                timesteps = torch.randint(0, 1000, (latents.shape[0],), device=self.device)
-                noisy_latents = self.pipeline.scheduler.add_noise(latents, noise, timesteps)
+                with self.profiler.phase("text_encode"), torch.no_grad():
+                    text_embeddings = self.text_encoder(text_inputs.input_ids.to(self.device))[0]
                 
-                # Prédiction
-                noise_pred = self.unet(noisy_latents, timesteps, text_embeddings).sample
-                
-                # Calcul de la loss
-                loss = torch.nn.functional.mse_loss(noise_pred, noise, reduction="mean")
+                with self.profiler.phase("unet_forward"):
+                    # Ajout du bruit
+                    noise = torch.randn_like(latents)
+                    timesteps = torch.randint(0, 1000, (latents.shape[0],), device=self.device)
+                    noisy_latents = self.noise_scheduler.add_noise(latents, noise, timesteps)
+                    
+                    # Prédiction
+                    noise_pred = self.unet(noisy_latents, timesteps, text_embeddings).sample
+                    
+                    # Calcul de la loss
+                    loss = torch.nn.functional.mse_loss(noise_pred.float(), noise.float(), reduction="mean")
                 
                 # Backpropagation
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
+                with self.profiler.phase("backward"):
+                    optimizer.zero_grad()
+                    loss.backward()
+                
+                with self.profiler.phase("optimizer"):
+                    optimizer.step()
                 
-                epoch_loss += loss.item()
+                epoch_loss += loss.item() * len(batch_images)
                 progress_bar.set_postfix({"loss": loss.item()})
+            
+            self.profiler.end_epoch(epoch + 1, len(images), epoch_loss / len(images))
         
         # Sauvegarde du LoRA
         self.save_lora(output_path)
@@ -197,15 +332,20 @@ def main():
     parser.add_argument("--config", required=True, help="Chemin vers le fichier de configuration")
     parser.add_argument("--dataset", required=True, help="Chemin vers le dataset")
     parser.add_argument("--output", required=True, help="Chemin de sortie pour le LoRA")
+    parser.add_argument("--profile", action="store_true", help="Timing par phase, samples/sec et pic mémoire (JSON par epoch)")
+    parser.add_argument("--profile-output", help="Fichier JSON Lines pour le rapport (logger par défaut, sur stderr)")
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
     
     # Chargement de la configuration
     with open(args.config, "r") as f:
         config = json.load(f)
     
     # Entraînement
-    trainer = CharacterLoRATrainer(config)
+    device = torch.device(config.get("device") or ("cuda" if torch.cuda.is_available() else "cpu"))
+    profiler = TrainingProfiler(device, enabled=args.profile, output=args.profile_output)
+    trainer = CharacterLoRATrainer(config, profiler=profiler)
     result = trainer.train(args.dataset, args.output)
     
     print(f"Entraînement terminé : {result}")